@@ -0,0 +1,24 @@
+(require pixie.time :refer [time])
+(require pixie.parser.json :as parser-json)
+(require pixie.data.json :as json)
+
+;; Compares the native JSON decoder and encoder with the parser combinator
+;; one in pixie.parser.json.
+
+(def doc (json/write-string
+          (vec (for [i (range 200)]
+                 {"id" i
+                  "name" (str "user " i)
+                  "score" (* i 1.5)
+                  "active" (even? i)
+                  "tags" ["a" "b" "c"]}))))
+
+(println "pixie.parser.json/read-string")
+(time (dotimes [_ 5] (parser-json/read-string doc)))
+
+(println "pixie.data.json/read-string")
+(time (dotimes [_ 5] (json/read-string doc)))
+
+(println "pixie.data.json/write-string")
+(let [data (json/read-string doc)]
+  (time (dotimes [_ 5] (json/write-string data))))
@@ -0,0 +1,87 @@
+(ns pixie.data.binary
+  (:require [pixie.streams :refer :all]
+            [pixie.data.binary.internal :as bi]))
+
+;; Values are encoded with the tags of the .pxic format. Everything the
+;; reader can read is supported: numbers (ratios and big integers too),
+;; strings, characters, keywords, symbols, nil, booleans, maps, vectors,
+;; sets and seqs. Other types can be added with add-marshall-handlers, which
+;; takes a fn that turns the value into one of those and a fn that turns it
+;; back.
+
+; reexport the native encoder and decoder constructors
+(def encoder bi/encoder)
+(def decoder bi/decoder)
+
+(defn encode
+  "Returns a buffer holding x encoded. Given an encoder, strings and keywords
+   it has encoded before are written as a reference to the first time, so the
+   result must be decoded by a decoder that has decoded everything the
+   encoder encoded before, in order. The caller should dispose! the buffer."
+  ([x] (bi/-encode nil x))
+  ([x encoder] (bi/-encode encoder x)))
+
+(defn decode
+  "Decodes the value encoded in buffer. See encode for when a decoder is needed."
+  ([buffer] (bi/-decode nil buffer))
+  ([buffer decoder] (bi/-decode decoder buffer)))
+
+(defprotocol IBinaryWriter
+  (write-value! [this x] "Encodes x and writes it to the writer's stream."))
+
+(defprotocol IBinaryReader
+  (-read-value [this eof-value]))
+
+(deftype BinaryWriter [out encoder]
+  IBinaryWriter
+  (write-value! [this x]
+    (let [data (bi/-encode-frame encoder x)]
+      (try
+        (write out data)
+        (finally
+          (dispose! data)))
+      this))
+  IDisposable
+  (-dispose! [this]
+    (dispose! out)))
+
+(deftype Incomplete [])
+
+;; Returned by -decode-frame when the rest of the frame hasn't been read yet,
+;; no decoded value can be identical to it
+(def incomplete (->Incomplete))
+
+(deftype BinaryReader [in decoder buf]
+  IBinaryReader
+  (-read-value [this eof-value]
+    (loop []
+      (let [v (bi/-decode-frame decoder incomplete)]
+        (if (identical? v incomplete)
+          (let [n (read in buf (buffer-capacity buf))]
+            (if (pos? n)
+              (do (bi/-feed! decoder buf n)
+                  (recur))
+              eof-value))
+          v))))
+  IDisposable
+  (-dispose! [this]
+    (dispose! buf)
+    (dispose! in)))
+
+(defn writer
+  "Returns a writer that write-value! encodes values to, each written to the
+   IOutputStream out as a frame of its own."
+  [out]
+  (->BinaryWriter out (encoder)))
+
+(defn reader
+  "Returns a reader that read-value decodes the values written by a writer from,
+   read from the IInputStream in."
+  [in]
+  (->BinaryReader in (decoder) (buffer 4096)))
+
+(defn read-value
+  "Reads and decodes the next value from the reader's stream. Returns eof-value,
+   or nil, when the stream ends."
+  ([reader] (-read-value reader nil))
+  ([reader eof-value] (-read-value reader eof-value)))
@@ -1,41 +1,49 @@
 (ns pixie.data.json
-  (:require [pixie.parser.json]
-            [pixie.string :as string]))
+  (:require [pixie.streams :as st]
+            [pixie.streams.utf8.internal :as utf8i]
+            [pixie.data.json.internal :as ji]))
 
-(def read-string pixie.parser.json/read-string)
+(defn read-string
+  "Parses the JSON in s, a string or a buffer of UTF-8. Arrays are read as vectors
+   and objects as maps. With {:keywordize-keys true} as opts object keys are read
+   as keywords."
+  ([s] (ji/read-string s false))
+  ([s opts] (ji/read-string s (:keywordize-keys opts))))
 
-(defprotocol IToJSON
-  (write-string [this]))
+(defn read-stream
+  "Reads the UTF-8 IInputStream in to the end and parses the JSON in it, see
+   read-string for opts."
+  ([in] (read-stream in {}))
+  ([in opts]
+   (let [buf (buffer 4096)
+         decoder (utf8i/utf8-decoder)]
+     (try
+       (loop []
+         (let [n (st/read in buf (buffer-capacity buf))]
+           (when (pos? n)
+             (utf8i/decode-utf8! decoder buf n)
+             (recur))))
+       (read-string (utf8i/finish-utf8 decoder) opts)
+       (finally
+         (dispose! buf))))))
 
-(defn- write-map [m]
-  (str "{"
-       (->> m
-            (transduce (comp (map (fn [[k v]] (string/interp "$(write-string k)$: $(write-string v)$")))
-                             (interpose ", "))
-                       string-builder))
-       "}"))
+(defprotocol IToJSON
+  (write-string [this] "Returns this written as JSON."))
 
-(defn- write-sequential [xs]
-  (str "["
-       (->> xs
-            (transduce (comp (map write-string)
-                             (interpose ", "))
-                       string-builder))
-       "]"))
+(defn- write-native [x]
+  (ji/write-string x write-string))
 
-(defn- write-str [s]
-  (string/interp "\"$s$\""))
+;; Values of these types are written by the native encoder, which calls
+;; write-string for values inside them of any other type.
+(doseq [tp [Nil Bool Number Character String Keyword
+            IMap IVector ISeq ISeqable]]
+  (extend write-string tp write-native))
 
-(extend-protocol IToJSON
-  Character (write-string [this] (write-str this))
-  Cons (write-string [this] (write-sequential this))
-  EmptyList (write-string [this] (write-sequential this))
-  Nil (write-string [_] "null")
-  Number (write-string [this] (str this))
-  Keyword (write-string [this] (write-str (name this)))
-  LazySeq (write-string [this] (write-sequential this))
-  IMap (write-string [this] (write-map this))
-  IVector (write-string [this] (write-sequential this))
-  PersistentList (write-string [this] (write-sequential this))
-  Ratio (write-string [this] (str (float this)))
-  String (write-string [this] (write-str this)))
+(defn write-stream
+  "Writes x as UTF-8 encoded JSON to the IOutputStream out."
+  [out x]
+  (let [data (utf8i/encode-utf8 (write-string x))]
+    (try
+      (st/write out data)
+      (finally
+        (dispose! data)))))
@@ -1,6 +1,7 @@
 (ns pixie.io
   (:require [pixie.streams :as st :refer :all]
             [pixie.streams.utf8 :as utf8]
+            [pixie.streams.utf8.internal :as utf8i]
             [pixie.io-blocking :as io-blocking]
             [pixie.io.common :as common]
             [pixie.uv :as uv]
@@ -226,23 +227,17 @@
 (defn spit 
   "Writes the content to output. Output must be a file or an IOutputStream."
   [output content]
-  (cond
-    (string? output)
-    (transduce (map identity)
-               (-> output
-                   open-write
-                   buffered-output-stream
-                   utf8/utf8-output-stream-rf)
-               (str content))
-    
-    (satisfies? IOutputStream output)
-    (transduce (map identity)
-               (-> output
-                   buffered-output-stream
-                   utf8/utf8-output-stream-rf)
-               (str content))
-    
-    :else (throw [::Exception "Expected a string or IOutputStream"])))
+  (let [out (cond
+              (string? output) (open-write output)
+              (satisfies? IOutputStream output) output
+              :else (throw [::Exception "Expected a string or IOutputStream"]))
+        data (utf8i/encode-utf8 (str content))]
+    (try
+      (write out data)
+      (finally
+        (dispose! data)
+        (dispose! out)))
+    nil))
 
 (defn slurp
   "Reads in the contents of input. Input must be a filename or an IInputStream."
@@ -251,14 +246,18 @@
                  (string? input) (open-read input)
                  (satisfies? IInputStream input) input
                  :else (throw [:pixie.io/Exception "Expected a string or an IInputStream"]))
-        result (transduce
-                 (map identity)
-                 string-builder
-                 (-> stream
-                     buffered-input-stream
-                     utf8/utf8-input-stream))]
-      (dispose! stream)
-      result))
+        buf (buffer common/DEFAULT-BUFFER-SIZE)
+        decoder (utf8i/utf8-decoder)]
+    (try
+      (loop []
+        (let [read-count (read stream buf common/DEFAULT-BUFFER-SIZE)]
+          (when (pos? read-count)
+            (utf8i/decode-utf8! decoder buf read-count)
+            (recur))))
+      (utf8i/finish-utf8 decoder)
+      (finally
+        (dispose! buf)
+        (dispose! stream)))))
 
 (defn run-command [command]
   (st/apply-blocking io-blocking/run-command command))
@@ -35,6 +35,46 @@
 (defn string-cursor [s]
   (->StringCursor 0 s))
 
+;; Packrat parsing. A memo cursor remembers the result of every rule at every position it was
+;; tried at, so backtracking never parses the same rule at the same position twice, and left
+;; recursive rules, directly or through other rules, are parsed by growing a seed as in Warth
+;; et al., "Packrat Parsers Can Support Left Recursion". Each rule gets a flat array of entries
+;; with one slot per position, made the first time the rule is used.
+
+(defprotocol IMemoCursor
+  (memo-table [this rule] "Return the array of memo entries of rule, indexed by position")
+  (memo-state [this] "Return the MemoState of the cursor"))
+
+;; The left recursions being grown, by position, and the rules being parsed, innermost first
+(deftype MemoState [heads rule-stack])
+
+(deftype MemoStringCursor [idx s tables state]
+  ICursor
+  (next! [this]
+    (set-field! this :idx (inc idx)))
+  (current [this]
+    (when (< idx (count s))
+      (nth s idx)))
+  (snapshot [this]
+    idx)
+  (rewind! [this val]
+    (set-field! this :idx val))
+  (at-end? [this]
+    (= idx (count s)))
+  IMemoCursor
+  (memo-table [this rule]
+    (if-let [table (get tables rule)]
+      table
+      (let [table (make-array (inc (count s)))]
+        (set-field! this :tables (assoc tables rule table))
+        table)))
+  (memo-state [this]
+    state))
+
+;; Create a packrat cursor from the given string
+(defn memo-string-cursor [s]
+  (->MemoStringCursor 0 s {} (->MemoState (make-array (inc (count s))) nil)))
+
 ;; Mechanics
 
 (deftype ParseFailure [])
@@ -85,17 +125,25 @@
          b (to-parser b)
          m (atom #{})]
      (fn [cursor]
-       (let [key [cursor (snapshot cursor)]]
-         (if-let [v (contains? @m key)]
-           (b cursor)
-           (let [_ (swap! m conj key)
-                 state (snapshot cursor)
-                 val (a cursor)]
-             (swap! m disj key)
-             (if (identical? val fail)
-               (do (rewind! cursor state)
-                   (b cursor))
-               val)))))))
+       (if (satisfies? IMemoCursor cursor)
+         ;; Rules guard against left recursion themselves on a memo cursor
+         (let [state (snapshot cursor)
+               val (a cursor)]
+           (if (identical? val fail)
+             (do (rewind! cursor state)
+                 (b cursor))
+             val))
+         (let [key [cursor (snapshot cursor)]]
+           (if-let [v (contains? @m key)]
+             (b cursor)
+             (let [_ (swap! m conj key)
+                   state (snapshot cursor)
+                   val (a cursor)]
+               (swap! m disj key)
+               (if (identical? val fail)
+                 (do (rewind! cursor state)
+                     (b cursor))
+                 val))))))))
   ([a b & more]
    (apply or (or a b) more)))
 
@@ -154,6 +202,124 @@
 (defprotocol IDeliverable
   (-deliver [this val]))
 
+;; The result of a rule at a position, and the position it ended at. While the rule is being
+;; parsed the entry holds its LeftRecursion instead.
+(deftype MemoEntry [result end lr])
+
+;; A rule being parsed. Once a use of the rule is found inside itself, head is the Head of the
+;; left recursion and seed is what such uses get back.
+(deftype LeftRecursion [seed rule head next])
+
+;; The rule a left recursion is grown at, the rules it goes through on its way back to that rule,
+;; and those of them that still have to be parsed again in the current round of growing.
+(deftype Head [rule involved eval])
+
+(defn- parse-rule
+  "Parses f at pos and stores the result and the end in entry."
+  [f cursor pos entry]
+  (let [result (f cursor)]
+    (when (identical? result fail)
+      (rewind! cursor pos))
+    (set-field! entry :result result)
+    (set-field! entry :end (snapshot cursor))
+    result))
+
+(defn- recall
+  "Returns the entry of rule at pos. While a left recursion is grown there, rules outside of it
+  fail, and the rules it goes through are parsed again once per round."
+  [rule f cursor pos]
+  (let [entry (aget (memo-table cursor rule) pos)
+        head (aget (get-field (memo-state cursor) :heads) pos)]
+    (cond
+      (nil? head) entry
+
+      (s/and (nil? entry)
+             (not (identical? rule (get-field head :rule)))
+             (not (contains? (get-field head :involved) rule)))
+      (->MemoEntry fail pos nil)
+
+      (contains? (get-field head :eval) rule)
+      (do (set-field! head :eval (disj (get-field head :eval) rule))
+          (set-field! entry :lr nil)
+          (parse-rule f cursor pos entry)
+          entry)
+
+      :else entry)))
+
+(defn- setup-left-recursion
+  "Makes lr the head of a left recursion, which involves every rule parsed since lr's rule."
+  [state lr]
+  (when (nil? (get-field lr :head))
+    (set-field! lr :head (->Head (get-field lr :rule) #{} #{})))
+  (let [head (get-field lr :head)]
+    (loop [s (get-field state :rule-stack)]
+      (when-not (identical? (get-field s :head) head)
+        (set-field! s :head head)
+        (set-field! head :involved (conj (get-field head :involved) (get-field s :rule)))
+        (recur (get-field s :next))))))
+
+(defn- grow-seed
+  "Parses the left recursive rule f at pos again and again, each time with the last result as the
+  result of the recursive use, for as long as that consumes more input."
+  [f cursor pos entry head]
+  (let [heads (get-field (memo-state cursor) :heads)]
+    (aset heads pos head)
+    (loop []
+      (rewind! cursor pos)
+      (set-field! head :eval (get-field head :involved))
+      (let [result (f cursor)
+            end (snapshot cursor)]
+        (if (s/or (identical? result fail)
+                   (<= end (get-field entry :end)))
+          (do (aset heads pos nil)
+              (rewind! cursor (get-field entry :end))
+              (get-field entry :result))
+          (do (set-field! entry :result result)
+              (set-field! entry :end end)
+              (recur)))))))
+
+(defn- left-recursion-answer
+  "The result of rule at pos once parsed as far as it goes without growing. Only the head of the
+  left recursion grows the seed, the rules it goes through return their part of it."
+  [rule f cursor pos entry]
+  (let [lr (get-field entry :lr)
+        head (get-field lr :head)
+        seed (get-field lr :seed)]
+    (if (identical? (get-field head :rule) rule)
+      (do (set-field! entry :lr nil)
+          (set-field! entry :result seed)
+          (if (identical? seed fail)
+            fail
+            (grow-seed f cursor pos entry head)))
+      seed)))
+
+(defn- memo-invoke [rule f cursor]
+  (let [pos (snapshot cursor)
+        state (memo-state cursor)
+        entry (recall rule f cursor pos)]
+    (if entry
+      (let [lr (get-field entry :lr)]
+        (rewind! cursor (get-field entry :end))
+        (if lr
+          (do (setup-left-recursion state lr)
+              (get-field lr :seed))
+          (get-field entry :result)))
+      (let [lr (->LeftRecursion fail rule nil (get-field state :rule-stack))
+            entry (->MemoEntry fail pos lr)]
+        (set-field! state :rule-stack lr)
+        (aset (memo-table cursor rule) pos entry)
+        (let [result (f cursor)]
+          (set-field! state :rule-stack (get-field lr :next))
+          (when (identical? result fail)
+            (rewind! cursor pos))
+          (set-field! entry :end (snapshot cursor))
+          (if (get-field lr :head)
+            (do (set-field! lr :seed result)
+                (left-recursion-answer rule f cursor pos entry))
+            (do (set-field! entry :lr nil)
+                (set-field! entry :result result)
+                result)))))))
+
 (deftype PromiseFn [f name]
   IDeliverable
   (-deliver [this val]
@@ -161,7 +327,9 @@
   IFn
   (-invoke [this val]
     (assert f (str "PromiseFN " name " has not been delivered"))
-    (f val)))
+    (if (satisfies? IMemoCursor val)
+      (memo-invoke this f val)
+      (f val))))
 
 (defn promise-fn
   "Defines a promise that is callable."
@@ -10,7 +10,19 @@
   (def running-threads (atom 0))
   (def main-loop-running? (atom false))
   (def main-loop-lock (-create-lock))
-  (-acquire-lock main-loop-lock true))
+  (-acquire-lock main-loop-lock true)
+
+  ;; A single ready queue is shared by -run-later, yield-control, spawn and the channels. It is
+  ;; drained by one long lived async handle, instead of allocating a handle and a callback per
+  ;; continuation. The handle is unref'd so it never keeps the loop alive on its own,
+  ;; -with-stacklets drains whatever is left once uv_run returns.
+  (def run-queue (-run-queue))
+  (def run-queue-async (uv/uv_async_t))
+  (def run-queue-cb (ffi/ffi-prep-callback uv/uv_async_cb
+                                           (fn [handle]
+                                             (drain-run-queue))))
+  (uv/uv_async_init (uv/uv_default_loop) run-queue-async run-queue-cb)
+  (uv/uv_unref run-queue-async))
 
 
 
@@ -40,22 +52,21 @@
       val)))
 
 (defn -run-later [f]
-  (let [a (uv/uv_async_t)
-        cb (atom nil)]
-    (reset! cb (ffi/ffi-prep-callback uv/uv_async_cb
-                                  (fn [handle]
-                                    (try
-                                      (uv/uv_close a close_cb)
-                                      (-dispose! @cb)
-                                      (f)
-                                      (catch ex (println ex))))))
-    (uv/uv_async_init (uv/uv_default_loop) a @cb)
-    (uv/uv_async_send a)
-    (when (not @main-loop-running?)
-      (reset! main-loop-running? true)
-      (-release-lock main-loop-lock))
-    nil))
+  (when (-run-queue-push! run-queue f)
+    (uv/uv_async_send run-queue-async))
+  (when (not @main-loop-running?)
+    (reset! main-loop-running? true)
+    (-release-lock main-loop-lock))
+  nil)
+
+;; Functions handed to -run-later are drained in batches so that a busy queue can't starve
+;; the I/O callbacks of the loop.
 
+(def run-queue-batch-size 1024)
+
+(defn drain-run-queue []
+  (when (-run-queue-drain! run-queue run-queue-batch-size println)
+    (uv/uv_async_send run-queue-async)))
 
 (defn yield-control []
   (call-cc (fn [k]
@@ -148,10 +159,15 @@
     (f h)
     (loop []
       (uv/uv_run (uv/uv_default_loop) uv/UV_RUN_DEFAULT)
-      (when (> @running-threads 0)
-        (reset! main-loop-running? false)
-        (-acquire-lock main-loop-lock true)
-        (recur)))))
+      (cond
+        (pos? (count run-queue))
+        (do (drain-run-queue)
+            (recur))
+
+        (> @running-threads 0)
+        (do (reset! main-loop-running? false)
+            (-acquire-lock main-loop-lock true)
+            (recur))))))
 
 (defmacro with-stacklets [& body]
   `(-with-stacklets
@@ -174,14 +190,31 @@
 (defprotocol IThreadPool
   (-execute [this work-fn]))
 
-;; Super basic Thread Pool, yes, this should be improved
+;; A fixed number of threads that are reused for all the blocking work, instead of a thread
+;; per call. Results get back to the loop through -run-later, and so through the one async
+;; handle of the run queue.
 
-(deftype ThreadPool []
+(extend-type ThreadPool
   IThreadPool
   (-execute [this work-fn]
-    (-thread (fn [] (work-fn)))))
+    (-thread-pool-execute this work-fn)))
+
+(defn thread-pool
+  "Returns a pool of at most size threads to execute work on."
+  [size]
+  (-thread-pool size))
+
+(defn thread-pool-stats
+  "Returns a map of counters for a thread pool, see -thread-pool-stats."
+  ([] (thread-pool-stats basic-thread-pool))
+  ([pool] (-thread-pool-stats pool)))
+
+(def default-thread-pool-size 16)
 
-(def basic-thread-pool (->ThreadPool))
+;; Like the run queue, the pool lives across recompiles of this file. It can be replaced
+;; with a differently sized one by redefining basic-thread-pool.
+(when (undefined? (var basic-thread-pool))
+  (def basic-thread-pool (thread-pool default-thread-pool-size)))
 
 (defn -run-in-other-thread [work-fn]
   (-execute basic-thread-pool work-fn))
@@ -78,15 +78,31 @@
             ([coll item & items]
                (reduce -disj (-disj coll item) items))))
 
-(comment (def disj! (fn ^{:doc "Removes elements from the transient collection."
-                          :signatures [[] [coll] [coll item] [coll item & items]]
-                          :added "0.1"}
-                      disj!
-                      ([] (-transient []))
-                      ([result] (-persistent! result))
-                      ([result item] (-disj! result item))
-                      ([coll item & items]
-                         (reduce -disj! (-disj! coll item) items)))))
+(def disj! (fn ^{:doc "Removes elements from the transient collection."
+                 :signatures [[] [coll] [coll item] [coll item & items]]
+                 :added "0.1"}
+             disj!
+             ([] (-transient #{}))
+             ([result] (-persistent! result))
+             ([result item] (-disj! result item))
+             ([coll item & items]
+                (reduce -disj! (-disj! coll item) items))))
+
+(def assoc! (fn ^{:doc "Associates the key with the value in the transient collection."
+                  :signatures [[coll k v] [coll k v & kvs]]
+                  :added "0.1"}
+              assoc!
+              ([coll k v] (-assoc! coll k v))
+              ([coll k v & kvs]
+                 (apply assoc! (-assoc! coll k v) kvs))))
+
+(def dissoc! (fn ^{:doc "Removes the value associated with the keys from the transient collection."
+                   :signatures [[coll k] [coll k & ks]]
+                   :added "0.1"}
+               dissoc!
+               ([coll k] (-dissoc! coll k))
+               ([coll k & ks]
+                  (reduce -dissoc! (-dissoc! coll k) ks))))
 
 (def pop
   (fn ^{:doc "Pops elements off a stack."
@@ -149,8 +165,11 @@
               (fn []
                 (let [s (seq coll)]
                   (if s
-                    (cons (f (first s))
-                          (map f (rest s)))
+                    (if (chunked-seq? s)
+                      (chunk-cons (-map-chunk f (chunk-first s))
+                                  (map f (chunk-rest s)))
+                      (cons (f (first s))
+                            (map f (rest s))))
                     nil)))))
            ([f & colls]
               (let [step (fn step [cs]
@@ -357,10 +376,6 @@
   (fn [v]
     (str "(" (transduce (comp (map -repr) (interpose " ")) string-builder v) ")")))
 
-(extend -hash Cons
-        (fn [v]
-          (transduce ordered-hash-reducing-fn v)))
-
 (extend -str PersistentList
   (fn [v]
     (str "(" (transduce (interpose " ") string-builder v) ")")))
@@ -368,10 +383,6 @@
   (fn [v]
     (str "(" (transduce (comp (map -repr) (interpose " ")) string-builder v) ")")))
 
-(extend -hash PersistentList
-  (fn [v]
-    (transduce ordered-hash-reducing-fn v)))
-
 
 (extend -str LazySeq
   (fn [v]
@@ -380,23 +391,12 @@
   (fn [v]
     (str "(" (transduce (comp (map -repr) (interpose " ")) string-builder v) ")")))
 
-(extend -hash PersistentVector
-  (fn [v]
-    (transduce ordered-hash-reducing-fn v)))
-
-(extend -hash PersistentHashSet
+(extend -str ChunkedCons
   (fn [v]
-    (transduce ordered-hash-reducing-fn v)))
-
-
-
-(add-marshall-handlers PersistentHashSet
-  (fn [obj] (vec obj))
-  (fn [obj] (apply hash-set obj)))
-
-(extend -hash PersistentHashMap
+    (str "(" (transduce (interpose " ") string-builder v) ")")))
+(extend -repr ChunkedCons
   (fn [v]
-    (transduce ordered-hash-reducing-fn v)))
+    (str "(" (transduce (comp (map -repr) (interpose " ")) string-builder v) ")")))
 
 
 
@@ -410,23 +410,6 @@
 
 (def = -eq)
 
-(extend -seq PersistentVector
-  (fn vector-seq
-   ([self]
-    (vector-seq self 0))
-   ([self x]
-    (if (= x (count self))
-      nil
-      (cons (nth self x) (lazy-seq* (fn [] (vector-seq self (+ x 1)))))))))
-
-(extend -seq String
-  (fn string-seq
-   ([self]
-    (string-seq self 0))
-   ([self x]
-    (if (= x (count self))
-      nil
-      (cons (nth self x) (lazy-seq* (fn [] (string-seq self (+ x 1)))))))))
 
 (def concat
   (fn ^{:doc "Concatenates its arguments."
@@ -875,7 +858,7 @@ If further arguments are passed, invokes the method named by symbol, passing the
 (defn keyword? [v] (instance? Keyword v))
 
 (defn list? [v] (instance? [PersistentList Cons] v))
-(defn set? [v] (instance? PersistentHashSet v))
+(defn set? [v] (satisfies? ISet v))
 (defn map? [v] (satisfies? IMap v))
 (defn fn? [v] (satisfies? IFn v))
 (defn coll? [v] (satisfies? IPersistentCollection v))
@@ -958,10 +941,6 @@ If further arguments are passed, invokes the method named by symbol, passing the
   (fn [v]
     (str "[" (transduce (comp (map -repr) (interpose " ")) string-builder v) "]")))
 
-(extend -hash MapEntry
-  (fn [v]
-    (transduce ordered-hash-reducing-fn v)))
-
 (extend -seq MapEntry
   (fn [self]
     (list (-key self) (-val self))))
@@ -1007,10 +986,6 @@ If further arguments are passed, invokes the method named by symbol, passing the
           (let [entry->str (map (fn [e] (vector (-repr (key e)) " " (-repr (val e)))))]
             (str "{" (transduce (comp entry->str (interpose [", "]) cat) string-builder v) "}"))))
 
-(extend -hash PersistentHashMap
-        (fn [v]
-          (transduce cat unordered-hash-reducing-fn v)))
-
 (extend -seq PersistentHashSet
         (fn [s]
           (reduce conj nil s)))
@@ -1022,8 +997,32 @@ If further arguments are passed, invokes the method named by symbol, passing the
         (fn [s]
           (str "#{" (transduce (comp (map -repr) (interpose " ")) string-builder s) "}")))
 
+(extend -str PersistentTreeMap
+        (fn [v]
+          (let [entry->str (map (fn [e] (vector (key e) " " (val e))))]
+            (str "{" (transduce (comp entry->str (interpose [", "]) cat) string-builder v) "}"))))
+(extend -repr PersistentTreeMap
+        (fn [v]
+          (let [entry->str (map (fn [e] (vector (-repr (key e)) " " (-repr (val e)))))]
+            (str "{" (transduce (comp entry->str (interpose [", "]) cat) string-builder v) "}"))))
+
+(extend -str PersistentTreeSet
+        (fn [s]
+          (str "#{" (transduce (interpose " ") string-builder s) "}")))
+(extend -repr PersistentTreeSet
+        (fn [s]
+          (str "#{" (transduce (comp (map -repr) (interpose " ")) string-builder s) "}")))
+
+(extend -str TreeSeq
+  (fn [v]
+    (str "(" (transduce (interpose " ") string-builder v) ")")))
+(extend -repr TreeSeq
+  (fn [v]
+    (str "(" (transduce (comp (map -repr) (interpose " ")) string-builder v) ")")))
+
 (extend -empty Cons (fn [_] '()))
 (extend -empty LazySeq (fn [_] '()))
+(extend -empty ChunkedCons (fn [_] '()))
 (extend -empty PersistentList (fn [_] '()))
 (extend -empty EmptyList (fn [_] '()))
 (extend -empty PersistentVector (fn [_] []))
@@ -1052,6 +1051,27 @@ If further arguments are passed, invokes the method named by symbol, passing the
               [:pixie.stdlib/InvalidArgumentException
                (str (type x) " cannot be conjed to a map")]))))
 
+(extend -conj! TransientHashMap
+        (fn [coll x]
+            (cond
+             (instance? MapEntry x)
+             (-assoc! coll (key x) (val x))
+
+             (instance? PersistentVector x)
+             (if (= (count x) 2)
+                 (-assoc! coll (nth x 0 nil) (nth x 1 nil))
+                 (throw
+                  [:pixie.stdlib/InvalidArgumentException
+                   "Vector arg to map conj! must be a pair"]))
+
+             (satisfies? ISeqable x)
+             (reduce -conj! coll (-seq x))
+
+             :else
+             (throw
+              [:pixie.stdlib/InvalidArgumentException
+               (str (type x) " cannot be conjed to a map")]))))
+
 (extend -conj Cons
         (fn [coll x]
           (cons x coll)))
@@ -1060,6 +1080,10 @@ If further arguments are passed, invokes the method named by symbol, passing the
         (fn [coll x]
           (cons x coll)))
 
+(extend -conj ChunkedCons
+        (fn [coll x]
+          (cons x coll)))
+
 (defn empty
   {:doc "Returns an empty collection of the same type, or nil."
    :added "0.1"}
@@ -1092,6 +1116,8 @@ If further arguments are passed, invokes the method named by symbol, passing the
                            (-val-at m k nil))))
 (extend -invoke PersistentHashMap get)
 (extend -invoke PersistentHashSet get)
+(extend -invoke PersistentTreeMap get)
+(extend -invoke PersistentTreeSet get)
 
 
 (defn get-in
@@ -1498,15 +1524,6 @@ and implements IAssociative, ILookup and IObject."
               (keys (ns-map ns))))
     nil))
 
-(defn swap!
-  {:doc "Swaps the value in the atom, by applying f to the current value.
-
-The new value is thus `(apply f current-value-of-atom args)`."
-   :signatures [[atom f & args]]
-   :added "0.1"}
-  [a f & args]
-  (reset! a (apply f @a args)))
-
 (defn nil? [x]
   (identical? x nil))
 
@@ -1652,10 +1669,12 @@ The new value is thus `(apply f current-value-of-atom args)`."
               (rrf result input)
               (reduced result))))))))
   ([n coll]
-   (lazy-seq
-     (when (pos? n)
-       (when-let [s (seq coll)]
-         (cons (first s) (take (dec n) (next s))))))))
+   (if (and (instance? Range coll) (integer? n))
+     (-range-take coll n)
+     (lazy-seq
+       (when (pos? n)
+         (when-let [s (seq coll)]
+           (cons (first s) (take (dec n) (next s)))))))))
 
 (defn drop
   {:doc "Drops n elements from the start of the collection."
@@ -1674,10 +1693,12 @@ The new value is thus `(apply f current-value-of-atom args)`."
               (rrf result input)
               result)))))))
   ([n coll]
-   (let [s (seq coll)]
-     (if (and (pos? n) s)
-       (recur (dec n) (next s))
-       s))))
+   (if (and (instance? Range coll) (integer? n))
+     (seq (-range-drop coll n))
+     (let [s (seq coll)]
+       (if (and (pos? n) s)
+         (recur (dec n) (next s))
+         s)))))
 
 (defn split-at
   {:doc "Returns a vector of the first n elements of the collection, and the remaining elements."
@@ -1746,7 +1767,6 @@ The new value is thus `(apply f current-value-of-atom args)`."
                       s)))]
        (lazy-seq (step pred coll)))))
 
-;; TODO: use a transient map in the future
 (defn group-by
   {:doc "Groups the collection into a map keyed by the result of applying f on each element. The value at each key is a vector of elements in order of appearance."
    :examples [["(group-by even? [1 2 3 4 5])" nil {false [1 3 5] true [2 4]}]
@@ -1754,20 +1774,22 @@ The new value is thus `(apply f current-value-of-atom args)`."
    :signatures [[f coll]]
    :added "0.1"}
   [f coll]
-  (reduce (fn [res elem]
-            (update-in res [(f elem)] (fnil conj []) elem))
-          {}
-          coll))
+  (persistent!
+   (reduce (fn [res elem]
+             (let [k (f elem)]
+               (assoc! res k (conj (get res k []) elem))))
+           (transient {})
+           coll)))
 
-;; TODO: use a transient map in the future
 (defn frequencies
   {:doc "Returns a map with distinct elements as keys and the number of occurences as values."
    :added "0.1"}
   [coll]
-  (reduce (fn [res elem]
-            (update-in res [elem] (fnil inc 0)))
-          {}
-          coll))
+  (persistent!
+   (reduce (fn [res elem]
+             (assoc! res elem (inc (get res elem 0))))
+           (transient {})
+           coll)))
 
 (defn partition
   {:doc "Separates the collection into collections of size n, starting at the beginning, with an optional step size.
@@ -2024,54 +2046,6 @@ For more information, see http://clojure.org/special_forms#binding-forms"}
   ([n x]
    (->Repeat n x)))
 
-(deftype Range [start stop step]
-  IReduce
-  (-reduce [self f init]
-    (loop [i start
-           acc init]
-      (if (or (and (> step 0) (< i stop))
-              (and (< step 0) (> i stop))
-              (and (= step 0)))
-        (let [acc (f acc i)]
-          (if (reduced? acc)
-            @acc
-            (recur (+ i step) acc)))
-        acc)))
-  ICounted
-  (-count [self]
-    (if (or (and (< start stop) (< step 0))
-            (and (> start stop) (> step 0))
-            (= step 0))
-      0
-      (abs (quot (- start stop) step))))
-  IIndexed
-  (-nth [self idx]
-    (when (or (= start stop 0) (neg? idx))
-      (throw [:pixie.stdlib/OutOfRangeException "Index out of Range"]))
-    (let [cmp (if (< start stop) < >)
-          val (+ start (* idx step))]
-      (if (cmp val stop)
-        val
-        (throw [:pixie.stdlib/OutOfRangeException "Index out of Range"]))))
-  (-nth-not-found [self idx not-found]
-    (let [cmp (if (< start stop) < >)
-          val (+ start (* idx step))]
-      (if (cmp val stop)
-        val
-       not-found)))
-  ISeq
-  (-first [this] 
-    (when (not= start stop)
-      start))
-  (-next  [this]
-    (let [i (+ step start)]
-      (when (or (and (> step 0) (< i stop))
-                    (and (< step 0) (> i stop))
-                    (and (= step 0)))
-        (range i stop step))))
-  ISeqable
-  (-seq [self] self))
-
 (extend -str Range
         (fn [v]
           (str "(" (transduce (interpose " ") string-builder v) ")")))
@@ -2088,30 +2062,16 @@ For more information, see http://clojure.org/special_forms#binding-forms"}
               ["(seq (range 5 -1 -1))" nil (5 4 3 2 1 0)]]
    :signatures [[] [stop] [start stop] [start stop step]]
    :added "0.1"}
-  ([] (->Range 0 MAX-NUMBER 1))
-  ([stop] (->Range 0 stop 1))
-  ([start stop] (->Range start stop 1))
-  ([start stop step] (->Range start stop step)))
+  ([] (-range 0 MAX-NUMBER 1))
+  ([stop] (-range 0 stop 1))
+  ([start stop] (-range start stop 1))
+  ([start stop step]
+   (if (and (zero? step) (not= start stop))
+     (repeat start)
+     (-range start stop step))))
 
 (extend -eq ISeqable -seq-eq)
 
-(deftype Unknown [])
-(def unknown (->Unknown))
-
-(extend -eq PersistentHashMap
-        (fn [self other]
-          (cond
-           (not (map? other)) false
-           (not= (count self) (count other)) false
-           :else (reduce (fn
-                           ([_] true)
-                           ([_ entry]
-                              (let [other-val (get other (key entry) unknown)]
-                                (if (not= other-val (val entry))
-                                  (reduced false)
-                                  true))))
-                         true
-                         self))))
 
 (defn filter
   {:doc "Filters the collection for elements matching the predicate."
@@ -2128,10 +2088,13 @@ For more information, see http://clojure.org/special_forms#binding-forms"}
   ([pred coll]
    (lazy-seq
      (when-let [s (seq coll)]
-       (let [[f & r] s]
-         (if (pred f)
-           (cons f (filter pred r))
-           (filter pred r)))))))
+       (if (chunked-seq? s)
+         (chunk-cons (-filter-chunk pred (chunk-first s))
+                     (filter pred (chunk-rest s)))
+         (let [[f & r] s]
+           (if (pred f)
+             (cons f (filter pred r))
+             (filter pred r))))))))
 
 (defn remove
   {:doc "Removes any element from the collection which matches the predicate. The complement of filter."
@@ -2182,11 +2145,14 @@ For more information, see http://clojure.org/special_forms#binding-forms"}
   ([f coll]
    (lazy-seq
      (when-let [s (seq coll)]
-       (let [[first & rest] s
-             result (f first)]
-         (if result
-           (cons result (keep f rest))
-           (keep f rest)))))))
+       (if (chunked-seq? s)
+         (chunk-cons (-keep-chunk f (chunk-first s))
+                     (keep f (chunk-rest s)))
+         (let [[first & rest] s
+               result (f first)]
+           (if result
+             (cons result (keep f rest))
+             (keep f rest))))))))
 
 (defn refer
   {:doc "Refer to the specified vars from a namespace directly.
@@ -2365,24 +2331,120 @@ If the number of arguments is even and no clause matches, throws an exception."
 
 
 
-(deftype MultiMethod [dispatch-fn default-val methods]
-  IMessageObject
-  (-get-attr [this kw]
-    (case kw
-      :methods methods
-      :else nil))
-  IFn
-  (-invoke [self & args]
-    (let [dispatch-val (apply dispatch-fn args)
-          method (if (contains? @methods dispatch-val)
-                   (get @methods dispatch-val)
-                   (get @methods default-val))
-          _ (assert method (str "no method defined for " dispatch-val))]
-      (apply method args))))
-
+(defn make-hierarchy
+  {:doc "Creates an empty hierarchy, for use with derive, isa? and multimethods."
+   :added "0.1"}
+  []
+  {:parents {} :descendants {} :ancestors {}})
+
+(def global-hierarchy (atom (make-hierarchy)))
+
+(defn- type-ancestry [t]
+  (when t
+    (cons t (type-ancestry (-type-parent t)))))
+
+(defn isa?
+  {:doc "Returns true if child is equal to parent, derives from it in the hierarchy
+  (by default the global one), or is a subtype of it. Vectors are compared item by
+  item."
+   :examples [["(derive ::square ::shape)"]
+              ["(isa? ::square ::shape)" nil true]
+              ["(isa? [::square 1] [::shape 1])" nil true]]
+   :signatures [[child parent] [h child parent]]
+   :added "0.1"}
+  ([child parent]
+   (isa? @global-hierarchy child parent))
+  ([h child parent]
+   (or (= child parent)
+       (and (instance? Type child)
+            (instance? Type parent)
+            (some #(identical? % parent) (type-ancestry child)))
+       (contains? (get (:ancestors h) child) parent)
+       (and (instance? Type child)
+            (some #(contains? (get (:ancestors h) %) parent) (type-ancestry child)))
+       (and (vector? child)
+            (vector? parent)
+            (= (count child) (count parent))
+            (every? identity (map #(isa? h %1 %2) child parent))))))
+
+(defn parents
+  {:doc "Returns the immediate parents of tag in the hierarchy (by default the global one)."
+   :signatures [[tag] [h tag]]
+   :added "0.1"}
+  ([tag] (parents @global-hierarchy tag))
+  ([h tag] (get (:parents h) tag)))
+
+(defn ancestors
+  {:doc "Returns all the parents of tag in the hierarchy (by default the global one)."
+   :signatures [[tag] [h tag]]
+   :added "0.1"}
+  ([tag] (ancestors @global-hierarchy tag))
+  ([h tag] (get (:ancestors h) tag)))
+
+(defn descendants
+  {:doc "Returns everything that derives from tag in the hierarchy (by default the global one)."
+   :signatures [[tag] [h tag]]
+   :added "0.1"}
+  ([tag] (descendants @global-hierarchy tag))
+  ([h tag] (get (:descendants h) tag)))
+
+(defn- hierarchy-with-parents [parents-map]
+  (let [reach (fn reach [tag seen]
+                (reduce (fn [seen p]
+                          (if (contains? seen p)
+                            seen
+                            (reach p (conj seen p))))
+                        seen
+                        (get parents-map tag)))
+        ancestors-map (reduce (fn [m tag] (assoc m tag (reach tag #{})))
+                              {}
+                              (keys parents-map))
+        descendants-map (reduce (fn [m entry]
+                                  (reduce (fn [m a] (update-in m [a] (fnil conj #{}) (key entry)))
+                                          m
+                                          (val entry)))
+                                {}
+                                ancestors-map)]
+    {:parents parents-map :ancestors ancestors-map :descendants descendants-map}))
+
+(defn derive
+  {:doc "Makes tag a child of parent in the hierarchy. Without a hierarchy the global one
+  is changed, otherwise the new hierarchy is returned."
+   :examples [["(derive ::circle ::shape)"]
+              ["(parents ::circle)" nil #{::shape}]]
+   :signatures [[tag parent] [h tag parent]]
+   :added "0.1"}
+  ([tag parent]
+   (swap! global-hierarchy derive tag parent)
+   nil)
+  ([h tag parent]
+   (assert (not= tag parent) "Can't derive a tag from itself")
+   (assert (not (isa? h parent tag)) (str "Cyclic derivation: " parent " already derives from " tag))
+   (if (contains? (get (:parents h) tag) parent)
+     h
+     (hierarchy-with-parents (update-in (:parents h) [tag] (fnil conj #{}) parent)))))
+
+(defn underive
+  {:doc "Removes parent from the parents of tag in the hierarchy. Without a hierarchy the
+  global one is changed, otherwise the new hierarchy is returned."
+   :signatures [[tag parent] [h tag parent]]
+   :added "0.1"}
+  ([tag parent]
+   (swap! global-hierarchy underive tag parent)
+   nil)
+  ([h tag parent]
+   (let [tag-parents (disj (get (:parents h) tag #{}) parent)]
+     (hierarchy-with-parents (if (empty? tag-parents)
+                               (dissoc (:parents h) tag)
+                               (assoc (:parents h) tag tag-parents))))))
 
 (defmacro defmulti
-  {:doc "Defines a multimethod, which dispatches to its methods based on dispatch-fn."
+  {:doc "Defines a multimethod, which dispatches to its methods based on dispatch-fn.
+
+Dispatch values are matched with isa?, so a method for a parent in the hierarchy
+also handles its children. Options are :default, the dispatch value of the method
+used when no other one matches (:default by default), and :hierarchy, an atom
+holding the hierarchy to use (global-hierarchy by default)."
    :examples [["(defmulti greet first)"]
               ["(defmethod greet :hi [[_ name]] (str \"Hi, \" name \"!\"))"]
               ["(defmethod greet :hello [[_ name]] (str \"Hello, \" name \".\"))"]
@@ -2398,20 +2460,17 @@ If the number of arguments is even and no clause matches, throws an exception."
                       [meta args])
         dispatch-fn (first args)
         options (apply hashmap (next args))]
-    `(def ~name (->MultiMethod ~dispatch-fn ~(get options :default :default) (atom {})))))
+    `(def ~name (-multi-method ~(str name)
+                               ~dispatch-fn
+                               ~(get options :default :default)
+                               ~(get options :hierarchy `global-hierarchy)))))
 
 (defmacro defmethod
   {:doc "Defines a method of a multimethod. See `(doc defmulti)` for details."
    :signatures [[name dispatch-val [param*] & body]]
    :added "0.1"}
   [name dispatch-val params & body]
-  `(do
-     (let [methods (.-methods ~name)]
-       (swap! methods
-              assoc
-              ~dispatch-val (fn ~params
-                              ~@body))
-       ~name)))
+  `(-add-method ~name ~dispatch-val (fn ~params ~@body)))
 
 (defmulti Foo :r)
 (defmethod Foo :r
@@ -3006,6 +3065,103 @@ Calling this function on something that is not ISeqable returns a seq with that
     (-compare x y)
     (throw [::ComparisonError (str x " does not satisfy IComparable")])))
 
+(defn sort
+  {:doc "Returns a vector of the items in coll, sorted by compare or by the given
+  comparator. The comparator can return a number like compare does, or be a
+  predicate like <. The sort is stable."
+   :examples [["(sort [3 1 2])" nil [1 2 3]]
+              ["(sort > [3 1 2])" nil [3 2 1]]]
+   :signatures [[coll] [comp coll]]
+   :added "0.1"}
+  ([coll]
+   (-sort nil coll))
+  ([comp coll]
+   (-sort comp coll)))
+
+(defn sort-by
+  {:doc "Returns a vector of the items in coll, sorted by the result of calling keyfn
+  on them. keyfn is called once per item. The sort is stable."
+   :examples [["(sort-by count [\"aaa\" \"b\" \"cc\"])" nil ["b" "cc" "aaa"]]]
+   :signatures [[keyfn coll] [keyfn comp coll]]
+   :added "0.1"}
+  ([keyfn coll]
+   (-sort-by keyfn nil coll))
+  ([keyfn comp coll]
+   (-sort-by keyfn comp coll)))
+
+(defn sorted-map
+  {:doc "Returns a new sorted map with the given keys and values, ordered by compare."
+   :examples [["(keys (sorted-map :b 2 :c 3 :a 1))" nil [:a :b :c]]]
+   :added "0.1"}
+  [& kvs]
+  (-sorted-map nil kvs))
+
+(defn sorted-map-by
+  {:doc "Returns a new sorted map with the given keys and values, ordered by comp."
+   :added "0.1"}
+  [comp & kvs]
+  (-sorted-map comp kvs))
+
+(defn sorted-set
+  {:doc "Returns a new sorted set of the arguments, ordered by compare."
+   :examples [["(seq (sorted-set 3 1 2))" nil (1 2 3)]]
+   :added "0.1"}
+  [& ks]
+  (-sorted-set nil ks))
+
+(defn sorted-set-by
+  {:doc "Returns a new sorted set of the arguments, ordered by comp."
+   :added "0.1"}
+  [comp & ks]
+  (-sorted-set comp ks))
+
+(defn sorted? [v] (satisfies? ISorted v))
+
+(defn rseq
+  {:doc "Returns the entries of a sorted collection in reverse order."
+   :added "0.1"}
+  [sc]
+  (-sorted-seq sc false))
+
+(defn- sorted-bound [sc test key]
+  (let [cmp (-comparator sc)]
+    (fn [e] (test (cmp (-entry-key sc e) key) 0))))
+
+(defn subseq
+  {:doc "Returns the entries of a sorted collection whose keys satisfy the tests, in
+  ascending order. The tests are <, <=, > or >=."
+   :examples [["(subseq (sorted-set 1 2 3 4 5) > 2)" nil (3 4 5)]
+              ["(subseq (sorted-set 1 2 3 4 5) >= 2 < 4)" nil (2 3)]]
+   :signatures [[sc test key] [sc start-test start-key end-test end-key]]
+   :added "0.1"}
+  ([sc test key]
+   (let [include? (sorted-bound sc test key)]
+     (if (or (= test >) (= test >=))
+       (when-let [s (-sorted-seq-from sc key true)]
+         (if (include? (first s)) s (next s)))
+       (take-while include? (-sorted-seq sc true)))))
+  ([sc start-test start-key end-test end-key]
+   (when-let [s (-sorted-seq-from sc start-key true)]
+     (take-while (sorted-bound sc end-test end-key)
+                 (if ((sorted-bound sc start-test start-key) (first s)) s (next s))))))
+
+(defn rsubseq
+  {:doc "Returns the entries of a sorted collection whose keys satisfy the tests, in
+  descending order. The tests are <, <=, > or >=."
+   :examples [["(rsubseq (sorted-set 1 2 3 4 5) < 3)" nil (2 1)]]
+   :signatures [[sc test key] [sc start-test start-key end-test end-key]]
+   :added "0.1"}
+  ([sc test key]
+   (let [include? (sorted-bound sc test key)]
+     (if (or (= test <) (= test <=))
+       (when-let [s (-sorted-seq-from sc key false)]
+         (if (include? (first s)) s (next s)))
+       (take-while include? (-sorted-seq sc false)))))
+  ([sc start-test start-key end-test end-key]
+   (when-let [s (-sorted-seq-from sc end-key false)]
+     (take-while (sorted-bound sc start-test start-key)
+                 (if ((sorted-bound sc end-test end-key) (first s)) s (next s))))))
+
 (defn vary-meta
   {:doc "Returns x with meta data updated with the application of f and args to it.
 ex: (vary-meta x assoc :foo 42)"
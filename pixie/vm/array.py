@@ -121,6 +121,22 @@ def _reduce(self, f, init):
     assert isinstance(self, ArraySeq)
     return self.reduce(f, init)
 
+@extend(proto._chunked_first, ArraySeq)
+def _chunked_first(self):
+    assert isinstance(self, ArraySeq)
+    from pixie.vm.chunked_seq import ArrayChunk, CHUNK_SIZE
+    lst = self._w_array._list
+    return ArrayChunk(lst, self._idx, min(self._idx + CHUNK_SIZE, len(lst)))
+
+@extend(proto._chunked_next, ArraySeq)
+def _chunked_next(self):
+    assert isinstance(self, ArraySeq)
+    from pixie.vm.chunked_seq import CHUNK_SIZE
+    idx = self._idx + CHUNK_SIZE
+    if idx < len(self._w_array._list):
+        return ArraySeq(idx, self._w_array)
+    return nil
+
 def array(lst):
     assert isinstance(lst, list)
     return Array(lst)
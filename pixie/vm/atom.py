@@ -1,10 +1,28 @@
 import pixie.vm.object as object
-from pixie.vm.code import extend, as_var
-from pixie.vm.primitives import nil
+from pixie.vm.object import affirm, runtime_error
+from pixie.vm.code import extend, as_var, NativeFn
+from pixie.vm.primitives import nil, true, false
 import pixie.vm.stdlib as proto
+import pixie.vm.rt as rt
+
+
+class NotifyWatchRf(NativeFn):
+    def __init__(self, atom, old, new):
+        self._atom = atom
+        self._old = old
+        self._new = new
+
+    def invoke(self, args):
+        entry = args[1]
+        rt._val(entry).invoke([rt._key(entry), self._atom, self._old, self._new])
+        return nil
 
 
 class Atom(object.Object):
+    """A reference that is changed by compare and set. Code in the VM only lets
+    go of the GIL around external calls, so the check and the set in
+    compare_and_set can't be split by another thread. Validators and watches
+    are called outside of that, as they run pixie code."""
     _type = object.Type(u"pixie.stdlib.Atom")
 
     def type(self):
@@ -19,12 +37,56 @@ class Atom(object.Object):
     def __init__(self, boxed_value, meta=nil):
         self._boxed_value = boxed_value
         self._meta = meta
+        self._validator = nil
+        self._watches = nil
+
+    def validate(self, val):
+        if self._validator is not nil and not rt.is_true(self._validator.invoke([val])):
+            runtime_error(u"Invalid reference state", u"pixie.stdlib/IllegalStateException")
+
+    def notify_watches(self, old, new):
+        if self._watches is not nil:
+            rt._reduce(self._watches, NotifyWatchRf(self, old, new), nil)
+
+    def reset(self, new):
+        self.validate(new)
+        old = self._boxed_value
+        self._boxed_value = new
+        self.notify_watches(old, new)
+        return old
+
+    def compare_and_set(self, old, new):
+        self.validate(new)
+        if self._boxed_value is not old:
+            return False
+        self._boxed_value = new
+        self.notify_watches(old, new)
+        return True
+
+    def swap(self, f, args):
+        """Applies f to the value and args until the result can be set without
+        the value having changed in between. Returns the old and the new value."""
+        while True:
+            old = self._boxed_value
+            fn_args = [None] * (len(args) + 1)
+            fn_args[0] = old
+            for x in range(len(args)):
+                fn_args[x + 1] = args[x]
+            new = f.invoke(fn_args)
+            if self.compare_and_set(old, new):
+                return old, new
+
+
+def atom_arg(a):
+    affirm(isinstance(a, Atom), u"Expected an Atom")
+    assert isinstance(a, Atom)
+    return a
 
 
 @extend(proto._reset_BANG_, Atom)
 def _reset(self, v):
     assert isinstance(self, Atom)
-    self._boxed_value = v
+    self.reset(v)
     return v
 
 
@@ -46,3 +108,69 @@ def _with_meta(self, meta):
 @as_var("atom")
 def atom(val=nil):
     return Atom(val)
+
+@as_var("compare-and-set!")
+def compare_and_set(a, old, new):
+    """(compare-and-set! atom old new)
+       Sets the value of atom to new if its value is identical to old. Returns true if it was set."""
+    return true if atom_arg(a).compare_and_set(old, new) else false
+
+@as_var("swap!")
+def swap__args(args):
+    """(swap! atom f & args)
+       Swaps the value in the atom, by applying f to the current value. The new value is thus
+       (apply f current-value-of-atom args). f is retried if another thread changed the value while
+       it ran, so it should be free of side effects. Returns the new value."""
+    affirm(len(args) >= 2, u"swap! takes an atom, a fn and its extra args")
+    _, new = atom_arg(args[0]).swap(args[1], args[2:])
+    return new
+
+@as_var("swap-vals!")
+def swap_vals__args(args):
+    """(swap-vals! atom f & args)
+       Like swap!, but returns a vector of the old and the new value of the atom."""
+    affirm(len(args) >= 2, u"swap-vals! takes an atom, a fn and its extra args")
+    old, new = atom_arg(args[0]).swap(args[1], args[2:])
+    return rt.vector(old, new)
+
+@as_var("reset-vals!")
+def reset_vals(a, new):
+    """(reset-vals! atom new)
+       Sets the value of atom to new. Returns a vector of the old and the new value."""
+    return rt.vector(atom_arg(a).reset(new), new)
+
+@as_var("set-validator!")
+def set_validator(a, f):
+    """(set-validator! atom f)
+       Sets a fn that is called with every new value of atom before it's set. When f returns a
+       false value the value isn't set and an exception is thrown. A nil f removes the validator."""
+    a = atom_arg(a)
+    if f is not nil and not rt.is_true(f.invoke([a._boxed_value])):
+        runtime_error(u"Invalid reference state", u"pixie.stdlib/IllegalStateException")
+    a._validator = f
+    return nil
+
+@as_var("get-validator")
+def get_validator(a):
+    """(get-validator atom)
+       Returns the validator of atom, or nil."""
+    return atom_arg(a)._validator
+
+@as_var("add-watch")
+def add_watch(a, key, f):
+    """(add-watch atom key f)
+       Calls (f key atom old-value new-value) after every change of the value of atom. Adding a
+       watch with a key that's already used replaces that watch."""
+    a = atom_arg(a)
+    watches = rt.hashmap() if a._watches is nil else a._watches
+    a._watches = rt._assoc(watches, key, f)
+    return a
+
+@as_var("remove-watch")
+def remove_watch(a, key):
+    """(remove-watch atom key)
+       Removes the watch of atom added with key."""
+    a = atom_arg(a)
+    if a._watches is not nil:
+        a._watches = rt._dissoc(a._watches, key)
+    return a
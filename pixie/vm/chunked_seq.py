@@ -0,0 +1,342 @@
+import pixie.vm.object as object
+from pixie.vm.object import affirm
+from pixie.vm.primitives import nil, true, false
+from pixie.vm.code import extend, as_var, NativeFn
+from pixie.vm.numbers import Integer
+from pixie.vm.string import String, Character
+from pixie.vm.persistent_vector import PersistentVector
+from pixie.vm.lazy_seq import LazySeq
+import pixie.vm.stdlib as proto
+import pixie.vm.util as util
+import pixie.vm.rt as rt
+from rpython.rlib.rarithmetic import r_uint, intmask
+
+
+CHUNK_SIZE = 32
+
+
+class ArrayChunk(object.Object):
+    """A slice of a list of items, the unit chunked seqs hand out instead of
+    a single item at a time. The list is shared, never copied."""
+    _type = object.Type(u"pixie.stdlib.ArrayChunk")
+    _immutable_fields_ = ["_items", "_offset", "_end"]
+
+    def type(self):
+        return ArrayChunk._type
+
+    def __init__(self, items, offset, end):
+        self._items = items
+        self._offset = offset
+        self._end = end
+
+    def count(self):
+        return self._end - self._offset
+
+    def nth(self, idx):
+        return self._items[self._offset + idx]
+
+    def drop_first(self):
+        affirm(self._offset < self._end, u"Can't drop the first item of an empty chunk")
+        return ArrayChunk(self._items, self._offset + 1, self._end)
+
+    def reduce(self, f, init):
+        for x in range(self._offset, self._end):
+            init = f.invoke([init, self._items[x]])
+            if rt.reduced_QMARK_(init):
+                return init
+        return init
+
+
+class ChunkBuffer(object.Object):
+    """Collects items for a chunk, which takes over the buffer's list."""
+    _type = object.Type(u"pixie.stdlib.ChunkBuffer")
+
+    def type(self):
+        return ChunkBuffer._type
+
+    def __init__(self, capacity):
+        self._items = [None] * capacity
+        self._count = 0
+
+    def add(self, x):
+        affirm(self._items is not None, u"Can't add to a chunk buffer once it's been made into a chunk")
+        affirm(self._count < len(self._items), u"Chunk buffer is full")
+        self._items[self._count] = x
+        self._count += 1
+
+    def chunk(self):
+        affirm(self._items is not None, u"Chunk buffer was already made into a chunk")
+        items = self._items
+        self._items = None
+        return ArrayChunk(items, 0, self._count)
+
+
+class ChunkedCons(object.Object):
+    """A chunk followed by the seq of the chunks after it."""
+    _type = object.Type(u"pixie.stdlib.ChunkedCons")
+    _immutable_fields_ = ["_chunk", "_more", "_meta"]
+
+    def type(self):
+        return ChunkedCons._type
+
+    def __init__(self, chunk, more, meta=nil):
+        self._chunk = chunk
+        self._more = more
+        self._meta = meta
+        self._hash = r_uint(0)
+
+    def first(self):
+        return self._chunk.nth(0)
+
+    def next(self):
+        if self._chunk.count() > 1:
+            return ChunkedCons(self._chunk.drop_first(), self._more)
+        return rt.seq(self._more)
+
+    def meta(self):
+        return self._meta
+
+    def with_meta(self, meta):
+        return ChunkedCons(self._chunk, self._more, meta)
+
+    def coll_hash(self):
+        if self._hash == 0:
+            acc = util.HashingState()
+            seq = self
+            while seq is not nil:
+                acc.update_hash_ordered(rt.first(seq))
+                seq = rt.next(seq)
+            self._hash = acc.finish_hash()
+        return self._hash
+
+
+def chunk_cons(chunk, more):
+    if chunk.count() == 0:
+        return more
+    return ChunkedCons(chunk, more)
+
+
+@extend(proto._first, ChunkedCons)
+def _first(self):
+    assert isinstance(self, ChunkedCons)
+    return self.first()
+
+@extend(proto._next, ChunkedCons)
+def _next(self):
+    assert isinstance(self, ChunkedCons)
+    return self.next()
+
+@extend(proto._seq, ChunkedCons)
+def _seq(self):
+    assert isinstance(self, ChunkedCons)
+    return self
+
+@extend(proto._chunked_first, ChunkedCons)
+def _chunked_first(self):
+    assert isinstance(self, ChunkedCons)
+    return self._chunk
+
+@extend(proto._chunked_next, ChunkedCons)
+def _chunked_next(self):
+    assert isinstance(self, ChunkedCons)
+    return rt.seq(self._more)
+
+@extend(proto._reduce, ChunkedCons)
+def _reduce(self, f, init):
+    s = self
+    while s is not nil:
+        if not isinstance(s, ChunkedCons):
+            return rt._reduce(s, f, init)
+        init = s._chunk.reduce(f, init)
+        if rt.reduced_QMARK_(init):
+            return rt.deref(init)
+        s = rt.seq(s._more)
+    return init
+
+@extend(proto._hash, ChunkedCons)
+def _hash(self):
+    assert isinstance(self, ChunkedCons)
+    return rt.wrap(intmask(self.coll_hash()))
+
+@extend(proto._meta, ChunkedCons)
+def _meta(self):
+    assert isinstance(self, ChunkedCons)
+    return self.meta()
+
+@extend(proto._with_meta, ChunkedCons)
+def _with_meta(self, meta):
+    assert isinstance(self, ChunkedCons)
+    return self.with_meta(meta)
+
+
+@extend(proto._count, ArrayChunk)
+def _count(self):
+    assert isinstance(self, ArrayChunk)
+    return rt.wrap(self.count())
+
+@extend(proto._nth, ArrayChunk)
+def _nth(self, idx):
+    assert isinstance(self, ArrayChunk)
+    i = idx.int_val()
+    affirm(0 <= i < self.count(), u"Index out of Range")
+    return self.nth(i)
+
+@extend(proto._nth_not_found, ArrayChunk)
+def _nth_not_found(self, idx, not_found):
+    assert isinstance(self, ArrayChunk)
+    i = idx.int_val()
+    if 0 <= i < self.count():
+        return self.nth(i)
+    return not_found
+
+@extend(proto._reduce, ArrayChunk)
+def _chunk_reduce(self, f, init):
+    assert isinstance(self, ArrayChunk)
+    init = self.reduce(f, init)
+    if rt.reduced_QMARK_(init):
+        return rt.deref(init)
+    return init
+
+
+## Chunked seqs of vectors and strings. The rest of the seq after a chunk is
+## only made when it's asked for.
+
+class VectorChunksFn(NativeFn):
+    def __init__(self, vector, idx):
+        self._vector = vector
+        self._idx = idx
+
+    def invoke(self, args):
+        return vector_chunked_seq(self._vector, self._idx)
+
+def vector_chunked_seq(vector, idx):
+    """The chunks of vector from idx on, sharing the vector's own leaf arrays."""
+    if idx >= vector._cnt:
+        return nil
+    items = vector.array_for(idx)
+    offset = idx & 0x01f
+    end = min(len(items), vector._cnt - (idx - offset))
+    return ChunkedCons(ArrayChunk(items, offset, end),
+                       LazySeq(VectorChunksFn(vector, idx + end - offset)))
+
+@extend(proto._seq, PersistentVector)
+def _vector_seq(self):
+    assert isinstance(self, PersistentVector)
+    return vector_chunked_seq(self, 0)
+
+
+class StringChunksFn(NativeFn):
+    def __init__(self, s, idx):
+        self._s = s
+        self._idx = idx
+
+    def invoke(self, args):
+        return string_chunked_seq(self._s, self._idx)
+
+def string_chunked_seq(s, idx):
+    """The chars of s from idx on, in chunks of CHUNK_SIZE."""
+    size = len(s._str)
+    if idx >= size:
+        return nil
+    end = min(idx + CHUNK_SIZE, size)
+    items = [None] * (end - idx)
+    for x in range(idx, end):
+        items[x - idx] = Character(ord(s._str[x]))
+    return ChunkedCons(ArrayChunk(items, 0, len(items)), LazySeq(StringChunksFn(s, end)))
+
+@extend(proto._seq, String)
+def _string_seq(self):
+    assert isinstance(self, String)
+    return string_chunked_seq(self, 0)
+
+
+## Natives for building and taking apart chunked seqs, and for map, filter
+## and keep to work on a chunk at a time.
+
+def chunk_arg(c):
+    affirm(isinstance(c, ArrayChunk), u"Expected a chunk")
+    assert isinstance(c, ArrayChunk)
+    return c
+
+@as_var("chunk-buffer")
+def chunk_buffer(capacity):
+    """(chunk-buffer capacity)
+       Returns a buffer to chunk-append up to capacity items to."""
+    affirm(isinstance(capacity, Integer), u"Chunk buffer capacity must be an Integer")
+    return ChunkBuffer(capacity.int_val())
+
+@as_var("chunk-append")
+def chunk_append(buffer, x):
+    """(chunk-append buffer x)
+       Adds x to the end of a chunk buffer."""
+    affirm(isinstance(buffer, ChunkBuffer), u"Expected a chunk buffer")
+    assert isinstance(buffer, ChunkBuffer)
+    buffer.add(x)
+    return buffer
+
+@as_var("chunk")
+def chunk(buffer):
+    """(chunk buffer)
+       Returns a chunk of the items added to a chunk buffer."""
+    affirm(isinstance(buffer, ChunkBuffer), u"Expected a chunk buffer")
+    assert isinstance(buffer, ChunkBuffer)
+    return buffer.chunk()
+
+@as_var("chunk-cons")
+def _chunk_cons(chunk, more):
+    """(chunk-cons chunk more)
+       Returns a seq of the items of chunk followed by the seq more."""
+    return chunk_cons(chunk_arg(chunk), more)
+
+@as_var("chunked-seq?")
+def chunked_seq_QMARK_(s):
+    """(chunked-seq? s)
+       Returns true if s is a seq that can be walked a chunk at a time."""
+    return true if rt._satisfies_QMARK_(proto.IChunkedSeq, s) else false
+
+@as_var("chunk-first")
+def chunk_first(s):
+    """(chunk-first s)
+       Returns the first chunk of a chunked seq."""
+    return proto._chunked_first.invoke([s])
+
+@as_var("chunk-next")
+def chunk_next(s):
+    """(chunk-next s)
+       Returns the seq of the items after the first chunk of a chunked seq, or nil."""
+    return proto._chunked_next.invoke([s])
+
+@as_var("chunk-rest")
+def chunk_rest(s):
+    """(chunk-rest s)
+       Returns the seq of the items after the first chunk of a chunked seq, or ()."""
+    more = proto._chunked_next.invoke([s])
+    return rt.list() if more is nil else more
+
+@as_var("-map-chunk")
+def _map_chunk(f, chunk):
+    chunk = chunk_arg(chunk)
+    items = [None] * chunk.count()
+    for x in range(chunk.count()):
+        items[x] = f.invoke([chunk.nth(x)])
+    return ArrayChunk(items, 0, len(items))
+
+@as_var("-filter-chunk")
+def _filter_chunk(pred, chunk):
+    chunk = chunk_arg(chunk)
+    items = []
+    for x in range(chunk.count()):
+        item = chunk.nth(x)
+        if rt.is_true(pred.invoke([item])):
+            items.append(item)
+    return ArrayChunk(items, 0, len(items))
+
+@as_var("-keep-chunk")
+def _keep_chunk(f, chunk):
+    chunk = chunk_arg(chunk)
+    items = []
+    for x in range(chunk.count()):
+        result = f.invoke([chunk.nth(x)])
+        if rt.is_true(result):
+            items.append(result)
+    return ArrayChunk(items, 0, len(items))
@@ -7,6 +7,7 @@ from rpython.rlib.listsort import TimSort
 from rpython.rlib.jit import elidable_promote, promote
 from rpython.rlib.objectmodel import we_are_translated
 import rpython.rlib.jit as jit
+import rpython.rlib.rthread as rthread
 import pixie.vm.rt as rt
 
 
@@ -79,17 +80,6 @@ def slice_from_start(from_list, count, extra=r_uint(0)):
     return new_lst
 
 
-# class TailCall(object.Object):
-#     _type = object.Type("TailCall")
-#     __immutable_fields_ = ["_f", "_args"]
-#     def __init__(self, f, args):
-#         self._f = f
-#         self._args = args
-#
-#     def run(self):
-#         return self._f._invoke(self._args)
-
-
 class BaseCode(object.Object):
     _immutable_fields_ = ["_meta", "_name"]
     def __init__(self):
@@ -299,20 +289,25 @@ class VariadicCode(BaseCode):
         return self.invoke_with(args, self)
 
     def invoke_with(self, args, self_fn):
+        return self._code.invoke_with(self.pack_args(args), self_fn)
+
+    def pack_args(self, args):
+        """The args the code is run with: the required ones, then an array of the rest."""
         from pixie.vm.array import array
         argc = len(args)
         if self._required_arity == 0:
-            return self._code.invoke_with([array(args)], self_fn)
+            return [array(args)]
         if argc == self._required_arity:
             new_args = resize_list(args, len(args) + 1)
             new_args[len(args)] = array([])
-            return self._code.invoke_with(new_args, self_fn)
+            return new_args
         elif argc > self._required_arity:
             start = slice_from_start(args, self._required_arity, 1)
             rest = slice_to_end(args, self._required_arity)
             start[self._required_arity] = array(rest)
-            return self._code.invoke_with(start, self_fn)
+            return start
         affirm(False, u"Got " + unicode(str(argc)) + u" arg(s) need at least " + unicode(str(self._required_arity)))
+        return args
 
 
 class Closure(BaseCode):
@@ -379,39 +374,76 @@ class Undefined(object.Object):
 undefined = Undefined()
 
 
+class LazyRoot(object.Object):
+    """Stands in for the root of a var whose value hasn't been built yet (see
+    the pxic reader). The var replaces it with the real value on first deref."""
+    _type = object.Type(u"pixie.stdlib.LazyRoot")
+
+    def type(self):
+        return LazyRoot._type
+
+    def materialize(self):
+        raise NotImplementedError()
+
+
+class BindingFrame(object.Object):
+    """One level of the dynamic binding stack: the bindings visible while it's
+    on top, and the frame below it. Frames are never changed once made (a set!
+    replaces the top frame), so a captured frame can be put back later."""
+    _type = object.Type(u"pixie.stdlib.BindingFrame")
+    _immutable_fields_ = ["_bindings", "_prev"]
+
+    def type(self):
+        return BindingFrame._type
+
+    def __init__(self, bindings, prev):
+        self._bindings = bindings
+        self._prev = prev
+
+_current_frame = rthread.ThreadLocalReference(BindingFrame)
+
 class DynamicVars(py_object):
+    """The binding stack of each thread. Vars that have never been bound skip
+    it entirely, see Var.get_dynamic_value."""
     def __init__(self):
-        self._vars = rt.cons(rt.hashmap(), nil)
+        self._root_frame = BindingFrame(rt.hashmap(), None)
+
+    def current_frame(self):
+        frame = _current_frame.get()
+        if frame is None:
+            return self._root_frame
+        return frame
 
     def push_binding_frame(self):
-        self._vars = rt.cons(rt.first(self._vars), self._vars)
+        frame = self.current_frame()
+        _current_frame.set(BindingFrame(frame._bindings, frame))
 
     def pop_binding_frame(self):
-        self._vars = rt.next(self._vars)
-
-    def current_frame(self):
-        return rt.first(self._vars)
+        prev = self.current_frame()._prev
+        affirm(prev is not None, u"Binding frame popped more often than pushed")
+        _current_frame.set(prev)
 
     def get_current_frames(self):
-        return self._vars
+        return self.current_frame()
 
-    def set_current_frames(self, vars):
-        self._vars = vars
+    def set_current_frames(self, frame):
+        affirm(isinstance(frame, BindingFrame), u"Var frames must be a BindingFrame")
+        _current_frame.set(frame)
 
     def get_var_value(self, var, not_found):
-        return rt._val_at(self.current_frame(), var, not_found)
+        bindings = self.current_frame()._bindings
+        return rt._val_at(bindings, var, not_found)
 
     def set_var_value(self, var, val):
-        cur_frame = self.current_frame()
-        self.pop_binding_frame()
-        self._vars = rt.cons(rt._assoc(cur_frame, var, val), self._vars)
+        frame = self.current_frame()
+        _current_frame.set(BindingFrame(rt._assoc(frame._bindings, var, val), frame._prev))
 
 
 
 
 class Var(BaseCode):
     _type = object.Type(u"pixie.stdlib.Var")
-    _immutable_fields_ = ["_ns_ref"]
+    _immutable_fields_ = ["_ns_ref", "_bound?"]
 
     def type(self):
         return Var._type
@@ -423,6 +455,7 @@ class Var(BaseCode):
         self._name = name
         self._root = undefined
         self._dynamic = False
+        self._bound = False
 
     def set_root(self, o):
         affirm(o is not None, u"Invalid var set")
@@ -432,15 +465,31 @@ class Var(BaseCode):
 
     def set_value(self, val):
         affirm(self._dynamic, u"Can't set the value of a non-dynamic var")
+        if not self._bound:
+            self._bound = True
         _dynamic_vars.set_var_value(self, val)
         return self
 
     def set_dynamic(self):
+        if isinstance(self._root, LazyRoot):
+            self.materialize_root(self._root)
         self._dynamic = True
         self._ns_ref._rev += 1
 
+    @jit.dont_look_inside
+    def materialize_root(self, lazy):
+        assert isinstance(lazy, LazyRoot)
+        val = lazy.materialize()
+        if self._root is lazy:
+            self.set_root(val)
+        return val
+
 
     def get_dynamic_value(self):
+        # Most dynamic vars are never bound, for those the JIT folds this
+        # down to a read of the root
+        if not self._bound:
+            return self._root
         return _dynamic_vars.get_var_value(self, self._root)
 
 
@@ -472,6 +521,8 @@ class Var(BaseCode):
                     return self.get_root(self.ns_ref()._rev)
         else:
             val = self.get_root(self.ns_ref()._rev)
+            if isinstance(val, LazyRoot):
+                val = self.materialize_root(val)
             affirm(val is not undefined, u"Var " + self._name + u" is undefined")
             return val
 
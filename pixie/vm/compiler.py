@@ -2,6 +2,7 @@ from pixie.vm.object import affirm
 from pixie.vm.primitives import nil, true, Bool
 from pixie.vm.persistent_vector import EMPTY, PersistentVector
 from pixie.vm.persistent_hash_set import PersistentHashSet
+from pixie.vm.persistent_hash_map import PersistentHashMap
 import pixie.vm.numbers as numbers
 import pixie.vm.symbol as symbol
 import pixie.vm.code as code
@@ -9,6 +10,7 @@ from pixie.vm.keyword import Keyword, keyword
 from pixie.vm.string import Character, String
 from pixie.vm.atom import Atom
 from rpython.rlib.rarithmetic import r_uint, intmask
+from rpython.rlib.longlong2float import float2longlong
 from pixie.vm.persistent_list import EmptyList
 from pixie.vm.cons import cons
 from pixie.vm.persistent_list import create_from_list
@@ -63,23 +65,34 @@ def clone(lst):
 
 
 
+class LocalScope(object):
+    """A local binding, linked to the bindings made before it. Adding a local
+    is O(1) and lookups walk back from the newest binding."""
+    def __init__(self, name, local, parent):
+        self.name = name
+        self.local = local
+        self.parent = parent
+
+
 class Context(object):
     def __init__(self, name, argc, parent_ctx):
         if parent_ctx is not None:
             affirm(isinstance(parent_ctx, Context), u"Parent Context must be a Context")
-            locals = parent_ctx.locals[-1].copy()
-            for x in locals:
-                locals[x] = Closure(locals[x], parent_ctx)
-        else:
-            locals = {}
+        self.parent_ctx = parent_ctx
         self.argc = argc
+        self.required_args = -1
         self.bytecode = []
         self.consts = []
-        self.locals = [locals]
+        self.const_ids = {}
+        self.int_consts = {}
+        self.float_consts = {}
+        self.str_consts = {}
+        self.locals = None
         self._sp = r_uint(0)
         self._max_sp = 0
         self.can_tail_call = False
         self.closed_overs = []
+        self.closed_over_idxs = {}
         if name == default_fn_name and parent_ctx:
             self.name = parent_ctx.name + u"_fn"
         else:
@@ -122,41 +135,76 @@ class Context(object):
 
     def pop_locals(self, i=1):
         for x in range(i):
-            self.locals.pop()
+            assert self.locals is not None
+            self.locals = self.locals.parent
 
     def add_local(self, name, arg):
-        self.locals.append(self.locals[-1].copy())
-        self.locals[-1][name] = arg
+        self.locals = LocalScope(name, arg, self.locals)
 
 
     def get_local(self, s_name):
-        local = self.locals[-1].get(s_name, None)
-        if local is not None and isinstance(local, Closure):
-            idx = 0
-            for x in self.closed_overs:
-                if x is local:
-                    break
-                idx += 1
-            if isinstance(local.local, Closure):
-                self.closed_overs.append(local.ctx.get_local(s_name))
-            else:
-                self.closed_overs.append(local.local)
-
-            return ClosureCell(idx)
-        return local
+        scope = self.locals
+        while scope is not None:
+            if scope.name == s_name:
+                return scope.local
+            scope = scope.parent
+
+        if self.parent_ctx is None:
+            return None
+
+        # Locals of the enclosing fns are closed over the first time they're
+        # used, and only once, no matter how often they are used after that
+        idx = self.closed_over_idxs.get(s_name, -1)
+        if idx == -1:
+            local = self.parent_ctx.get_local(s_name)
+            if local is None:
+                return None
+            idx = len(self.closed_overs)
+            self.closed_overs.append(local)
+            self.closed_over_idxs[s_name] = idx
+        return ClosureCell(idx)
 
 
     def undef_local(self):
-        self.locals.pop()
+        self.pop_locals()
 
     def add_const(self, v):
-        for x in range(len(self.consts)):
-            if self.consts[x] is v:
-                return r_uint(x)
+        """Returns the index of v in the constant pool, adding it if needed.
+        Numbers and strings share a slot with an equal constant, everything
+        else only with the same object."""
+        if isinstance(v, numbers.Integer):
+            idx = self.int_consts.get(v.int_val(), -1)
+            if idx == -1:
+                idx = self.append_const(v)
+                self.int_consts[v.int_val()] = idx
+            return r_uint(idx)
+
+        if isinstance(v, numbers.Float):
+            # Keyed by the bits, so 0.0 and -0.0 stay apart and NaN is found
+            bits = float2longlong(v.float_val())
+            idx = self.float_consts.get(bits, -1)
+            if idx == -1:
+                idx = self.append_const(v)
+                self.float_consts[bits] = idx
+            return r_uint(idx)
+
+        if isinstance(v, String):
+            idx = self.str_consts.get(v._str, -1)
+            if idx == -1:
+                idx = self.append_const(v)
+                self.str_consts[v._str] = idx
+            return r_uint(idx)
+
+        idx = self.const_ids.get(v, -1)
+        if idx == -1:
+            idx = self.append_const(v)
+            self.const_ids[v] = idx
+        return r_uint(idx)
 
+    def append_const(self, v):
         idx = len(self.consts)
         self.consts.append(v)
-        return r_uint(idx)
+        return idx
 
     def push_const(self, v):
         self.bytecode.append(code.LOAD_CONST)
@@ -186,13 +234,18 @@ class Context(object):
 class RecurPoint(object):
     pass
 
+class RecurNeedsLoop(Exception):
+    pass
+
 class FunctionRecurPoint(RecurPoint):
+    """The recur point of a fn body that was compiled without a loop around
+    its args. Only a macro can hide a recur from uses_recur, the fn is then
+    compiled again with the loop."""
     def __init__(self):
         pass
 
     def emit(self, ctx, argc):
-        ctx.bytecode.append(code.RECUR)
-        ctx.bytecode.append(argc)
+        raise RecurNeedsLoop()
 
 class LoopRecurPoint(RecurPoint):
     def __init__(self, argc, ctx):
@@ -236,11 +289,6 @@ class Self(LocalType):
         ctx.bytecode.append(code.PUSH_SELF)
         ctx.add_sp(1)
 
-class Closure(LocalType):
-    def __init__(self, local, ctx):
-        self.local = local
-        self.ctx = ctx
-
 class ClosureCell(LocalType):
     def __init__(self, idx):
         self.idx = r_uint(idx)
@@ -295,8 +343,8 @@ class CompileMapRf(code.NativeFn):
         self._ctx = ctx
     def invoke(self, args):
         map_entry = args[1]
-        compile_form(rt.key(map_entry), self._ctx)
-        compile_form(rt.val(map_entry), self._ctx)
+        compile_non_tail(rt.key(map_entry), self._ctx)
+        compile_non_tail(rt.val(map_entry), self._ctx)
         return nil
 
 def compile_map_literal(form, ctx):
@@ -336,6 +384,37 @@ def compile_meta(meta, ctx):
     ctx.bytecode.append(1)
     ctx.sub_sp(1)
 
+class ConstantEntriesRf(code.NativeFn):
+    def invoke(self, args):
+        if args[0] is not true:
+            return args[0]
+        map_entry = args[1]
+        if is_constant_literal(rt._key(map_entry)) and is_constant_literal(rt._val(map_entry)):
+            return true
+        return nil
+
+def is_constant_literal(form):
+    """True if the form evaluates to itself: scalars, and vector, map and set
+    literals that only hold such forms. The compiler can emit these as a single
+    constant instead of rebuilding them every time they're run."""
+    if form is nil or isinstance(form, Bool) or isinstance(form, numbers.Number):
+        return True
+    if isinstance(form, Keyword) or isinstance(form, String) or isinstance(form, Character):
+        return True
+
+    if isinstance(form, PersistentVector):
+        for x in range(rt.count(form)):
+            if not is_constant_literal(rt.nth(form, rt.wrap(x))):
+                return False
+        return True
+    if isinstance(form, PersistentHashSet):
+        # Walks the set's backing map, its items are both keys and vals there
+        return rt._reduce(form._map, ConstantEntriesRf(), true) is true
+    if isinstance(form, PersistentHashMap):
+        return rt._reduce(form, ConstantEntriesRf(), true) is true
+
+    return False
+
 def maybe_oop_invoke(form):
     head = rt.first(form)
     if isinstance(rt.first(form), symbol.Symbol) and rt.name(head).startswith(".-"):
@@ -417,12 +496,18 @@ def compile_form(form, ctx):
         ctx.push_const(form)
         return
 
+    if (isinstance(form, PersistentVector) or isinstance(form, PersistentHashSet)
+        or isinstance(form, PersistentHashMap)) and is_constant_literal(form):
+        # The literal's metadata is already attached, so it's kept as is
+        ctx.push_const(form)
+        return
+
     if isinstance(form, PersistentVector):
         size = rt.count(form)
         #assert rt.count(form).int_val() == 0
         ctx.push_const(code.intern_var(u"pixie.stdlib", u"vector"))
         for x in range(size):
-            compile_form(rt.nth(form, rt.wrap(x)), ctx)
+            compile_non_tail(rt.nth(form, rt.wrap(x)), ctx)
 
         ctx.bytecode.append(code.INVOKE)
         ctx.bytecode.append(r_uint(size + 1))
@@ -450,6 +535,26 @@ def compile_form(form, ctx):
 
     raise Exception("Can't compile ")
 
+def compile_non_tail(form, ctx):
+    """Compiles a form whose value is used by the code after it, so calls in it
+    can't be tail calls even when the form is in tail position."""
+    ctc = ctx.can_tail_call
+    ctx.disable_tail_call()
+    compile_form(form, ctx)
+    if ctc:
+        ctx.enable_tail_call()
+
+def compile_body(body, ctx):
+    """Compiles the forms of a body, leaving the value of the last one.
+    Only the last form keeps the tail position of the body."""
+    while True:
+        if rt.next(body) is nil:
+            compile_form(rt.first(body), ctx)
+            return
+        compile_non_tail(rt.first(body), ctx)
+        ctx.pop()
+        body = rt.next(body)
+
 def compile_platform_plus(form, ctx):
     ctc = ctx.can_tail_call
     ctx.disable_tail_call()
@@ -518,21 +623,20 @@ def compile_fn(form, ctx):
 
 LOOP = symbol.symbol(u"loop*")
 
-def compile_fn_body(name, args, body, ctx):
+def compile_fn_ctx(name, args, body, ctx, with_loop):
     new_ctx = Context(rt.name(name), rt.count(args), ctx)
-    required_args = add_args(rt.name(name), args, new_ctx)
+    new_ctx.required_args = add_args(rt.name(name), args, new_ctx)
 
-    affirm(isinstance(name, symbol.Symbol), u"Function names must be symbols")
+    if with_loop:
+        arg_syms = EMPTY
+        for x in range(rt.count(args)):
+            sym = rt.nth(args, rt.wrap(x))
+            if not rt.name(sym) == u"&":
+                arg_syms = rt.conj(rt.conj(arg_syms, sym), sym)
 
-    arg_syms = EMPTY
-    for x in range(rt.count(args)):
-        sym = rt.nth(args, rt.wrap(x))
-        if not rt.name(sym) == u"&":
-            arg_syms = rt.conj(rt.conj(arg_syms, sym), sym)
-
-    body = rt.list(rt.cons(LOOP, rt.cons(arg_syms, body)))
-
-    #new_ctx.push_recur_point(FunctionRecurPoint())
+        body = rt.list(rt.cons(LOOP, rt.cons(arg_syms, body)))
+    else:
+        new_ctx.push_recur_point(FunctionRecurPoint())
 
     new_ctx.disable_tail_call()
     if body is nil:
@@ -546,6 +650,38 @@ def compile_fn_body(name, args, body, ctx):
             if body is not nil:
                 new_ctx.pop()
     new_ctx.bytecode.append(code.RETURN)
+    return new_ctx
+
+def uses_recur(form):
+    """True if recur shows up in form outside of quoted forms and nested fn*s.
+    Forms aren't macroexpanded, so this can miss a recur a macro makes."""
+    if isinstance(form, symbol.Symbol):
+        return rt.name(form) == u"recur"
+    if rt.seq_QMARK_(form) is true:
+        head = rt.first(form)
+        if isinstance(head, symbol.Symbol) and (rt.name(head) == u"quote" or rt.name(head) == u"fn*"):
+            return False
+        while form is not nil:
+            if uses_recur(rt.first(form)):
+                return True
+            form = rt.next(form)
+    return False
+
+def compile_fn_body(name, args, body, ctx):
+    affirm(isinstance(name, symbol.Symbol), u"Function names must be symbols")
+
+    # The args are only rebound by a loop when the body recurs to the fn,
+    # otherwise they are read straight from the frame's args
+    new_ctx = None
+    if not uses_recur(body):
+        try:
+            new_ctx = compile_fn_ctx(name, args, body, ctx, False)
+        except RecurNeedsLoop:
+            pass
+    if new_ctx is None:
+        new_ctx = compile_fn_ctx(name, args, body, ctx, True)
+    required_args = new_ctx.required_args
+
     closed_overs = new_ctx.closed_overs
     if len(closed_overs) == 0:
         ctx.push_const(new_ctx.to_code(required_args))
@@ -573,15 +709,12 @@ def compile_if(form, ctx):
     form = rt.next(form)
     els = rt.first(form)
 
-    ctx.disable_tail_call()
-    compile_form(test, ctx)
+    compile_non_tail(test, ctx)
     ctx.bytecode.append(code.COND_BR)
     ctx.sub_sp(1)
     sp1 = ctx.sp()
     cond_lbl = ctx.label()
 
-    ctx.enable_tail_call()
-
     compile_form(then, ctx)
     ctx.bytecode.append(code.JMP)
     ctx.sub_sp(1)
@@ -610,21 +743,12 @@ def compile_def(form, ctx):
 
 
     ctx.push_const(var)
-    compile_form(val, ctx)
+    compile_non_tail(val, ctx)
     ctx.bytecode.append(code.SET_VAR)
     ctx.sub_sp(1)
 
 def compile_do(form, ctx):
-    form = rt.next(form)
-
-    while True:
-        compile_form(rt.first(form), ctx)
-        form = rt.next(form)
-
-        if form is nil:
-            return
-        else:
-            ctx.pop()
+    compile_body(rt.next(form), ctx)
 
 def compile_quote(form, ctx):
     data = rt.first(rt.next(form))
@@ -678,14 +802,7 @@ def compile_let(form, ctx):
     if ctc:
         ctx.enable_tail_call()
 
-    while True:
-        compile_form(rt.first(body), ctx)
-        body = rt.next(body)
-
-        if body is nil:
-            break
-        else:
-            ctx.pop()
+    compile_body(body, ctx)
 
     ctx.bytecode.append(code.POP_UP_N)
     ctx.sub_sp(binding_count)
@@ -716,14 +833,7 @@ def compile_loop(form, ctx):
         ctx.enable_tail_call()
 
     ctx.push_recur_point(LoopRecurPoint(binding_count, ctx))
-    while True:
-        compile_form(rt.first(body), ctx)
-        body = rt.next(body)
-
-        if body is nil:
-            break
-        else:
-            ctx.pop()
+    compile_body(body, ctx)
 
     ctx.pop_recur_point()
     ctx.bytecode.append(code.POP_UP_N)
@@ -756,7 +866,7 @@ def compile_catch(form, ctx):
 def compile_yield(form, ctx):
     affirm(rt.count(form) == 2, u"yield takes a single argument")
     arg = rt.first(rt.next(form))
-    compile_form(arg, ctx)
+    compile_non_tail(arg, ctx)
     ctx.bytecode.append(code.YIELD)
 
 def compile_in_ns(form, ctx):
@@ -776,14 +886,7 @@ def compile_local_macro(form, ctx):
 
     ctx.add_local(rt.name(sym), LocalMacro(bind_form))
 
-    while True:
-        compile_form(rt.first(body), ctx)
-        body = rt.next(body)
-
-        if body is nil:
-            break
-        else:
-            ctx.pop()
+    compile_body(body, ctx)
 
     ctx.pop_locals()
 
@@ -844,12 +947,12 @@ def compile_fn_call(form, ctx):
     if ctc:
         ctx.enable_tail_call()
 
-    #if ctx.can_tail_call:
-    #    ctx.bytecode.append(code.TAIL_CALL)
-    #else:
     if meta is not nil:
         ctx.debug_points[len(ctx.bytecode)] = rt.interpreter_code_info(meta)
-    ctx.bytecode.append(code.INVOKE)
+    if ctc:
+        ctx.bytecode.append(code.TAIL_CALL)
+    else:
+        ctx.bytecode.append(code.INVOKE)
 
     ctx.bytecode.append(cnt)
     ctx.sub_sp(r_uint(cnt - 1))
@@ -2,6 +2,9 @@ import pixie.vm.object as object
 from pixie.vm.primitives import nil
 import pixie.vm.stdlib as proto
 from  pixie.vm.code import extend, as_var
+from rpython.rlib.rarithmetic import r_uint, intmask
+import pixie.vm.rt as rt
+import pixie.vm.util as util
 
 
 class Cons(object.Object):
@@ -14,6 +17,7 @@ class Cons(object.Object):
         self._first = head
         self._next = tail
         self._meta = meta
+        self._hash = r_uint(0)
 
     def first(self):
         return self._first
@@ -25,7 +29,20 @@ class Cons(object.Object):
         return self._meta
 
     def with_meta(self, meta):
-        return Cons(self._first, self._next, meta)
+        c = Cons(self._first, self._next, meta)
+        c._hash = self._hash
+        return c
+
+    def coll_hash(self):
+        if self._hash == 0:
+            acc = util.HashingState()
+            acc.update_hash_ordered(self._first)
+            seq = rt.seq(self._next)
+            while seq is not nil:
+                acc.update_hash_ordered(rt.first(seq))
+                seq = rt.next(seq)
+            self._hash = acc.finish_hash()
+        return self._hash
 
 
 @extend(proto._first, Cons._type)
@@ -43,6 +60,11 @@ def _seq(self):
     assert isinstance(self, Cons)
     return self
 
+@extend(proto._hash, Cons)
+def _hash(self):
+    assert isinstance(self, Cons)
+    return rt.wrap(intmask(self.coll_hash()))
+
 @extend(proto._meta, Cons)
 def _meta(self):
     assert isinstance(self, Cons)
@@ -45,9 +45,28 @@ class Frame(object):
         self.debug_points = code_obj.get_debug_points()
         self.finished = False
         self._is_continuation = 0
+        self.tail_frame = None
         if code_obj is not None:
             self.unpack_code_obj()
 
+    @unroll_safe
+    def restart(self, args, self_obj):
+        """Runs the frame's code again from the start with args, for a call of
+        that code in tail position. The array fields of a virtualizable can't
+        be replaced, so args has to be as long as the frame's args. They are
+        written into the list the frame was made with, so callers that use
+        their args list again after a call have to pass a copy."""
+        assert len(args) == len(self.args)
+        x = 0
+        while x < len(args):
+            self.args[x] = args[x]
+            x += 1
+        while self.sp > 0:
+            self.sp -= 1
+            self.stack[self.sp] = None
+        self.ip = r_uint(0)
+        self.self_obj = self_obj
+
     def set_continuation(self):
         self._is_continuation = 1
 
@@ -173,14 +192,41 @@ class ShallowContinuation(Object):
         self._val = val
         return self._val
 
-def interpret(code_obj=None, args=[], self_obj = None, frame=None):
+def tail_call_code(fn, args):
+    """Returns the interpreted code that fn runs for args and the args as that
+    code takes them, or None if fn isn't interpreted code and has to be invoked
+    as usual."""
+    self_fn = fn
+    if isinstance(fn, code.MultiArityFn):
+        fn = fn.get_fn(len(args))
+    if isinstance(fn, code.VariadicCode):
+        args = fn.pack_args(args)
+        fn = fn._code
+    if isinstance(fn, code.Code):
+        if self_fn is fn and len(args) != fn.get_arity():
+            # Let invoke throw the arity error
+            return None, args
+        return fn, args
+    if isinstance(fn, code.Closure):
+        return fn, args
+    return None, args
 
+def interpret(code_obj=None, args=[], self_obj = None, frame=None):
+    """Runs frames until one returns. A frame that makes a call in tail position
+    to other interpreted code hands the frame for it back here instead of
+    growing the stack, see run_frame."""
     if frame is None:
         assert code_obj is not None
         frame = Frame(code_obj, args, self_obj or code_obj)
 
+    while True:
+        val = run_frame(frame)
+        tail_frame = frame.tail_frame
+        if tail_frame is None:
+            return val
+        frame = tail_frame
 
-
+def run_frame(frame):
     while True:
         jitdriver.jit_merge_point(bc=frame.bc,
                                   ip=frame.ip,
@@ -219,16 +265,42 @@ def interpret(code_obj=None, args=[], self_obj = None, frame=None):
 
             continue
 
-        # if inst == code.TAIL_CALL:
-        #     argc = frame.get_inst()
-        #     fn = frame.nth(argc - 1)
-        #
-        #     assert isinstance(fn, code.BaseCode)
-        #
-        #     args = frame.pop_n(argc - 1)
-        #     frame.pop()
-        #
-        #     return code.TailCall(fn, args)
+        if inst == code.TAIL_CALL:
+            debug_ip = frame.ip
+            argc = frame.get_inst()
+            fn = frame.nth(argc - 1)
+
+            args = frame.pop_n(argc - 1)
+            frame.pop()
+            try:
+                # The frame of a generator is never replaced, as its
+                # continuation holds on to it
+                tail_code = None
+                if not frame.is_continuation():
+                    tail_code, args = tail_call_code(fn, args)
+                if tail_code is None:
+                    frame.push(fn.invoke(args))
+                    continue
+            except WrappedException as ex:
+                dp = frame.debug_points.get(debug_ip - 1, None)
+                if dp:
+                    ex._ex._trace.append(dp)
+                raise
+
+            if tail_code is frame.code_obj and len(args) == len(frame.args):
+                # A fn calling itself, the loop goes on in this frame so the
+                # JIT can trace it as a loop
+                frame.restart(args, fn)
+                jitdriver.can_enter_jit(bc=frame.bc,
+                                      ip=frame.ip,
+                                      sp=frame.sp,
+                                      base_code=frame.base_code,
+                                      frame=frame,
+                                      is_continuation=frame._is_continuation)
+                continue
+
+            frame.tail_frame = Frame(tail_code, args, fn)
+            return nil
 
         if inst == code.ARG:
             arg = frame.get_inst()
@@ -0,0 +1,219 @@
+## Natives for pixie.data.binary: values encoded with the tags of the pxic
+## format, for sending data between processes or keeping it on disk.
+
+from pixie.vm.object import Object, Type, WrappedException, affirm
+from pixie.vm.code import as_var
+from pixie.vm.numbers import Integer
+from pixie.vm.primitives import nil
+from pixie.vm.libs.ffi import Buffer
+from pixie.vm.libs.pxic.writer import BufferWriter, write_object, append_varint
+from pixie.vm.libs.pxic.reader import BufferReader, read_obj
+from rpython.rlib.rstring import StringBuilder
+from rpython.rlib.rarithmetic import r_uint, intmask
+from rpython.rtyper.lltypesystem import rffi
+
+
+class Encoder(Object):
+    """Encodes values one message at a time. Strings and keywords are cached
+    across messages, so after the first message they are sent as an index.
+    The messages must be decoded in order by one Decoder."""
+    _type = Type(u"pixie.stdlib.BinaryEncoder")
+
+    def type(self):
+        return Encoder._type
+
+    def __init__(self):
+        self._wtr = BufferWriter()
+
+    def encode(self, obj):
+        wtr = self._wtr
+        obj_count = len(wtr._obj_cache)
+        str_count = len(wtr._string_cache)
+        try:
+            write_object(obj, wtr)
+        except WrappedException:
+            # Nothing of the failed value is sent, so the decoder must not
+            # be expected to know the strings and keywords it added
+            wtr.take_value()
+            forget_since(wtr._obj_cache, obj_count)
+            forget_since(wtr._string_cache, str_count)
+            raise
+        return wtr.take_value()
+
+
+def forget_since(cache, size):
+    for k in cache.keys():
+        if cache[k] >= size:
+            del cache[k]
+
+
+def forget_from(cache, size):
+    for idx in range(size, len(cache)):
+        del cache[idx]
+
+
+class Decoder(Object):
+    """Decodes the messages of an Encoder. Bytes fed to it are held until a
+    whole frame (see encode-frame) has come in."""
+    _type = Type(u"pixie.stdlib.BinaryDecoder")
+
+    def type(self):
+        return Decoder._type
+
+    def __init__(self):
+        self._rdr = BufferReader("")
+        self._rdr._data_only = True
+        # Bytes of the frames after the last one returned: what is left of
+        # _pending from _pos on, then the chunks fed since it was joined
+        self._pending = ""
+        self._pos = 0
+        self._chunks = []
+        self._available = 0
+
+    def decode(self, data):
+        rdr = self._rdr
+        rdr._buf = data
+        rdr._pos = 0
+        obj_count = len(rdr._obj_cache)
+        str_count = len(rdr._str_cache)
+        try:
+            obj = read_obj(rdr)
+            affirm(rdr.remaining() == 0, u"Extra bytes after the encoded value")
+        except WrappedException:
+            # As with the encoder, a failed message adds nothing to the caches
+            forget_from(rdr._obj_cache, obj_count)
+            forget_from(rdr._str_cache, str_count)
+            raise
+        return obj
+
+    def feed(self, data):
+        self._chunks.append(data)
+        self._available += len(data)
+
+    def byte_at(self, idx):
+        """Returns the byte idx bytes after the last frame returned."""
+        n = len(self._pending) - self._pos
+        if idx < n:
+            return ord(self._pending[self._pos + idx])
+        idx -= n
+        for chunk in self._chunks:
+            if idx < len(chunk):
+                return ord(chunk[idx])
+            idx -= len(chunk)
+        # Callers check _available first
+        assert False
+        return -1
+
+    def next_frame(self):
+        """Returns the next whole frame, or None if it hasn't all come in yet."""
+        size = r_uint(0)
+        shift = 0
+        pos = 0
+        while True:
+            if pos >= self._available:
+                return None
+            b = self.byte_at(pos)
+            pos += 1
+            size |= r_uint(b & 0x7F) << shift
+            if b < 0x80:
+                break
+            shift += 7
+        end = pos + intmask(size)
+        if end > self._available:
+            return None
+
+        if len(self._chunks) > 0:
+            # Joined once the frame is all in, not on every feed
+            sb = StringBuilder(self._available)
+            sb.append_slice(self._pending, self._pos, len(self._pending))
+            for chunk in self._chunks:
+                sb.append(chunk)
+            self._pending = sb.build()
+            self._pos = 0
+            self._chunks = []
+
+        start = self._pos + pos
+        stop = self._pos + end
+        assert start >= 0 and stop >= start
+        frame = self._pending[start:stop]
+        self._available -= end
+        if self._available == 0:
+            self._pending = ""
+            self._pos = 0
+        else:
+            self._pos = stop
+        return frame
+
+
+def to_buffer(data):
+    buffer = Buffer(len(data))
+    rffi.str2chararray(data, buffer.buffer(), len(data))
+    buffer.set_used_size(len(data))
+    return buffer
+
+def from_buffer(buffer, count=-1):
+    affirm(isinstance(buffer, Buffer), u"Expected a Buffer")
+    assert isinstance(buffer, Buffer)
+    n = intmask(buffer.count()) if count == -1 else count
+    affirm(0 <= n <= buffer.capacity(), u"Count is larger than the buffer")
+    return rffi.charpsize2str(buffer.buffer(), n)
+
+def encoder_arg(enc):
+    if enc is nil:
+        return Encoder()
+    affirm(isinstance(enc, Encoder), u"Expected an Encoder")
+    assert isinstance(enc, Encoder)
+    return enc
+
+def decoder_arg(dec):
+    if dec is nil:
+        return Decoder()
+    affirm(isinstance(dec, Decoder), u"Expected a Decoder")
+    assert isinstance(dec, Decoder)
+    return dec
+
+
+@as_var("pixie.data.binary.internal", "encoder")
+def encoder():
+    """(encoder)
+       Returns an encoder that caches strings and keywords across the values it encodes."""
+    return Encoder()
+
+@as_var("pixie.data.binary.internal", "decoder")
+def decoder():
+    """(decoder)
+       Returns a decoder for the values of one encoder, which must be decoded in order."""
+    return Decoder()
+
+@as_var("pixie.data.binary.internal", "-encode")
+def _encode(enc, obj):
+    return to_buffer(encoder_arg(enc).encode(obj))
+
+@as_var("pixie.data.binary.internal", "-decode")
+def _decode(dec, buffer):
+    return decoder_arg(dec).decode(from_buffer(buffer))
+
+@as_var("pixie.data.binary.internal", "-encode-frame")
+def _encode_frame(enc, obj):
+    data = encoder_arg(enc).encode(obj)
+    sb = StringBuilder(len(data) + 5)
+    append_varint(sb, len(data))
+    sb.append(data)
+    return to_buffer(sb.build())
+
+@as_var("pixie.data.binary.internal", "-feed!")
+def _feed(dec, buffer, count):
+    affirm(isinstance(dec, Decoder), u"Expected a Decoder")
+    affirm(isinstance(count, Integer), u"Expected an Integer count")
+    assert isinstance(dec, Decoder)
+    dec.feed(from_buffer(buffer, count.int_val()))
+    return dec
+
+@as_var("pixie.data.binary.internal", "-decode-frame")
+def _decode_frame(dec, not_found):
+    affirm(isinstance(dec, Decoder), u"Expected a Decoder")
+    assert isinstance(dec, Decoder)
+    frame = dec.next_frame()
+    if frame is None:
+        return not_found
+    return dec.decode(frame)
@@ -0,0 +1,294 @@
+## Natives for pixie.edn: a reader for data only. It reads straight from a
+## string by index, without the line and column metadata, binding frames
+## and EOF exceptions of the code reader in pixie.vm.reader.
+
+py_object = object
+from pixie.vm.object import affirm, runtime_error
+from pixie.vm.code import as_var
+from pixie.vm.primitives import nil, true, false
+from pixie.vm.cons import cons
+from pixie.vm.symbol import symbol
+from pixie.vm.keyword import keyword
+from pixie.vm.string import String
+from pixie.vm.persistent_vector import EMPTY as EMPTY_VECTOR
+from pixie.vm.persistent_hash_map import EMPTY as EMPTY_MAP
+from pixie.vm.persistent_hash_set import EMPTY as EMPTY_SET
+from pixie.vm.persistent_list import EmptyList
+from pixie.vm.libs.ffi import Buffer
+from pixie.vm.util import unicode_from_utf8
+import pixie.vm.reader as reader
+import pixie.vm.rt as rt
+from rpython.rlib.rstring import UnicodeBuilder
+from rpython.rlib.rarithmetic import intmask
+from rpython.rtyper.lltypesystem import rffi
+
+
+# Longer runs of digits could overflow, they go through reader.parse_number
+MAX_FAST_INT_DIGITS = 18
+
+
+def is_delimiter(ch):
+    return ch in u"\r\n\t ,()[]{}\";"
+
+
+class DataReader(py_object):
+    """Reads the forms of a string. Only data can be read: no metadata,
+    quoting, syntax quoting, reader fns or auto-resolved keywords."""
+
+    def __init__(self, s):
+        self._str = s
+        self._idx = 0
+
+    def at_end(self):
+        return self._idx >= len(self._str)
+
+    def error(self, msg):
+        runtime_error(msg)
+
+    def eof_error(self):
+        runtime_error(u"Unexpected EOF while reading",
+                      u"pixie.stdlib/EOFWhileReadingException")
+
+    def skip_whitespace(self):
+        s = self._str
+        idx = self._idx
+        while idx < len(s):
+            ch = s[idx]
+            if ch == u";":
+                while idx < len(s) and s[idx] != u"\n":
+                    idx += 1
+            elif ch in u"\r\n\t ,":
+                idx += 1
+            else:
+                break
+        self._idx = idx
+
+    def read_token(self):
+        s = self._str
+        start = self._idx
+        idx = start
+        while idx < len(s) and not is_delimiter(s[idx]):
+            idx += 1
+        self._idx = idx
+        assert idx >= start
+        return s[start:idx]
+
+    def read_char_token(self):
+        # The first char is part of the token even when it's a delimiter: \(
+        if self.at_end():
+            self.eof_error()
+        start = self._idx
+        self._idx += 1
+        rest = self.read_token()
+        return self._str[start:start + 1] + rest
+
+    def read_form(self):
+        """Reads the next form, or throws at the end of the string."""
+        while True:
+            itm = self.read_item()
+            if itm is not None:
+                return itm
+
+    def read_item(self):
+        """Reads the next form. Returns None when it was a #_ comment."""
+        self.skip_whitespace()
+        if self.at_end():
+            self.eof_error()
+        ch = self._str[self._idx]
+        if ch == u"(":
+            self._idx += 1
+            return self.read_list()
+        if ch == u"[":
+            self._idx += 1
+            return self.read_vector()
+        if ch == u"{":
+            self._idx += 1
+            return self.read_map()
+        if ch == u"\"":
+            self._idx += 1
+            return self.read_string()
+        if ch == u":":
+            self._idx += 1
+            return self.read_keyword()
+        if ch == u"\\":
+            self._idx += 1
+            try:
+                return reader.character_from_token(self.read_char_token())
+            except reader.InvalidCharacter as ex:
+                self.error(ex._msg)
+        if ch == u"#":
+            self._idx += 1
+            return self.read_dispatch()
+        if ch in u")]}":
+            self.error(u"Unmatched delimiter '" + ch + u"'")
+        if ch in u"'`~@^%":
+            self.error(u"Unsupported syntax in data '" + ch + u"'")
+        token = self.read_token()
+        if token == u"":
+            self.error(u"Unsupported character in data '" + ch + u"'")
+        if reader.is_digit(token[0]) or \
+           (len(token) > 1 and token[0] in u"+-" and reader.is_digit(token[1])):
+            return self.parse_number(token)
+        return self.parse_symbol(token)
+
+    def read_items(self, close):
+        """Reads forms up to the close char."""
+        items = []
+        while True:
+            self.skip_whitespace()
+            if self.at_end():
+                self.eof_error()
+            if self._str[self._idx] == close:
+                self._idx += 1
+                return items
+            itm = self.read_item()
+            if itm is not None:
+                items.append(itm)
+
+    def read_list(self):
+        items = self.read_items(u")")
+        if len(items) == 0:
+            return EmptyList()
+        acc = nil
+        for x in range(len(items) - 1, -1, -1):
+            acc = cons(items[x], acc)
+        return acc
+
+    def read_vector(self):
+        acc = rt._transient(EMPTY_VECTOR)
+        for itm in self.read_items(u"]"):
+            acc = rt._conj_BANG_(acc, itm)
+        return rt._persistent_BANG_(acc)
+
+    def read_map(self):
+        items = self.read_items(u"}")
+        if len(items) % 2 != 0:
+            self.error(u"Map literal must contain an even number of forms")
+        acc = rt._transient(EMPTY_MAP)
+        for x in range(0, len(items), 2):
+            acc = rt._assoc_BANG_(acc, items[x], items[x + 1])
+        return rt._persistent_BANG_(acc)
+
+    def read_set(self):
+        acc = rt._transient(EMPTY_SET)
+        for itm in self.read_items(u"}"):
+            acc = rt._conj_BANG_(acc, itm)
+        return rt._persistent_BANG_(acc)
+
+    def read_dispatch(self):
+        if self.at_end():
+            self.eof_error()
+        ch = self._str[self._idx]
+        self._idx += 1
+        if ch == u"{":
+            return self.read_set()
+        if ch == u"_":
+            self.read_form()
+            return None
+        self.error(u"Unsupported dispatch in data #" + ch)
+
+    def read_string(self):
+        s = self._str
+        start = self._idx
+        idx = start
+        while idx < len(s) and s[idx] != u"\"" and s[idx] != u"\\":
+            idx += 1
+        if idx >= len(s):
+            self.error(u"Unmatched string quote '\"'")
+        if s[idx] == u"\"":
+            # No escapes, so the string is a slice of the input
+            self._idx = idx + 1
+            assert idx >= start
+            return rt.wrap(s[start:idx])
+        sb = UnicodeBuilder()
+        sb.append_slice(s, start, idx)
+        while True:
+            if idx >= len(s):
+                self.error(u"Unmatched string quote '\"'")
+            ch = s[idx]
+            idx += 1
+            if ch == u"\"":
+                self._idx = idx
+                return rt.wrap(sb.build())
+            if ch == u"\\":
+                if idx >= len(s):
+                    self.error(u"eof after escape character")
+                ch = s[idx]
+                idx += 1
+                if ch == u"\"" or ch == u"\\":
+                    sb.append(ch)
+                elif ch == u"n":
+                    sb.append(u"\n")
+                elif ch == u"r":
+                    sb.append(u"\r")
+                elif ch == u"t":
+                    sb.append(u"\t")
+                else:
+                    self.error(u"unhandled escape character: " + ch)
+            else:
+                sb.append(ch)
+
+    def read_keyword(self):
+        token = self.read_token()
+        if token == u"" or token[0] == u":":
+            self.error(u"Invalid keyword in data :" + token)
+        sym = symbol(token)
+        return keyword(rt.name(sym), rt.namespace(sym))
+
+    def parse_symbol(self, token):
+        if token == u"nil":
+            return nil
+        if token == u"true":
+            return true
+        if token == u"false":
+            return false
+        return symbol(token)
+
+    def parse_number(self, token):
+        start = 0
+        if token[0] == u"-" or token[0] == u"+":
+            start = 1
+        digits = len(token) - start
+        if 0 < digits <= MAX_FAST_INT_DIGITS and (digits == 1 or token[start] != u"0"):
+            n = 0
+            x = start
+            while x < len(token) and reader.is_digit(token[x]):
+                n = n * 10 + (ord(token[x]) - ord(u"0"))
+                x += 1
+            if x == len(token):
+                return rt.wrap(-n if token[0] == u"-" else n)
+        # Floats, ratios, big and radix integers
+        parsed = reader.parse_number(token)
+        if parsed is None:
+            self.error(u"Invalid number: " + token)
+        return parsed
+
+
+def data_string(s):
+    if isinstance(s, Buffer):
+        return unicode_from_utf8(rffi.charpsize2str(s.buffer(), intmask(s.count())))
+    affirm(isinstance(s, String), u"Expected a String or a Buffer")
+    return rt.name(s)
+
+
+@as_var("pixie.edn", "read-string")
+def read_string(s):
+    """(read-string s)
+       Reads the first form of the string or UTF-8 buffer s as data. Unlike the read-string in
+       pixie.stdlib it doesn't track lines and columns, and it can't read code: quoting, syntax
+       quoting, reader fns, metadata and auto-resolved keywords are errors."""
+    return DataReader(data_string(s)).read_form()
+
+@as_var("pixie.edn", "read-all-string")
+def read_all_string(s):
+    """(read-all-string s)
+       Reads all the forms of the string or UTF-8 buffer s as data, into a vector."""
+    rdr = DataReader(data_string(s))
+    acc = EMPTY_VECTOR
+    while True:
+        rdr.skip_whitespace()
+        if rdr.at_end():
+            return acc
+        itm = rdr.read_item()
+        if itm is not None:
+            acc = rt.conj(acc, itm)
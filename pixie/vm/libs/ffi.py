@@ -105,19 +105,22 @@ class FFIFn(object.Object):
         self._c_fn_type = c_fn_type
 
     @jit.unroll_safe
-    def prep_exb(self, args):
+    def prep_exb(self, exb, args):
+        """Encodes args into the exchange buffer. Returns the tokens that need
+        finalizing after the call, or None (the common case) if there are none."""
         cd = self._c_fn_type.get_cd()
         fn_tp = self._c_fn_type
 
-        size = jit.promote(cd.exchange_size)
-        exb = rffi.cast(rffi.VOIDP, lltype.malloc(rffi.CCHARP.TO, size, flavor="raw"))
-        tokens = [None] * len(args)
-
+        tokens = None
         for i, tp in enumerate(fn_tp._arg_types):
             offset_p = rffi.ptradd(exb, jit.promote(cd.exchange_args[i]))
-            tokens[i] = tp.ffi_set_value(offset_p, args[i])
+            token = tp.ffi_set_value(offset_p, args[i])
+            if token is not None:
+                if tokens is None:
+                    tokens = []
+                tokens.append(token)
 
-        return exb, tokens
+        return tokens
 
     def get_ret_val_from_buffer(self, exb):
         cd = self._c_fn_type.get_cd()
@@ -138,20 +141,23 @@ class FFIFn(object.Object):
                 runtime_error(u"Wrong number of args to fn: got " + unicode(str(arity)) +
                     u", expected " + unicode(str(tp_arity)))
 
-        exb, tokens = self.prep_exb(args)
-        cd = jit.promote(self._c_fn_type.get_cd())
-        #fp = jit.promote(self._f_ptr)
-        jit_ffi_call(cd,
-                     self._f_ptr,
-                     exb)
-        ret_val = self.get_ret_val_from_buffer(exb)
-
-        for x in range(len(args)):
-            t = tokens[x]
-            if t is not None:
-                t.finalize_token()
+        fn_tp = self._c_fn_type
+        exb = fn_tp.acquire_exb()
+        try:
+            tokens = self.prep_exb(exb, args)
+            cd = jit.promote(fn_tp.get_cd())
+            #fp = jit.promote(self._f_ptr)
+            jit_ffi_call(cd,
+                         self._f_ptr,
+                         exb)
+            ret_val = self.get_ret_val_from_buffer(exb)
+
+            if tokens is not None:
+                for t in tokens:
+                    t.finalize_token()
+        finally:
+            fn_tp.release_exb(exb)
 
-        lltype.free(exb, flavor="raw")
         keepalive_until_here(args)
         return ret_val
 
@@ -687,6 +693,8 @@ class FunctionTypeNameGenerator(py_object):
 
 name_gen = FunctionTypeNameGenerator()
 
+MAX_POOLED_EXBS = 4
+
 class CFunctionType(object.Type):
     base_type = object.Type(u"pixie.ffi.CType")
     _immutable_fields_ = ["_arg_types", "_ret_type", "_cd", "_is_variadic"]
@@ -697,6 +705,22 @@ class CFunctionType(object.Type):
         self._ret_type = ret_type
         self._is_variadic = is_variadic
         self._cd = CifDescrBuilder(self._arg_types, self._ret_type).rawallocate()
+        self._exb_pool = []
+
+    def acquire_exb(self):
+        """Returns an exchange buffer for a call of this type, reusing a released
+        one if there is one. Callbacks can make calls of the same type while a
+        call is running, so a type may have several buffers in use at once."""
+        if self._exb_pool:
+            return self._exb_pool.pop()
+        size = self._cd.exchange_size
+        return rffi.cast(rffi.VOIDP, lltype.malloc(rffi.CCHARP.TO, size, flavor="raw"))
+
+    def release_exb(self, exb):
+        if len(self._exb_pool) < MAX_POOLED_EXBS:
+            self._exb_pool.append(exb)
+        else:
+            lltype.free(exb, flavor="raw")
 
     def ffi_get_value(self, ptr):
         casted = rffi.cast(rffi.VOIDPP, ptr)
@@ -0,0 +1,430 @@
+## Natives for pixie.data.json: a JSON decoder that reads straight from a
+## string by index, and an encoder that writes into a string builder.
+
+py_object = object
+from pixie.vm.object import affirm, runtime_error
+from pixie.vm.code import as_var, NativeFn
+from pixie.vm.primitives import nil, true, false
+from pixie.vm.keyword import keyword, Keyword
+from pixie.vm.string import String, Character
+from pixie.vm.numbers import Integer, BigInteger, Float, Ratio, to_float
+from pixie.vm.persistent_vector import PersistentVector, EMPTY as EMPTY_VECTOR
+from pixie.vm.persistent_hash_map import PersistentHashMap, EMPTY as EMPTY_MAP
+from pixie.vm.persistent_hash_set import PersistentHashSet
+from pixie.vm.persistent_list import PersistentList, EmptyList
+from pixie.vm.cons import Cons
+from pixie.vm.lazy_seq import LazySeq
+from pixie.vm.chunked_seq import ChunkedCons
+from pixie.vm.range import Range
+from pixie.vm.array import Array
+from pixie.vm.map_entry import MapEntry
+from pixie.vm.libs.ffi import Buffer
+from pixie.vm.util import unicode_from_utf8
+import pixie.vm.rt as rt
+from rpython.rlib.rstring import UnicodeBuilder
+from rpython.rlib.rbigint import rbigint
+from rpython.rlib.rarithmetic import intmask
+from rpython.rtyper.lltypesystem import rffi
+
+
+# Longer runs of digits could overflow, they are read as big integers
+MAX_FAST_INT_DIGITS = 18
+
+ESCAPES = {u"\"": u"\"", u"\\": u"\\", u"/": u"/", u"b": u"\b",
+           u"f": u"\f", u"n": u"\n", u"r": u"\r", u"t": u"\t"}
+
+
+def parse_error(msg):
+    runtime_error(msg, u"pixie.data.json/ParseException")
+
+
+def is_json_digit(ch):
+    return u"0" <= ch <= u"9"
+
+
+class JSONParser(py_object):
+    """Parses the JSON value in a string. Arrays become vectors and objects
+    become maps, both built through transients."""
+
+    def __init__(self, s, keywordize):
+        self._str = s
+        self._idx = 0
+        self._keywordize = keywordize
+
+    def skip_whitespace(self):
+        s = self._str
+        idx = self._idx
+        while idx < len(s) and s[idx] in u" \t\n\r":
+            idx += 1
+        self._idx = idx
+
+    def peek(self):
+        if self._idx >= len(self._str):
+            parse_error(u"Unexpected end of JSON input")
+        return self._str[self._idx]
+
+    def expect(self, ch):
+        if self.peek() != ch:
+            parse_error(u"Expected '" + ch + u"' at " + unicode(str(self._idx)))
+        self._idx += 1
+
+    def parse(self):
+        self.skip_whitespace()
+        val = self.parse_value()
+        self.skip_whitespace()
+        if self._idx < len(self._str):
+            parse_error(u"Unexpected data after the JSON value at " + unicode(str(self._idx)))
+        return val
+
+    def parse_value(self):
+        ch = self.peek()
+        if ch == u"{":
+            self._idx += 1
+            return self.parse_object()
+        if ch == u"[":
+            self._idx += 1
+            return self.parse_array()
+        if ch == u"\"":
+            self._idx += 1
+            return rt.wrap(self.parse_string())
+        if ch == u"-" or is_json_digit(ch):
+            return self.parse_number()
+        if ch == u"t":
+            return self.parse_literal(u"true", true)
+        if ch == u"f":
+            return self.parse_literal(u"false", false)
+        if ch == u"n":
+            return self.parse_literal(u"null", nil)
+        parse_error(u"Unexpected character '" + ch + u"' at " + unicode(str(self._idx)))
+
+    def parse_literal(self, word, val):
+        end = self._idx + len(word)
+        if self._str[self._idx:end] != word:
+            parse_error(u"Invalid literal at " + unicode(str(self._idx)))
+        self._idx = end
+        return val
+
+    def parse_array(self):
+        acc = rt._transient(EMPTY_VECTOR)
+        self.skip_whitespace()
+        if self.peek() == u"]":
+            self._idx += 1
+            return rt._persistent_BANG_(acc)
+        while True:
+            self.skip_whitespace()
+            acc = rt._conj_BANG_(acc, self.parse_value())
+            self.skip_whitespace()
+            if self.peek() == u"]":
+                self._idx += 1
+                return rt._persistent_BANG_(acc)
+            self.expect(u",")
+
+    def parse_object(self):
+        acc = rt._transient(EMPTY_MAP)
+        self.skip_whitespace()
+        if self.peek() == u"}":
+            self._idx += 1
+            return rt._persistent_BANG_(acc)
+        while True:
+            self.skip_whitespace()
+            self.expect(u"\"")
+            k = self.parse_string()
+            key = keyword(k) if self._keywordize else rt.wrap(k)
+            self.skip_whitespace()
+            self.expect(u":")
+            self.skip_whitespace()
+            acc = rt._assoc_BANG_(acc, key, self.parse_value())
+            self.skip_whitespace()
+            if self.peek() == u"}":
+                self._idx += 1
+                return rt._persistent_BANG_(acc)
+            self.expect(u",")
+
+    def parse_string(self):
+        s = self._str
+        start = self._idx
+        idx = start
+        while idx < len(s) and s[idx] != u"\"" and s[idx] != u"\\":
+            idx += 1
+        if idx >= len(s):
+            parse_error(u"Unterminated JSON string")
+        if s[idx] == u"\"":
+            # No escapes, so the string is a slice of the input
+            self._idx = idx + 1
+            assert idx >= start
+            return s[start:idx]
+        sb = UnicodeBuilder()
+        sb.append_slice(s, start, idx)
+        while True:
+            if idx >= len(s):
+                parse_error(u"Unterminated JSON string")
+            ch = s[idx]
+            idx += 1
+            if ch == u"\"":
+                self._idx = idx
+                return sb.build()
+            if ch != u"\\":
+                sb.append(ch)
+                continue
+            if idx >= len(s):
+                parse_error(u"Unterminated JSON string")
+            ch = s[idx]
+            idx += 1
+            if ch == u"u":
+                c = self.parse_hex4(idx)
+                idx += 4
+                # A surrogate pair is one char, given as two escapes
+                if 0xd800 <= c <= 0xdbff and s[idx:idx + 2] == u"\\u":
+                    lo = self.parse_hex4(idx + 2)
+                    if 0xdc00 <= lo <= 0xdfff:
+                        c = 0x10000 + ((c - 0xd800) << 10) + (lo - 0xdc00)
+                        idx += 6
+                sb.append(unichr(c))
+            else:
+                esc = ESCAPES.get(ch, None)
+                if esc is None:
+                    parse_error(u"Invalid escape character in JSON string: \\" + ch)
+                sb.append(esc)
+
+    def parse_hex4(self, idx):
+        s = self._str
+        if idx + 4 > len(s):
+            parse_error(u"Unterminated \\u escape in JSON string")
+        c = 0
+        for x in range(idx, idx + 4):
+            d = ord(s[x])
+            if ord(u"0") <= d <= ord(u"9"):
+                d -= ord(u"0")
+            elif ord(u"a") <= d <= ord(u"f"):
+                d -= ord(u"a") - 10
+            elif ord(u"A") <= d <= ord(u"F"):
+                d -= ord(u"A") - 10
+            else:
+                parse_error(u"Invalid \\u escape in JSON string")
+            c = c * 16 + d
+        return c
+
+    def parse_number(self):
+        s = self._str
+        start = self._idx
+        idx = start
+        if s[idx] == u"-":
+            idx += 1
+        digits_start = idx
+        while idx < len(s) and is_json_digit(s[idx]):
+            idx += 1
+        digits = idx - digits_start
+        if digits == 0 or (digits > 1 and s[digits_start] == u"0"):
+            parse_error(u"Invalid JSON number at " + unicode(str(start)))
+        is_float = False
+        if idx < len(s) and s[idx] == u".":
+            is_float = True
+            idx += 1
+            frac_start = idx
+            while idx < len(s) and is_json_digit(s[idx]):
+                idx += 1
+            if idx == frac_start:
+                parse_error(u"Invalid JSON number at " + unicode(str(start)))
+        if idx < len(s) and (s[idx] == u"e" or s[idx] == u"E"):
+            is_float = True
+            idx += 1
+            if idx < len(s) and (s[idx] == u"+" or s[idx] == u"-"):
+                idx += 1
+            exp_start = idx
+            while idx < len(s) and is_json_digit(s[idx]):
+                idx += 1
+            if idx == exp_start:
+                parse_error(u"Invalid JSON number at " + unicode(str(start)))
+        self._idx = idx
+        assert idx >= start
+        if is_float:
+            return rt.wrap(float(str(s[start:idx])))
+        if digits > MAX_FAST_INT_DIGITS:
+            return rt.wrap(rbigint.fromstr(str(s[start:idx])))
+        n = 0
+        for x in range(digits_start, idx):
+            n = n * 10 + (ord(s[x]) - ord(u"0"))
+        return rt.wrap(-n if s[start] == u"-" else n)
+
+
+def append_json_string(sb, s):
+    sb.append(u"\"")
+    start = 0
+    for x in range(len(s)):
+        ch = s[x]
+        if ch != u"\"" and ch != u"\\" and ord(ch) >= 0x20:
+            continue
+        sb.append_slice(s, start, x)
+        start = x + 1
+        if ch == u"\"":
+            sb.append(u"\\\"")
+        elif ch == u"\\":
+            sb.append(u"\\\\")
+        elif ch == u"\n":
+            sb.append(u"\\n")
+        elif ch == u"\r":
+            sb.append(u"\\r")
+        elif ch == u"\t":
+            sb.append(u"\\t")
+        elif ch == u"\b":
+            sb.append(u"\\b")
+        elif ch == u"\f":
+            sb.append(u"\\f")
+        else:
+            sb.append(u"\\u00")
+            sb.append(u"0123456789abcdef"[ord(ch) >> 4])
+            sb.append(u"0123456789abcdef"[ord(ch) & 0xf])
+    sb.append_slice(s, start, len(s))
+    sb.append(u"\"")
+
+
+def is_native_seq(x):
+    return isinstance(x, PersistentList) or isinstance(x, EmptyList) or \
+        isinstance(x, Cons) or isinstance(x, LazySeq) or \
+        isinstance(x, ChunkedCons) or isinstance(x, Range) or \
+        isinstance(x, PersistentHashSet) or isinstance(x, Array) or \
+        isinstance(x, MapEntry)
+
+
+class JSONWriter(py_object):
+    """Writes values as JSON. Values of other types are passed to the
+    fallback fn, which returns their JSON as a string.
+
+    Nested collections are only written natively if they are of a built-in
+    type, so write-string extensions for other maps and seqs are used. The
+    top level value is written natively if it's any map, vector or seqable,
+    the fallback hands those it has no extension for back to write-string."""
+
+    def __init__(self, fallback):
+        self._sb = UnicodeBuilder()
+        self._fallback = fallback
+
+    def write(self, x):
+        """Writes a nested value."""
+        if not self.write_native(x):
+            self.write_fallback(x)
+
+    def write_top(self, x):
+        """Writes the value write-string was called with."""
+        if self.write_native(x):
+            pass
+        elif rt._satisfies_QMARK_(rt.IMap.deref(), x):
+            self.write_map(x)
+        elif rt._satisfies_QMARK_(rt.IVector.deref(), x):
+            self.write_vector(x)
+        elif rt._satisfies_QMARK_(rt.ISeqable.deref(), x):
+            self.write_seq(x)
+        else:
+            self.write_fallback(x)
+
+    def write_native(self, x):
+        """Writes x if it's of a built-in type, returns False otherwise."""
+        sb = self._sb
+        if x is nil:
+            sb.append(u"null")
+        elif x is true:
+            sb.append(u"true")
+        elif x is false:
+            sb.append(u"false")
+        elif isinstance(x, String):
+            append_json_string(sb, x._str)
+        elif isinstance(x, Keyword):
+            append_json_string(sb, rt.name(x))
+        elif isinstance(x, Character):
+            append_json_string(sb, unichr(x.char_val()))
+        elif isinstance(x, Integer):
+            sb.append(unicode(str(x.int_val())))
+        elif isinstance(x, BigInteger):
+            sb.append(unicode(x.bigint_val().str()))
+        elif isinstance(x, Float):
+            sb.append(rt.name(rt.str(x)))
+        elif isinstance(x, Ratio):
+            sb.append(rt.name(rt.str(to_float(x))))
+        elif isinstance(x, PersistentHashMap):
+            self.write_map(x)
+        elif isinstance(x, PersistentVector):
+            self.write_vector(x)
+        elif is_native_seq(x):
+            self.write_seq(x)
+        else:
+            return False
+        return True
+
+    def write_fallback(self, x):
+        val = self._fallback.invoke([x])
+        affirm(isinstance(val, String), u"JSON for a value must be a String")
+        self._sb.append(rt.name(val))
+
+    def write_map(self, m):
+        self._sb.append(u"{")
+        rt._reduce(m, WriteEntryFn(self), true)
+        self._sb.append(u"}")
+
+    def write_vector(self, v):
+        self._sb.append(u"[")
+        rt._reduce(v, WriteItemFn(self), true)
+        self._sb.append(u"]")
+
+    def write_seq(self, s):
+        self._sb.append(u"[")
+        s = rt.seq(s)
+        first = True
+        while s is not nil:
+            if not first:
+                self._sb.append(u", ")
+            first = False
+            self.write(rt.first(s))
+            s = rt.next(s)
+        self._sb.append(u"]")
+
+
+class WriteItemFn(NativeFn):
+    """Reducing fn over the items of a vector. The accumulator is true
+    until the first item is written."""
+    def __init__(self, wtr):
+        self._wtr = wtr
+
+    def invoke(self, args):
+        if args[0] is not true:
+            self._wtr._sb.append(u", ")
+        self._wtr.write(args[1])
+        return false
+
+
+class WriteEntryFn(NativeFn):
+    """Reducing fn over the entries of a map, see WriteItemFn."""
+    def __init__(self, wtr):
+        self._wtr = wtr
+
+    def invoke(self, args):
+        if args[0] is not true:
+            self._wtr._sb.append(u", ")
+        entry = args[1]
+        self._wtr.write(rt._key(entry))
+        self._wtr._sb.append(u": ")
+        self._wtr.write(rt._val(entry))
+        return false
+
+
+def json_string(s):
+    if isinstance(s, Buffer):
+        return unicode_from_utf8(rffi.charpsize2str(s.buffer(), intmask(s.count())))
+    affirm(isinstance(s, String), u"Expected a String or a Buffer")
+    return rt.name(s)
+
+
+@as_var("pixie.data.json.internal", "read-string")
+def read_string(s, keywordize):
+    """(read-string s keywordize?)
+       Parses the JSON in the string or UTF-8 buffer s. Object keys become keywords when
+       keywordize? is true."""
+    return JSONParser(json_string(s), rt.is_true(keywordize)).parse()
+
+@as_var("pixie.data.json.internal", "write-string")
+def write_string(x, fallback):
+    """(write-string x fallback)
+       Returns x written as JSON. Values of types the encoder doesn't know are passed to
+       fallback, which returns their JSON as a string."""
+    wtr = JSONWriter(fallback)
+    wtr.write_top(x)
+    return rt.wrap(wtr._sb.build())
@@ -0,0 +1,110 @@
+## Decides which .pxic file (if any) may stand in for a .pxi source file, and
+## where freshly compiled output should be written.
+##
+## A cache file is fresh when it was written by this VM build and its header
+## matches the source's size and mtime. If only the mtime differs (a fresh
+## checkout, `touch`, a copied tree) the md5 of the source is compared before
+## giving up on it. The digest is also checked when the source was modified in
+## the same second the cache was written, since mtimes can't tell those apart.
+
+import os
+import os.path as path
+import rpython.rlib.rpath as rpath
+from rpython.rlib.rmd5 import RMD5
+from pixie.vm.code import intern_var
+from pixie.vm.primitives import nil
+import pixie.vm.rt as rt
+
+PXIC_CACHE_DIR = intern_var(u"pixie.stdlib", u"*pxic-cache-dir*")
+PXIC_CACHE_DIR.set_root(nil)
+PXIC_CACHE_DIR.set_dynamic()
+
+
+class SourceInfo(object):
+    def __init__(self, filename):
+        st = os.stat(filename)
+        self._filename = filename
+        self._mtime = int(st.st_mtime)
+        self._size = int(st.st_size)
+        self._data = None
+        self._digest = None
+
+    def data(self):
+        if self._data is None:
+            f = open(self._filename)
+            self._data = f.read()
+            f.close()
+        return self._data
+
+    def digest(self):
+        if self._digest is None:
+            self._digest = RMD5(self.data()).hexdigest()
+        return self._digest
+
+    def is_fresh(self, header, cache_mtime):
+        if header is None or not header.is_current_vm():
+            return False
+        if header._src_size != self._size:
+            return False
+        if header._src_mtime == str(self._mtime) and self._mtime < cache_mtime:
+            return True
+        return header._src_digest == self.digest()
+
+
+def cache_dir():
+    d = PXIC_CACHE_DIR.deref()
+    if d is nil:
+        return None
+    return str(rt.name(d))
+
+def cache_dir_path(filename, d):
+    """Maps a source path to a flat file name inside the cache directory."""
+    return path.join(d, rpath.rabspath(filename).replace(rpath.sep, "%") + "c")
+
+def is_fresh_cache(src, filename):
+    if not path.isfile(filename):
+        return False
+    return src.is_fresh(read_file_header(filename), int(os.stat(filename).st_mtime))
+
+def read_file_header(filename):
+    from pixie.vm.libs.pxic.reader import Reader, read_header
+    try:
+        f = open(filename, "rb")
+    except (IOError, OSError):
+        return None
+    try:
+        return read_header(Reader(f))
+    finally:
+        f.close()
+
+def find_fresh(src):
+    """Returns the path of an up-to-date .pxic for `src`, or None."""
+    sibling = src._filename + "c"
+    if is_fresh_cache(src, sibling):
+        return sibling
+
+    d = cache_dir()
+    if d is not None:
+        cached = cache_dir_path(src._filename, d)
+        if is_fresh_cache(src, cached):
+            return cached
+
+    return None
+
+def write_target(filename):
+    """Where to write compiled output while loading `filename` from source: the
+    configured cache directory, or the sibling .pxic when there is a stale one
+    to replace. None means the load shouldn't write a cache file."""
+    d = cache_dir()
+    if d is not None:
+        if not path.isdir(d):
+            try:
+                os.mkdir(d)
+            except OSError:
+                return None
+        return cache_dir_path(filename, d)
+
+    if path.isfile(filename + "c"):
+        return filename + "c"
+
+    return None
@@ -0,0 +1,113 @@
+## VM images: a recording of the top level forms run while the VM boots, so a
+## later process can replay them from one file instead of finding, checking
+## and reading every source or .pxic file the stdlib pulls in.
+##
+## Each load (of a source file or a .pxic file) becomes one segment, a self
+## contained pxic stream. Forms are recorded once they've run and a segment is
+## only added to the image when its load is done, so a namespace that a form
+## requires lands in the image ahead of that form. When the form is replayed
+## the namespace is already there and the require does nothing.
+
+from pixie.vm.libs.pxic.tags import IMAGE_MAGIC, FORMAT_VERSION, VM_FINGERPRINT
+from pixie.vm.libs.pxic.writer import Writer, BufferWriter, write_int_raw, write_bytes_raw, write_lazy_def, write_format_version
+from pixie.vm.libs.pxic.reader import BufferReader, LazyDef, read_raw_integer, read_bytes_raw, read_format_version
+from pixie.vm.object import WrappedException
+from rpython.rlib.rarithmetic import r_uint, intmask
+
+
+class Recorder(object):
+    def __init__(self):
+        self._active = False
+        self._segments = []
+
+    def is_active(self):
+        return self._active
+
+    def start(self):
+        self._active = True
+        self._segments = []
+
+    def stop(self):
+        self._active = False
+        segments = self._segments
+        self._segments = []
+        return segments
+
+    def add_segment(self, data):
+        self._segments.append(data)
+
+_recorder = Recorder()
+
+
+def begin_segment():
+    """Returns the writer for the forms of a load that is starting, or None
+    when no image is being recorded."""
+    if not _recorder.is_active():
+        return None
+    return BufferWriter()
+
+def record(segment, o):
+    if segment is None:
+        return
+    if isinstance(o, LazyDef):
+        write_lazy_def(o._var, o._data, segment)
+    else:
+        segment.write_toplevel(o)
+
+def end_segment(segment):
+    if segment is None:
+        return
+    segment.finish()
+    _recorder.add_segment(segment.getvalue())
+
+
+def start_recording():
+    _recorder.start()
+
+def dump_image(filename):
+    """Writes everything recorded since start_recording() to `filename`."""
+    segments = _recorder.stop()
+    f = open(filename, "wb")
+    try:
+        wtr = Writer(f)
+        wtr.write(IMAGE_MAGIC)
+        write_format_version(wtr)
+        write_bytes_raw(VM_FINGERPRINT, wtr)
+        write_int_raw(r_uint(len(segments)), wtr)
+        for data in segments:
+            write_bytes_raw(data, wtr)
+        wtr.flush()
+    finally:
+        f.close()
+
+def load_image(filename):
+    """Replays the image in `filename`. Returns False without running anything
+    if it isn't an image written by this VM."""
+    from pixie.vm.stdlib import load_pxic_reader
+
+    try:
+        f = open(filename, "rb")
+    except (IOError, OSError):
+        return False
+    try:
+        data = f.read()
+    finally:
+        f.close()
+
+    rdr = BufferReader(data)
+    if rdr.read(r_uint(len(IMAGE_MAGIC))) != IMAGE_MAGIC:
+        return False
+    if read_format_version(rdr) != FORMAT_VERSION or rdr.remaining() < 1:
+        return False
+    try:
+        fingerprint = read_bytes_raw(rdr)
+    except WrappedException:
+        # Cut off in the fingerprint
+        return False
+    if fingerprint != VM_FINGERPRINT or rdr.remaining() < 1:
+        return False
+
+    count = intmask(read_raw_integer(rdr))
+    for x in range(count):
+        load_pxic_reader(BufferReader(read_bytes_raw(rdr)))
+    return True
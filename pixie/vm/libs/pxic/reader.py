@@ -1,31 +1,93 @@
 from pixie.vm.libs.pxic.tags import *
 from pixie.vm.object import runtime_error, get_type_by_name
 from rpython.rlib.runicode import str_decode_utf_8
-from pixie.vm.string import String
+from pixie.vm.string import String, Character
 from pixie.vm.keyword import Keyword, keyword
 from pixie.vm.symbol import Symbol, symbol
-from pixie.vm.numbers import Integer, Float, BigInteger
-from pixie.vm.code import Code, Var, NativeFn, Namespace, intern_var
+from pixie.vm.numbers import Integer, Float, BigInteger, Ratio
+from pixie.vm.code import Code, Var, NativeFn, Namespace, LazyRoot, intern_var
 import pixie.vm.code as code
 from pixie.vm.primitives import nil, true, false
 from pixie.vm.persistent_hash_map import EMPTY as EMPTY_MAP
 from pixie.vm.persistent_vector import EMPTY as EMPTY_VECTOR
+from pixie.vm.persistent_hash_set import EMPTY as EMPTY_SET
 from pixie.vm.persistent_list import create_from_list
 from pixie.vm.reader import LinePromise
-from rpython.rlib.rarithmetic import r_uint, intmask
+from rpython.rlib.rarithmetic import r_uint, r_ulonglong, intmask, longlongmask
+from rpython.rlib.longlong2float import longlong2float
 from rpython.rlib.rbigint import rbigint
 from pixie.vm.libs.pxic.util import read_handlers
 import pixie.vm.rt as rt
 
 
+READ_BUFFER_SIZE = 64 * 1024
+
+# The tags a data only reader accepts, see Reader._data_only
+DATA_TAGS = [INT, NEG_INT, INT_STRING, BIGINT, BIGINT_STRING, FLOAT, FLOAT_BITS,
+             RATIO, CHAR, STRING, KEYWORD, SYMBOL, TRUE, FALSE, NIL,
+             MAP, VECTOR, SEQ, SET, META, TAGGED, CACHED_OBJ, NEW_CACHED_OBJ]
+is_data_tag = [False] * len(tag_name)
+for t in DATA_TAGS:
+    is_data_tag[t] = True
+
 class Reader(object):
+    """Reads a pxic stream from a file, READ_BUFFER_SIZE bytes at a time."""
     def __init__(self, rdr):
         self._rdr = rdr
+        self._buf = ""
+        self._pos = 0
         self._obj_cache = {}
         self._str_cache = {}
+        # Set for data from elsewhere, which mustn't make code, vars or namespaces
+        self._data_only = False
+
+    def fill(self, num):
+        """Makes sure num bytes are buffered, unless the stream ends first."""
+        if self._rdr is None:
+            return
+        assert self._pos >= 0
+        rest = self._buf[self._pos:]
+        self._buf = rest + self._rdr.read(max(num - len(rest), READ_BUFFER_SIZE))
+        self._pos = 0
 
     def read(self, num=r_uint(1)):
-        return self._rdr.read(intmask(num))
+        """Returns the next num bytes, or what is left of the stream if that's less."""
+        n = intmask(num)
+        if self._pos + n > len(self._buf):
+            self.fill(n)
+        start = self._pos
+        end = min(start + n, len(self._buf))
+        assert start >= 0 and end >= start
+        self._pos = end
+        return self._buf[start:end]
+
+    def read_fully(self, num):
+        """Returns the next num bytes, throws if the stream ends first."""
+        s = self.read(num)
+        if len(s) != intmask(num):
+            runtime_error(u"Unexpected end of pxic data")
+        return s
+
+    def read_byte(self):
+        if self._pos >= len(self._buf):
+            self.fill(1)
+            if self._pos >= len(self._buf):
+                runtime_error(u"Unexpected end of pxic data")
+        b = ord(self._buf[self._pos])
+        self._pos += 1
+        return b
+
+    def read_varint(self):
+        """Reads an unsigned LEB128 integer: 7 bits per byte, low bits first,
+        the high bit set on every byte but the last."""
+        result = r_uint(0)
+        shift = 0
+        while True:
+            b = self.read_byte()
+            result |= r_uint(b & 0x7F) << shift
+            if b < 0x80:
+                return result
+            shift += 7
 
     def read_and_cache(self):
         idx = len(self._obj_cache)
@@ -37,42 +99,101 @@ class Reader(object):
     def read_cached_string(self):
         sz = read_raw_integer(self)
         if sz >= MAX_STRING_SIZE:
-            return self._str_cache[sz - MAX_STRING_SIZE]
+            idx = intmask(sz - MAX_STRING_SIZE)
+            if idx not in self._str_cache:
+                runtime_error(u"Unknown cached string in pxic data: " + unicode(str(idx)))
+            return self._str_cache[idx]
         else:
-            s, pos = str_decode_utf_8(self.read(sz), sz, "?")
+            s, pos = str_decode_utf_8(self.read_fully(sz), intmask(sz), "?")
             self._str_cache[len(self._str_cache)] = s
             return s
 
     def read_cached_obj(self):
-        idx = read_raw_integer(self)
-        return self._obj_cache[idx]
+        idx = intmask(read_raw_integer(self))
+        obj = self._obj_cache.get(idx, None)
+        if obj is None:
+            # Unknown, or still being read
+            runtime_error(u"Unknown cached object in pxic data: " + unicode(str(idx)))
+        return obj
 
 
+class Header(object):
+    def __init__(self, fingerprint, src_mtime, src_size, src_digest):
+        self._fingerprint = fingerprint
+        self._src_mtime = src_mtime
+        self._src_size = src_size
+        self._src_digest = src_digest
+
+    def is_current_vm(self):
+        return self._fingerprint == VM_FINGERPRINT
+
+def read_header(rdr):
+    """Reads the .pxic header, returns None if the file doesn't start with one
+    or was written in another format version."""
+    if rdr.read(r_uint(len(MAGIC))) != MAGIC:
+        return None
+    if read_format_version(rdr) != FORMAT_VERSION:
+        return None
+    fingerprint = read_bytes_raw(rdr)
+    src_mtime = read_bytes_raw(rdr)
+    src_size = intmask(read_raw_integer(rdr))
+    src_digest = read_bytes_raw(rdr)
+    return Header(fingerprint, src_mtime, src_size, src_digest)
+
+def read_bytes_raw(rdr):
+    sz = read_raw_integer(rdr)
+    return rdr.read_fully(sz)
+
+def read_format_version(rdr):
+    """The version is a fixed four byte int in every format version, so files
+    in other versions can be told apart and rejected."""
+    s = rdr.read(r_uint(4))
+    if len(s) != 4:
+        return -1
+    return ord(s[0]) | (ord(s[1]) << 8) | (ord(s[2]) << 16) | (ord(s[3]) << 24)
+
 def read_tag(rdr):
-    tag = rdr.read()
-    return ord(tag[0])
+    return rdr.read_byte()
 
 def read_raw_integer(rdr):
-    return r_uint(ord(rdr.read()[0]) | (ord(rdr.read()[0]) << 8) | (ord(rdr.read()[0]) << 16) | (ord(rdr.read()[0]) << 24))
+    return rdr.read_varint()
 
 def read_raw_bigint(rdr):
-    nchars = read_raw_integer(rdr)
+    nchars = intmask(read_raw_integer(rdr))
+    data = rdr.read_fully(r_uint(nchars))
     n = rbigint.fromint(0)
-    for i in range(nchars):
-        a = rbigint.fromint(ord(rdr.read()[0]))
+    for i in range(len(data)):
+        a = rbigint.fromint(ord(data[i]))
         a = a.lshift(8*i)
         n = n.add(a)
     return n
 
+def decode_varints(data, count):
+    """Decodes count varints, written back to back in data."""
+    result = [r_uint(0)] * count
+    pos = 0
+    for x in range(count):
+        val = r_uint(0)
+        shift = 0
+        while True:
+            if pos >= len(data):
+                runtime_error(u"Unexpected end of pxic bytecode")
+            b = ord(data[pos])
+            pos += 1
+            val |= r_uint(b & 0x7F) << shift
+            if b < 0x80:
+                break
+            shift += 7
+        result[x] = val
+    return result
+
 def read_raw_string(rdr):
     s = rdr.read_cached_string()
     return s
 
 def read_code(rdr):
-    sz = read_raw_integer(rdr)
-    bytecode = [r_uint(0)] * sz
-    for x in range(sz):
-        bytecode[x] = read_raw_integer(rdr)
+    sz = intmask(read_raw_integer(rdr))
+    bytecode = decode_varints(read_bytes_raw(rdr), sz)
 
     sz = read_raw_integer(rdr)
     consts = [None] * sz
@@ -119,6 +240,18 @@ def read_vector(rdr):
 
     return acc
 
+def read_set(rdr):
+    cnt = read_raw_integer(rdr)
+    acc = EMPTY_SET
+    for x in range(cnt):
+        acc = rt._conj(acc, read_obj(rdr))
+
+    return acc
+
+def read_with_meta(rdr):
+    meta = read_obj(rdr)
+    return rt.with_meta(read_obj(rdr), meta)
+
 def read_seq(rdr):
     cnt = read_raw_integer(rdr)
     lst = [None] * cnt
@@ -130,6 +263,20 @@ def read_seq(rdr):
 def read_float(rdr):
     return Float(float(str(read_raw_string(rdr))))
 
+def read_float_bits(rdr):
+    s = rdr.read_fully(r_uint(8))
+    bits = r_ulonglong(0)
+    for i in range(8):
+        bits |= r_ulonglong(ord(s[i])) << (i * 8)
+    return Float(longlong2float(longlongmask(bits)))
+
+def read_ratio(rdr):
+    numerator = read_obj(rdr)
+    denominator = read_obj(rdr)
+    if not isinstance(numerator, Integer) or not isinstance(denominator, Integer):
+        runtime_error(u"Ratio in pxic data must be made of two integers")
+    return Ratio(numerator.int_val(), denominator.int_val())
+
 def read_namespace(rdr):
     nm = read_raw_string(rdr)
     return code._ns_registry.find_or_make(nm)
@@ -142,11 +289,49 @@ def read_interpreter_code_info(rdr):
     file = read_raw_string(rdr)
     return InterpreterCodeInfo(line, intmask(line_number), intmask(column_number), file)
 
-def read_obj(rdr):
+class BufferReader(Reader):
+    """Reads a stream that was embedded in another one, see BufferWriter."""
+    def __init__(self, s):
+        Reader.__init__(self, None)
+        self._buf = s
+
+    def remaining(self):
+        return len(self._buf) - self._pos
+
+class LazyDef(LazyRoot):
+    """Root of a var defined by a (def v <constant>) form, the value's encoded
+    bytes are only decoded when the var is first deref'd."""
+    def __init__(self, var, data):
+        self._var = var
+        self._data = data
+
+    def materialize(self):
+        return read_obj(BufferReader(self._data))
+
+def read_toplevel(rdr):
+    """Reads the next top level form. Returns the code to run, eof, or for a
+    deferred def the LazyDef that was installed as its var's root."""
     tag = read_tag(rdr)
+    if tag == LAZY_DEF:
+        var = read_obj(rdr)
+        assert isinstance(var, Var)
+        lazy = LazyDef(var, read_bytes_raw(rdr))
+        var.set_root(lazy)
+        return lazy
+    return read_obj_for_tag(rdr, tag)
+
+def read_obj(rdr):
+    return read_obj_for_tag(rdr, read_tag(rdr))
+
+def read_obj_for_tag(rdr, tag):
+    if rdr._data_only and not (0 <= tag < len(is_data_tag) and is_data_tag[tag]):
+        name = tag_name[tag] if 0 <= tag < len(tag_name) else str(tag)
+        runtime_error(u"Not a data tag: " + unicode(name))
 
     if tag == INT:
         return Integer(intmask(read_raw_integer(rdr)))
+    elif tag == NEG_INT:
+        return Integer(-intmask(read_raw_integer(rdr)))
     elif tag == BIGINT:
         return BigInteger(read_raw_bigint(rdr))
     elif tag == CODE:
@@ -178,8 +363,18 @@ def read_obj(rdr):
         return read_vector(rdr)
     elif tag == SEQ:
         return read_seq(rdr)
+    elif tag == SET:
+        return read_set(rdr)
+    elif tag == META:
+        return read_with_meta(rdr)
     elif tag == FLOAT:
         return read_float(rdr)
+    elif tag == FLOAT_BITS:
+        return read_float_bits(rdr)
+    elif tag == RATIO:
+        return read_ratio(rdr)
+    elif tag == CHAR:
+        return Character(intmask(read_raw_integer(rdr)))
     elif tag == NAMESPACE:
         return read_namespace(rdr)
     elif tag == INT_STRING:
@@ -210,6 +405,7 @@ def read_obj(rdr):
         obj = read_obj(rdr)
         return handler.invoke([obj])
     else:
-        runtime_error(u"No dispatch for bytecode: " + unicode(tag_name[tag]))
+        name = tag_name[tag] if 0 <= tag < len(tag_name) else str(tag)
+        runtime_error(u"No dispatch for bytecode: " + unicode(name))
 
     return nil
@@ -21,7 +21,14 @@ tag_name = ["INT",
             "NAMESPACE",
             "TAGGED",
             "CODE_INFO",
-            "EOF"]
+            "EOF",
+            "LAZY_DEF",
+            "SET",
+            "META",
+            "NEG_INT",
+            "FLOAT_BITS",
+            "CHAR",
+            "RATIO"]
 
 tags = {}
 
@@ -36,3 +43,17 @@ for idx, nm in enumerate(tag_name):
     globals()[nm] = idx
     tags[nm] = idx
 
+
+
+## Header written at the start of every .pxic file. The fingerprint covers the
+## bytecode set and the tag table, so files written by a different build are
+## treated as stale instead of being misread.
+import hashlib
+from pixie.vm.code import BYTECODES
+
+MAGIC = "PXIC"
+IMAGE_MAGIC = "PXIM"
+# 2: varint ints, and bytecode as one block
+FORMAT_VERSION = 2
+VM_VERSION = "0.1"
+VM_FINGERPRINT = VM_VERSION + "-" + hashlib.md5(",".join(BYTECODES + tag_name)).hexdigest()[:12]
@@ -1,32 +1,49 @@
 from pixie.vm.libs.pxic.tags import *
-from pixie.vm.object import runtime_error, Object, Type, InterpreterCodeInfo
+from pixie.vm.object import runtime_error, Object, Type, InterpreterCodeInfo, WrappedException
 from rpython.rlib.runicode import unicode_encode_utf_8
-from pixie.vm.string import String
+from pixie.vm.string import String, Character
 from pixie.vm.keyword import Keyword
 from pixie.vm.symbol import Symbol
-from pixie.vm.numbers import Integer, BigInteger, Float
-from pixie.vm.code import Code, Var, NativeFn, Namespace
+from pixie.vm.numbers import Integer, BigInteger, Float, Ratio
+from pixie.vm.code import Code, Var, NativeFn, Namespace, LOAD_CONST, SET_VAR, RETURN
 from pixie.vm.primitives import nil, true, false
 from pixie.vm.reader import LinePromise
+from pixie.vm.persistent_hash_map import PersistentHashMap
+from pixie.vm.persistent_hash_set import PersistentHashSet
+from pixie.vm.persistent_vector import PersistentVector
 from rpython.rlib.objectmodel import specialize
-from rpython.rlib.rarithmetic import r_uint
+from rpython.rlib.rarithmetic import r_uint, r_ulonglong, intmask
+from rpython.rlib.longlong2float import float2longlong
 from rpython.rlib.rbigint import rbigint
+from rpython.rlib.rstring import StringBuilder
+from pixie.vm.libs.pxic.util import write_handlers
 import pixie.vm.rt as rt
 
 MAX_INT32 = r_uint(1 << 31)
 
+WRITE_BUFFER_SIZE = 64 * 1024
+
 class Writer(object):
-    def __init__(self, wtr, with_cache=False):
+    """Writes a pxic stream to a file, WRITE_BUFFER_SIZE bytes at a time."""
+    def __init__(self, wtr, with_cache=False, strict=True):
         self._wtr = wtr
+        self._sb = StringBuilder()
         self._obj_cache = {}
         self._string_cache = {}
         self._with_cache = with_cache
+        self._strict = strict
+        self._failed = False
 
     def write(self, s):
         assert isinstance(s, str)
-        self._wtr.write(s)
+        self._sb.append(s)
+        if self._sb.getlength() >= WRITE_BUFFER_SIZE:
+            self.flush()
 
     def flush(self):
+        if self._sb.getlength() > 0:
+            self._wtr.write(self._sb.build())
+            self._sb = StringBuilder()
         self._wtr.flush()
 
     def write_cached_obj(self, o, wfn):
@@ -64,12 +81,48 @@ class Writer(object):
             self.write(s)
 
 
-    def write_object(self, o):
-        write_object(o, self)
+    def write_toplevel(self, o):
+        if self._strict:
+            write_toplevel(o, self)
+            return
+
+        # Best effort (opportunistic caching), give up on the file rather
+        # than failing the load it's a side effect of.
+        if self._failed:
+            return
+        try:
+            write_toplevel(o, self)
+        except WrappedException:
+            self._failed = True
+
+    def failed(self):
+        return self._failed
 
     def finish(self):
         write_tag(EOF, self)
-        self._wtr.flush()
+        self.flush()
+
+class BufferWriter(Writer):
+    """A Writer that collects its output in memory, for self contained streams
+    that get embedded in another one."""
+    def __init__(self):
+        Writer.__init__(self, None, True)
+
+    def write(self, s):
+        assert isinstance(s, str)
+        self._sb.append(s)
+
+    def flush(self):
+        pass
+
+    def getvalue(self):
+        return self._sb.build()
+
+    def take_value(self):
+        """Returns what was written since the last take_value, the caches are kept."""
+        value = self._sb.build()
+        self._sb = StringBuilder()
+        return value
 
 class WriterBox(Object):
     _type = Type(u"pixie.stdlib.WriterBox")
@@ -82,18 +135,43 @@ class WriterBox(Object):
     def get_pxic_writer(self):
         return self._pxic_writer
 
+def write_header(wtr, src_mtime, src_size, src_digest):
+    """Writes the .pxic header. Strings are written uncached so the header can
+    be read without setting up a full Reader."""
+    wtr.write(MAGIC)
+    write_format_version(wtr)
+    write_bytes_raw(VM_FINGERPRINT, wtr)
+    write_bytes_raw(str(src_mtime), wtr)
+    write_int_raw(r_uint(src_size), wtr)
+    write_bytes_raw(src_digest, wtr)
+
+def write_bytes_raw(s, wtr):
+    assert len(s) <= MAX_INT32
+    write_int_raw(r_uint(len(s)), wtr)
+    wtr.write(s)
+
 def write_tag(tag, wtr):
     assert tag <= 0xFF
     wtr.write(chr(tag))
 
+def write_format_version(wtr):
+    """See read_format_version, the version is never written as a varint."""
+    v = FORMAT_VERSION
+    wtr.write(chr(v & 0xFF) + chr((v >> 8) & 0xFF) + chr((v >> 16) & 0xFF) + chr((v >> 24) & 0xFF))
+
+def append_varint(sb, i):
+    """Appends i as an unsigned LEB128 integer, see Reader.read_varint."""
+    i = r_uint(i)
+    while i >= 0x80:
+        sb.append(chr(intmask(i & 0x7F) | 0x80))
+        i = i >> 7
+    sb.append(chr(intmask(i)))
+
 def write_int_raw(i, wtr):
-    #if 0 <= i <= SMALL_INT_MAX:
-    #    wtr.write(chr((i & 0xFF) + SMALL_INT_START))
     if 0 <= i <= MAX_INT32:
-        wtr.write(chr(i & 0xFF))
-        wtr.write(chr((i >> 8) & 0xFF))
-        wtr.write(chr((i >> 16) & 0xFF))
-        wtr.write(chr((i >> 24) & 0xFF))
+        sb = StringBuilder(5)
+        append_varint(sb, i)
+        wtr.write(sb.build())
     else:
         runtime_error(u"Raw int must be less than MAX_INT32, got: " + unicode(str(i)))
 
@@ -107,13 +185,18 @@ def write_bigint_raw(i, wtr):
         nchars += 1
     assert nchars <= MAX_INT32
     write_int_raw(nchars, wtr) # nchars used to represent the bigint
+    sb = StringBuilder(intmask(nchars))
     for j in range(nchars):
-        wtr.write(chr((i.rshift(j * 8).int_and_(0xFF).toint())))
+        sb.append(chr((i.rshift(j * 8).int_and_(0xFF).toint())))
+    wtr.write(sb.build())
 
 def write_int(i, wtr):
     if 0 <= i <= MAX_INT32:
         wtr.write(chr(INT))
         write_int_raw(i, wtr)
+    elif -MAX_INT32 <= i < 0:
+        wtr.write(chr(NEG_INT))
+        write_int_raw(-i, wtr)
     else:
         wtr.write(chr(INT_STRING))
         write_string_raw(unicode(str(i)), wtr)
@@ -127,20 +210,38 @@ def write_bigint(i, wtr):
         write_string_raw(unicode(i.str()), wtr)
 
 def write_float(f, wtr):
-    write_tag(FLOAT, wtr)
-    write_string_raw(unicode(str(f)), wtr)
+    """Floats are written as the eight bytes of their bits, low byte first,
+    so they read back exactly."""
+    write_tag(FLOAT_BITS, wtr)
+    bits = r_ulonglong(float2longlong(f))
+    sb = StringBuilder(8)
+    for i in range(8):
+        sb.append(chr(intmask((bits >> (i * 8)) & 0xFF)))
+    wtr.write(sb.build())
+
+def write_ratio(r, wtr):
+    write_tag(RATIO, wtr)
+    write_int(r.numerator(), wtr)
+    write_int(r.denominator(), wtr)
 
 def write_string(s, wtr):
     write_tag(STRING, wtr)
     write_string_raw(s, wtr)
 
+def write_char(c, wtr):
+    write_tag(CHAR, wtr)
+    write_int_raw(r_uint(c.char_val()), wtr)
+
 def write_code(c, wtr):
     assert isinstance(c, Code)
     wtr.write(chr(CODE))
 
+    # The bytecode is one block, so it's read in one go and decoded in one pass
     write_int_raw(len(c._bytecode), wtr)
+    sb = StringBuilder()
     for i in c._bytecode:
-        write_int_raw(i, wtr)
+        append_varint(sb, i)
+    write_bytes_raw(sb.build(), wtr)
 
     write_int_raw(len(c._consts), wtr)
     for const in c._consts:
@@ -197,6 +298,21 @@ def write_vector(vec, wtr):
 
     rt._reduce(vec, WriteItem(wtr), nil)
 
+class WriteKeyFn(NativeFn):
+    def __init__(self, wtr):
+        self._wtr = wtr
+
+    def invoke(self, args):
+        write_object(rt._key(args[1]), self._wtr)
+        return nil
+
+def write_set(st, wtr):
+    write_tag(SET, wtr)
+    write_int_raw(rt.count(st), wtr)
+
+    # The set's items are the keys of its backing map
+    rt._reduce(st._map, WriteKeyFn(wtr), nil)
+
 def write_seq(s, wtr):
     write_tag(SEQ, wtr)
     write_int_raw(rt.count(s), wtr)
@@ -258,8 +374,48 @@ def write_interpreter_code_info(obj, wtr):
     write_string_raw(file, wtr)
 
 
+def lazy_def_parts(obj):
+    """If `obj` is a compiled top level form of the shape (def v <constant>),
+    returns the var and the constant, otherwise None. Nothing but the var is
+    affected by running such a form, so it's safe to defer."""
+    if not isinstance(obj, Code):
+        return None
+    bc = obj._bytecode
+    if len(bc) != 6:
+        return None
+    if bc[0] != LOAD_CONST or bc[2] != LOAD_CONST or bc[4] != SET_VAR or bc[5] != RETURN:
+        return None
+    var = obj._consts[bc[1]]
+    if not isinstance(var, Var) or var.is_dynamic():
+        return None
+    return [var, obj._consts[bc[3]]]
+
+def write_toplevel(obj, wtr):
+    parts = lazy_def_parts(obj)
+    if parts is None:
+        write_object(obj, wtr)
+        return
+
+    # The value goes into its own stream with its own caches, so the reader
+    # can skip over it now and decode it on the var's first deref.
+    buf = BufferWriter()
+    write_object(parts[1], buf)
+    write_lazy_def(parts[0], buf.getvalue(), wtr)
+
+def write_lazy_def(var, data, wtr):
+    write_tag(LAZY_DEF, wtr)
+    write_var(var, wtr)
+    write_bytes_raw(data, wtr)
+
+def write_meta(meta, wtr):
+    """Collection literals can be constants in compiled code (see
+    compiler.is_constant_literal), so their metadata is kept. It is written
+    ahead of the collection it belongs to."""
+    if meta is not nil:
+        write_tag(META, wtr)
+        write_object(meta, wtr)
+
 def write_object(obj, wtr):
-    wtr.flush()
     if isinstance(obj, String):
         write_string(rt.name(obj), wtr)
     elif isinstance(obj, Integer):
@@ -268,6 +424,10 @@ def write_object(obj, wtr):
         write_bigint(obj.bigint_val(), wtr)
     elif isinstance(obj, Float):
         write_float(obj.float_val(), wtr)
+    elif isinstance(obj, Ratio):
+        write_ratio(obj, wtr)
+    elif isinstance(obj, Character):
+        write_char(obj, wtr)
     elif isinstance(obj, Code):
         write_code(obj, wtr)
     elif obj is nil:
@@ -275,6 +435,18 @@ def write_object(obj, wtr):
     elif isinstance(obj, Var):
         #wtr.write_cached_obj(obj, write_var)
         write_var(obj, wtr)
+    elif isinstance(obj, PersistentHashMap):
+        write_meta(obj.meta(), wtr)
+        write_map(obj, wtr)
+    elif isinstance(obj, PersistentVector):
+        write_meta(obj.meta(), wtr)
+        write_vector(obj, wtr)
+    elif isinstance(obj, PersistentHashSet):
+        write_meta(obj.meta(), wtr)
+        write_set(obj, wtr)
+    elif obj.type() in write_handlers:
+        # Ahead of the protocol checks, so records can have handlers
+        write_tagged(obj, wtr)
     elif rt._satisfies_QMARK_(rt.IMap.deref(), obj):
         write_map(obj, wtr)
     elif rt._satisfies_QMARK_(rt.IVector.deref(), obj):
@@ -296,12 +468,11 @@ def write_object(obj, wtr):
     elif isinstance(obj, InterpreterCodeInfo):
         wtr.write_cached_obj(obj, write_interpreter_code_info)
     else:
-        from pixie.vm.libs.pxic.util import write_handlers
-        handler = write_handlers.get(obj.type(), None)
-        if handler is None:
-            runtime_error(u"Object is not supported by pxic writer: " + rt.name(rt.str(obj.type())))
-        else:
-            write_tag(TAGGED, wtr)
-            write_string_raw(obj.type().name(), wtr)
-            write_object(handler.invoke([obj]), wtr)
+        runtime_error(u"Object is not supported by pxic writer: " + rt.name(rt.str(obj.type())))
+
+def write_tagged(obj, wtr):
+    handler = write_handlers[obj.type()]
+    write_tag(TAGGED, wtr)
+    write_string_raw(obj.type().name(), wtr)
+    write_object(handler.invoke([obj]), wtr)
 
@@ -0,0 +1,85 @@
+## Natives for pixie.io and pixie.streams.utf8: whole buffer UTF-8 transcoding, so bulk
+## reads and writes (slurp, spit) don't go through the char at a time streams.
+
+import pixie.vm.rt as rt
+from pixie.vm.object import Object, Type, affirm, runtime_error
+from pixie.vm.code import as_var
+from pixie.vm.numbers import Integer
+from pixie.vm.string import String
+from pixie.vm.libs.ffi import Buffer
+from rpython.rlib.runicode import str_decode_utf_8, unicode_encode_utf_8
+from rpython.rtyper.lltypesystem import rffi
+
+
+def utf8_decode_error(errors, encoding, msg, s, startingpos, endingpos):
+    runtime_error(u"Invalid UTF8 data", u"pixie.streams.utf8/invalid-character")
+    return u"", endingpos
+
+
+class UTF8Decoder(Object):
+    """Decodes UTF-8 fed to it a buffer at a time. A character split between
+    two buffers is held back until the rest of it is fed."""
+    _type = Type(u"pixie.stdlib.UTF8Decoder")
+
+    def type(self):
+        return UTF8Decoder._type
+
+    def __init__(self):
+        self._pending = ""
+        self._chunks = []
+
+    def feed(self, data, final):
+        if self._pending:
+            data = self._pending + data
+        decoded, used = str_decode_utf_8(data, len(data), "strict", final,
+                                         errorhandler=utf8_decode_error)
+        self._chunks.append(decoded)
+        self._pending = data[used:]
+
+    def finish(self):
+        if self._pending:
+            self.feed("", True)
+        s = u"".join(self._chunks)
+        self._chunks = [s]
+        return s
+
+
+@as_var("pixie.streams.utf8.internal", "utf8-decoder")
+def utf8_decoder():
+    """(utf8-decoder)
+       Returns a decoder to feed buffers of UTF-8 to with decode-utf8!."""
+    return UTF8Decoder()
+
+@as_var("pixie.streams.utf8.internal", "decode-utf8!")
+def decode_utf8(decoder, buffer, count):
+    """(decode-utf8! decoder buffer count)
+       Decodes the first count bytes of buffer, which continue any bytes fed to the decoder before."""
+    affirm(isinstance(decoder, UTF8Decoder), u"Expected a UTF8 decoder")
+    affirm(isinstance(buffer, Buffer), u"Expected a Buffer")
+    affirm(isinstance(count, Integer), u"Expected an Integer count")
+    assert isinstance(decoder, UTF8Decoder) and isinstance(buffer, Buffer)
+    n = count.int_val()
+    affirm(0 <= n <= buffer.capacity(), u"Count is larger than the buffer")
+    decoder.feed(rffi.charpsize2str(buffer.buffer(), n), False)
+    return decoder
+
+@as_var("pixie.streams.utf8.internal", "finish-utf8")
+def finish_utf8(decoder):
+    """(finish-utf8 decoder)
+       Returns everything the decoder has decoded as a string. Throws if the bytes fed
+       to it end partway through a character."""
+    affirm(isinstance(decoder, UTF8Decoder), u"Expected a UTF8 decoder")
+    assert isinstance(decoder, UTF8Decoder)
+    return rt.wrap(decoder.finish())
+
+@as_var("pixie.streams.utf8.internal", "encode-utf8")
+def encode_utf8(s):
+    """(encode-utf8 s)
+       Returns a new buffer holding s encoded as UTF-8. The caller should dispose! it."""
+    affirm(isinstance(s, String), u"Expected a String")
+    u = rt.name(s)
+    data = unicode_encode_utf_8(u, len(u), "strict")
+    buffer = Buffer(len(data))
+    rffi.str2chararray(data, buffer.buffer(), len(data))
+    buffer.set_used_size(len(data))
+    return buffer
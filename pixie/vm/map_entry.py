@@ -2,6 +2,9 @@ py_object = object
 import pixie.vm.object as object
 import pixie.vm.stdlib as proto
 from  pixie.vm.code import extend, as_var
+from rpython.rlib.rarithmetic import r_uint, intmask
+import pixie.vm.rt as rt
+import pixie.vm.util as util
 
 class MapEntry(object.Object):
     _type = object.Type(u"pixie.stdlib.MapEntry")
@@ -12,7 +15,15 @@ class MapEntry(object.Object):
     def __init__(self, key, val):
         self._key = key
         self._val = val
+        self._hash = r_uint(0)
 
+    def coll_hash(self):
+        if self._hash == 0:
+            acc = util.HashingState()
+            acc.update_hash_ordered(self._key)
+            acc.update_hash_ordered(self._val)
+            self._hash = acc.finish_hash()
+        return self._hash
 
 
 @as_var("map-entry")
@@ -30,3 +41,7 @@ def _val(self):
     assert isinstance(self, MapEntry)
     return self._val
 
+@extend(proto._hash, MapEntry)
+def _hash(self):
+    assert isinstance(self, MapEntry)
+    return rt.wrap(intmask(self.coll_hash()))
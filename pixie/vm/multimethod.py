@@ -0,0 +1,199 @@
+py_object = object
+import pixie.vm.object as object
+from pixie.vm.object import affirm
+from pixie.vm.code import as_var, extend, intern_var, NativeFn
+from pixie.vm.primitives import nil, true
+from pixie.vm.keyword import keyword
+import pixie.vm.stdlib as proto
+import pixie.vm.rt as rt
+
+
+ISA = intern_var(u"pixie.stdlib", u"isa?")
+
+METHODS_KW = keyword(u"methods")
+DEFAULT_KW = keyword(u"default")
+
+
+class EntriesFn(NativeFn):
+    def __init__(self):
+        self._keys = []
+        self._vals = []
+
+    def invoke(self, args):
+        entry = args[1]
+        self._keys.append(rt._key(entry))
+        self._vals.append(rt._val(entry))
+        return nil
+
+
+class MultiMethod(object.Object):
+    """A fn that picks one of its methods by the result of a dispatch fn.
+
+    The method found for a dispatch value is cached, so only the first call
+    with a given value searches the methods. The cache is dropped whenever
+    the methods, the preferences or the hierarchy change. The method for the
+    last dispatch value is also kept aside, which is what most call sites
+    hit when dispatching on keywords."""
+    _type = object.Type(u"pixie.stdlib.MultiMethod")
+
+    def type(self):
+        return MultiMethod._type
+
+    def __init__(self, name, dispatch_fn, default_val, hierarchy):
+        self._name = name
+        self._dispatch_fn = dispatch_fn
+        self._default_val = default_val
+        self._hierarchy = hierarchy
+        self._methods = rt.hashmap()
+        self._prefers = rt.hashmap()
+        self.reset_cache()
+
+    def reset_cache(self):
+        self._cache = rt.hashmap()
+        self._cached_hierarchy = nil
+        self._last_val = None
+        self._last_method = None
+
+    def add_method(self, dispatch_val, method):
+        self._methods = rt._assoc(self._methods, dispatch_val, method)
+        self.reset_cache()
+
+    def remove_method(self, dispatch_val):
+        self._methods = rt._dissoc(self._methods, dispatch_val)
+        self.reset_cache()
+
+    def prefer_method(self, x, y):
+        affirm(not self.prefers(y, x), u"Preference conflict in multimethod '" + self._name + u"': "
+               + rt.name(rt._repr(y)) + u" is already preferred to " + rt.name(rt._repr(x)))
+        prefs = rt._val_at(self._prefers, x, nil)
+        if prefs is nil:
+            prefs = rt.hashmap()
+        self._prefers = rt._assoc(self._prefers, x, rt._assoc(prefs, y, true))
+        self.reset_cache()
+
+    def prefers(self, x, y):
+        prefs = rt._val_at(self._prefers, x, nil)
+        return prefs is not nil and rt._contains_key(prefs, y) is true
+
+    def isa(self, hierarchy, child, parent):
+        return rt.is_true(ISA.invoke([hierarchy, child, parent]))
+
+    def dominates(self, hierarchy, x, y):
+        return self.prefers(x, y) or self.isa(hierarchy, x, y)
+
+    def find_method(self, dispatch_val, hierarchy):
+        entries = EntriesFn()
+        rt._reduce(self._methods, entries, nil)
+
+        best_key = None
+        best = nil
+        for x in range(len(entries._keys)):
+            key = entries._keys[x]
+            if not self.isa(hierarchy, dispatch_val, key):
+                continue
+            if best_key is None or self.dominates(hierarchy, key, best_key):
+                best_key = key
+                best = entries._vals[x]
+            affirm(self.dominates(hierarchy, best_key, key),
+                   u"Multiple methods in multimethod '" + self._name + u"' match dispatch value: "
+                   + rt.name(rt._repr(dispatch_val)) + u" -> " + rt.name(rt._repr(key)) + u" and "
+                   + rt.name(rt._repr(best_key)) + u", and neither is preferred")
+
+        if best is nil:
+            best = rt._val_at(self._methods, self._default_val, nil)
+        return best
+
+    def get_method(self, dispatch_val):
+        hierarchy = rt._deref(self._hierarchy)
+        if hierarchy is not self._cached_hierarchy:
+            self.reset_cache()
+            self._cached_hierarchy = hierarchy
+
+        if dispatch_val is self._last_val:
+            return self._last_method
+
+        method = rt._val_at(self._cache, dispatch_val, nil)
+        if method is nil:
+            method = self.find_method(dispatch_val, hierarchy)
+            if method is nil:
+                return nil
+            self._cache = rt._assoc(self._cache, dispatch_val, method)
+
+        self._last_val = dispatch_val
+        self._last_method = method
+        return method
+
+    def invoke(self, args):
+        # A copy, the dispatch fn's frame may write to it (see Frame.restart)
+        dispatch_val = self._dispatch_fn.invoke(args[:])
+        method = self.get_method(dispatch_val)
+        affirm(method is not nil, u"No method in multimethod '" + self._name + u"' for dispatch value: "
+               + rt.name(rt._repr(dispatch_val)))
+        return method.invoke(args)
+
+
+@extend(proto._get_attr, MultiMethod)
+def _get_attr(self, kw):
+    assert isinstance(self, MultiMethod)
+    if kw is METHODS_KW:
+        return self._methods
+    if kw is DEFAULT_KW:
+        return self._default_val
+    return nil
+
+@extend(proto._str, MultiMethod)
+def _str(self):
+    assert isinstance(self, MultiMethod)
+    return rt.wrap(u"<MultiMethod " + self._name + u">")
+
+@extend(proto._repr, MultiMethod)
+def _repr(self):
+    assert isinstance(self, MultiMethod)
+    return rt.wrap(u"<MultiMethod " + self._name + u">")
+
+
+def multi_method(mm):
+    affirm(isinstance(mm, MultiMethod), u"Expected a MultiMethod")
+    assert isinstance(mm, MultiMethod)
+    return mm
+
+@as_var("-multi-method")
+def _multi_method(name, dispatch_fn, default_val, hierarchy):
+    return MultiMethod(rt.name(name), dispatch_fn, default_val, hierarchy)
+
+@as_var("-add-method")
+def _add_method(mm, dispatch_val, method):
+    multi_method(mm).add_method(dispatch_val, method)
+    return mm
+
+@as_var("remove-method")
+def remove_method(mm, dispatch_val):
+    """(remove-method multifn dispatch-val)
+       Removes the method of multifn for dispatch-val."""
+    multi_method(mm).remove_method(dispatch_val)
+    return mm
+
+@as_var("prefer-method")
+def prefer_method(mm, x, y):
+    """(prefer-method multifn dispatch-val-x dispatch-val-y)
+       Makes multifn pick the method for x over the one for y when both match a dispatch value."""
+    multi_method(mm).prefer_method(x, y)
+    return mm
+
+@as_var("methods")
+def methods(mm):
+    """(methods multifn)
+       Returns a map of the dispatch values of multifn to its methods."""
+    return multi_method(mm)._methods
+
+@as_var("prefers")
+def prefers(mm):
+    """(prefers multifn)
+       Returns a map of the dispatch values of multifn to the values they are preferred over."""
+    return multi_method(mm)._prefers
+
+@as_var("get-method")
+def get_method(mm, dispatch_val):
+    """(get-method multifn dispatch-val)
+       Returns the method multifn would call for dispatch-val, or nil if there is none."""
+    return multi_method(mm).get_method(dispatch_val)
@@ -59,9 +59,10 @@ class TypeRegistry(object):
         self._ns_registry = None
 
     def register_type(self, nm, tp):
-        if self._ns_registry is None:
-            self._types[nm] = tp
-        else:
+        # Types made at runtime (deftype, defrecord) are kept by name too, so
+        # tagged values of them can be read back
+        self._types[nm] = tp
+        if self._ns_registry is not None:
             self.var_for_type_and_name(nm, tp)
 
     def var_for_type_and_name(self, nm, tp):
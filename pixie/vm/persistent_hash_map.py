@@ -4,9 +4,11 @@ from pixie.vm.object import affirm
 from pixie.vm.primitives import nil, true, false
 import pixie.vm.stdlib as proto
 from  pixie.vm.code import extend, as_var
+import pixie.vm.code as code
 from rpython.rlib.rarithmetic import r_int, r_uint, intmask
 import rpython.rlib.jit as jit
 import pixie.vm.rt as rt
+import pixie.vm.util as util
 
 MASK_32 = r_uint(0xFFFFFFFF)
 
@@ -26,12 +28,32 @@ class PersistentHashMap(object.Object):
         self._cnt = cnt
         self._root = root
         self._meta = meta
+        self._hash = r_uint(0)
+
+    def transient(self):
+        return TransientHashMap(Box(), self._cnt, self._root, self._meta)
 
     def meta(self):
         return self._meta
 
     def with_meta(self, meta):
-        return PersistentHashMap(self._cnt, self._root, meta)
+        m = PersistentHashMap(self._cnt, self._root, meta)
+        m._hash = self._hash
+        return m
+
+    def coll_hash(self, include_vals=True):
+        if not include_vals:
+            acc = util.HashingState()
+            if self._root is not None:
+                self._root.hash_inode(acc, False)
+            return acc.finish_hash()
+
+        if self._hash == 0:
+            acc = util.HashingState()
+            if self._root is not None:
+                self._root.hash_inode(acc, True)
+            self._hash = acc.finish_hash()
+        return self._hash
 
     def assoc(self, key, val):
         added_leaf = Box()
@@ -77,6 +99,15 @@ class INode(object.Object):
     def without(self, shift, hash, key):
         pass
 
+    def hash_inode(self, acc, include_vals):
+        pass
+
+    def assoc_inode_edit(self, edit, shift, hash_val, key, val, added_leaf):
+        pass
+
+    def without_inode_edit(self, edit, shift, hash_val, key, removed_leaf):
+        pass
+
 def mask(hash, shift):
     return (hash >> shift) & 0x01f
 
@@ -174,6 +205,121 @@ class BitmapIndexedNode(INode):
                 return init
         return init
 
+    def ensure_editable(self, edit):
+        if self._edit is edit:
+            return self
+        return BitmapIndexedNode(edit, self._bitmap, self._array[:])
+
+    def edit_and_set(self, edit, i, a):
+        editable = self.ensure_editable(edit)
+        editable._array[i] = a
+        return editable
+
+    def edit_and_set2(self, edit, i, a, j, b):
+        editable = self.ensure_editable(edit)
+        editable._array[i] = a
+        editable._array[j] = b
+        return editable
+
+    def edit_and_remove_pair(self, edit, bit, idx):
+        if self._bitmap == bit:
+            return None
+        editable = self.ensure_editable(edit)
+        editable._bitmap ^= bit
+        editable._array = remove_pair(editable._array, idx)
+        return editable
+
+    def assoc_inode_edit(self, edit, shift, hash_val, key, val, added_leaf):
+        bit = bitpos(hash_val, shift)
+        idx = self.index(bit)
+
+        if (self._bitmap & bit) != 0:
+            key_or_null = self._array[2 * idx]
+            val_or_node = self._array[2 * idx + 1]
+
+            if key_or_null is None:
+                assert isinstance(val_or_node, INode)
+                n = val_or_node.assoc_inode_edit(edit, shift + 5, hash_val, key, val, added_leaf)
+                if n is val_or_node:
+                    return self
+                return self.edit_and_set(edit, 2 * idx + 1, n)
+
+            if rt.eq(key, key_or_null):
+                if val is val_or_node:
+                    return self
+                return self.edit_and_set(edit, 2 * idx + 1, val)
+
+            added_leaf._val = added_leaf
+            return self.edit_and_set2(edit,
+                                      2 * idx, None,
+                                      2 * idx + 1, create_node_edit(edit, shift + 5, key_or_null, val_or_node,
+                                                                    hash_val, key, val))
+        else:
+            n = bit_count(self._bitmap)
+            if n >= 16:
+                nodes = [None] * 32
+                jdx = mask(hash_val, shift)
+                nodes[jdx] = BitmapIndexedNode_EMPTY.assoc_inode_edit(edit, shift + 5, hash_val, key, val, added_leaf)
+                j = 0
+
+                for i in range(32):
+                    if (self._bitmap >> i) & 1 != 0:
+                        if self._array[j] is None:
+                            nodes[i] = self._array[j + 1]
+                        else:
+                            nodes[i] = BitmapIndexedNode_EMPTY.assoc_inode_edit(edit, shift + 5, rt.hash(self._array[j]),
+                                                                                self._array[j], self._array[j + 1],
+                                                                                added_leaf)
+                        j += 2
+
+                return ArrayNode(edit, n + 1, nodes)
+            else:
+                new_array = [None] * (2 * (n + 1))
+                list_copy(self._array, 0, new_array, 0, 2 * idx)
+                new_array[2 * idx] = key
+                added_leaf._val = added_leaf
+                new_array[2 * idx + 1] = val
+                list_copy(self._array, 2 * idx, new_array, 2 * (idx + 1), 2 * (n - idx))
+                if self._edit is edit:
+                    self._array = new_array
+                    self._bitmap |= bit
+                    return self
+                return BitmapIndexedNode(edit, self._bitmap | bit, new_array)
+
+    def without_inode_edit(self, edit, shift, hash_val, key, removed_leaf):
+        bit = bitpos(hash_val, shift)
+        if self._bitmap & bit == 0:
+            return self
+
+        idx = self.index(bit)
+        key_or_none = self._array[2 * idx]
+        val_or_node = self._array[2 * idx + 1]
+
+        if key_or_none is None:
+            n = val_or_node.without_inode_edit(edit, shift + 5, hash_val, key, removed_leaf)
+            if n is val_or_node:
+                return self
+            if n is not None:
+                return self.edit_and_set(edit, 2 * idx + 1, n)
+            return self.edit_and_remove_pair(edit, bit, idx)
+
+        if rt.eq(key, key_or_none):
+            removed_leaf._val = removed_leaf
+            return self.edit_and_remove_pair(edit, bit, idx)
+
+        return self
+
+    def hash_inode(self, acc, include_vals):
+        for x in range(0, len(self._array), 2):
+            key_or_none = self._array[x]
+            val_or_node = self._array[x + 1]
+            if key_or_none is None and val_or_node is not None:
+                val_or_node.hash_inode(acc, include_vals)
+            else:
+                acc.update_hash_unordered(key_or_none)
+                if include_vals:
+                    acc.update_hash_unordered(val_or_node)
+
     def without_inode(self, shift, hash, key):
         bit = bitpos(hash, shift)
         if self._bitmap & bit == 0:
@@ -230,12 +376,53 @@ class ArrayNode(INode):
             return self
         if n is None:
             if self._cnt <= 8:  # shrink
-                return self.pack(idx)
+                return self.pack(None, idx)
             return ArrayNode(None, self._cnt - 1, clone_and_set(self._array, idx, n))
         else:
             return ArrayNode(None, self._cnt, clone_and_set(self._array, idx, n))
 
-    def pack(self, idx):
+    def ensure_editable(self, edit):
+        if self._edit is edit:
+            return self
+        return ArrayNode(edit, self._cnt, self._array[:])
+
+    def edit_and_set(self, edit, i, n):
+        editable = self.ensure_editable(edit)
+        editable._array[i] = n
+        return editable
+
+    def assoc_inode_edit(self, edit, shift, hash_val, key, val, added_leaf):
+        idx = mask(hash_val, shift)
+        node = self._array[idx]
+        if node is None:
+            editable = self.edit_and_set(edit, idx,
+                                         BitmapIndexedNode_EMPTY.assoc_inode_edit(edit, shift + 5, hash_val, key,
+                                                                                  val, added_leaf))
+            editable._cnt += 1
+            return editable
+
+        n = node.assoc_inode_edit(edit, shift + 5, hash_val, key, val, added_leaf)
+        if n is node:
+            return self
+        return self.edit_and_set(edit, idx, n)
+
+    def without_inode_edit(self, edit, shift, hash_val, key, removed_leaf):
+        idx = r_uint(mask(hash_val, shift))
+        node = self._array[idx]
+        if node is None:
+            return self
+        n = node.without_inode_edit(edit, shift + 5, hash_val, key, removed_leaf)
+        if n is node:
+            return self
+        if n is None:
+            if self._cnt <= 8:  # shrink
+                return self.pack(edit, idx)
+            editable = self.edit_and_set(edit, idx, n)
+            editable._cnt -= 1
+            return editable
+        return self.edit_and_set(edit, idx, n)
+
+    def pack(self, edit, idx):
         new_array = [None] * (2 * (self._cnt - 1))
         j = r_uint(1)
         bitmap = r_uint(0)
@@ -258,7 +445,7 @@ class ArrayNode(INode):
 
             i += 1
 
-        return BitmapIndexedNode(None, bitmap, new_array)
+        return BitmapIndexedNode(edit, bitmap, new_array)
 
 
     def find(self, shift, hash_val, key, not_found):
@@ -278,6 +465,12 @@ class ArrayNode(INode):
 
         return init
 
+    def hash_inode(self, acc, include_vals):
+        for x in range(len(self._array)):
+            node = self._array[x]
+            if node is not None:
+                node.hash_inode(acc, include_vals)
+
 class HashCollisionNode(INode):
     def __init__(self, edit, hash, array):
         self._hash = hash
@@ -322,6 +515,57 @@ class HashCollisionNode(INode):
                 return init
         return init
 
+    def ensure_editable(self, edit):
+        if self._edit is edit:
+            return self
+        return HashCollisionNode(edit, self._hash, self._array[:])
+
+    def assoc_inode_edit(self, edit, shift, hash_val, key, val, added_leaf):
+        if hash_val == self._hash:
+            idx = self.find_index(key)
+            if idx != -1:
+                if self._array[idx + 1] is val:
+                    return self
+                editable = self.ensure_editable(edit)
+                editable._array[idx + 1] = val
+                return editable
+
+            count = len(self._array)
+            new_array = [None] * (count + 2)
+            list_copy(self._array, 0, new_array, 0, count)
+            new_array[count] = key
+            added_leaf._val = added_leaf
+            new_array[count + 1] = val
+            if self._edit is edit:
+                self._array = new_array
+                return self
+            return HashCollisionNode(edit, self._hash, new_array)
+        return BitmapIndexedNode(edit, bitpos(self._hash, shift), [None, self]) \
+                                .assoc_inode_edit(edit, shift, hash_val, key, val, added_leaf)
+
+    def without_inode_edit(self, edit, shift, hash_val, key, removed_leaf):
+        idx = self.find_index(key)
+        if idx == -1:
+            return self
+
+        removed_leaf._val = removed_leaf
+        if len(self._array) == 2:
+            return None
+
+        editable = self.ensure_editable(edit)
+        editable._array = remove_pair(editable._array, r_uint(idx) / 2)
+        return editable
+
+    def hash_inode(self, acc, include_vals):
+        for x in range(0, len(self._array), 2):
+            key_or_nil = self._array[x]
+            if key_or_nil is None:
+                continue
+
+            acc.update_hash_unordered(key_or_nil)
+            if include_vals:
+                acc.update_hash_unordered(self._array[x + 1])
+
     def find_index(self, key):
         i = r_int(0)
         while i < len(self._array):
@@ -351,6 +595,14 @@ def create_node(shift, key1, val1, key2hash, key2, val2):
     return BitmapIndexedNode_EMPTY.assoc_inode(shift, key1hash, key1, val1, added_leaf) \
                                   .assoc_inode(shift, key2hash, key2, val2, added_leaf)
 
+def create_node_edit(edit, shift, key1, val1, key2hash, key2, val2):
+    key1hash = rt.hash(key1) & MASK_32
+    if key1hash == key2hash:
+        return HashCollisionNode(edit, key1hash, [key1, val1, key2, val2])
+    added_leaf = Box()
+    return BitmapIndexedNode_EMPTY.assoc_inode_edit(edit, shift, key1hash, key1, val1, added_leaf) \
+                                  .assoc_inode_edit(edit, shift, key2hash, key2, val2, added_leaf)
+
 def bit_count(i):
     assert isinstance(i, r_uint)
     i = i - ((i >> 1) & r_uint(0x55555555))
@@ -400,6 +652,50 @@ def remove_pair(array, i):
     list_copy(array, 2 * (i + 1), new_array, 2 * i, len(new_array) - (2 * i))
     return new_array
 
+class TransientHashMap(object.Object):
+    _type = object.Type(u"pixie.stdlib.TransientHashMap")
+
+    def type(self):
+        return TransientHashMap._type
+
+    def __init__(self, edit, cnt, root, meta=nil):
+        self._edit = edit
+        self._cnt = cnt
+        self._root = root
+        self._meta = meta
+        self._leaf_flag = Box()
+
+    def ensure_editable(self):
+        affirm(self._edit is not None, u"Transient used after call to persist!")
+
+    def assoc(self, key, val):
+        self.ensure_editable()
+        self._leaf_flag._val = None
+        root = BitmapIndexedNode_EMPTY if self._root is None else self._root
+        self._root = root.assoc_inode_edit(self._edit, r_uint(0), rt.hash(key) & MASK_32, key, val, self._leaf_flag)
+        if self._leaf_flag._val is not None:
+            self._cnt += 1
+        return self
+
+    def without(self, key):
+        self.ensure_editable()
+        if self._root is None:
+            return self
+        self._leaf_flag._val = None
+        self._root = self._root.without_inode_edit(self._edit, r_uint(0), rt.hash(key) & MASK_32, key, self._leaf_flag)
+        if self._leaf_flag._val is not None:
+            self._cnt -= 1
+        return self
+
+    def val_at(self, key, not_found):
+        self.ensure_editable()
+        return not_found if self._root is None else self._root.find(r_uint(0), rt.hash(key) & MASK_32, key, not_found)
+
+    def persistent(self):
+        self.ensure_editable()
+        self._edit = None
+        return PersistentHashMap(self._cnt, self._root, self._meta)
+
 ### hook into RT
 
 EMPTY = PersistentHashMap(r_uint(0), None)
@@ -409,17 +705,17 @@ def hashmap__args(args):
     affirm(len(args) & 0x1 == 0, u"hashmap requires even number of args")
 
     idx = 0
-    acc = EMPTY
+    acc = EMPTY.transient()
 
     while idx < len(args):
         key = args[idx]
         val = args[idx + 1]
 
-        acc = acc.assoc(key, val)
+        acc.assoc(key, val)
 
         idx += 2
 
-    return acc
+    return acc.persistent()
 
 
 @extend(proto._count, PersistentHashMap)
@@ -479,3 +775,75 @@ def _contains_key(self, key):
         return true if self._root.find(r_uint(0), rt.hash(key), key, NOT_FOUND) is not NOT_FOUND else false
     else:
         return false
+
+@extend(proto._hash, PersistentHashMap)
+def _hash(self):
+    assert isinstance(self, PersistentHashMap)
+    return rt.wrap(intmask(self.coll_hash()))
+
+class EntryInFn(code.NativeFn):
+    """Reducing fn that stops with false at the first entry missing from `other`."""
+    def __init__(self, other):
+        code.NativeFn.__init__(self)
+        self._other = other
+
+    def invoke(self, args):
+        entry = args[1]
+        other_val = rt._val_at(self._other, rt._key(entry), NOT_FOUND)
+        if other_val is NOT_FOUND or not rt.eq(other_val, rt._val(entry)):
+            return rt.reduced(false)
+        return true
+
+@extend(proto._eq, PersistentHashMap)
+def _eq(self, obj):
+    assert isinstance(self, PersistentHashMap)
+    if self is obj:
+        return true
+    if not rt._satisfies_QMARK_(proto.IMap, obj):
+        return false
+    if isinstance(obj, PersistentHashMap):
+        if self._cnt != obj._cnt:
+            return false
+        if self._hash != 0 and obj._hash != 0 and self._hash != obj._hash:
+            return false
+    elif rt.count(obj) != self._cnt:
+        return false
+    if self._root is None:
+        return true
+    result = self._root.reduce_inode(EntryInFn(obj), true)
+    return rt.deref(result) if rt.reduced_QMARK_(result) else result
+
+@extend(proto._transient, PersistentHashMap)
+def _transient(self):
+    assert isinstance(self, PersistentHashMap)
+    return self.transient()
+
+@extend(proto._persistent_BANG_, TransientHashMap)
+def _persistent(self):
+    assert isinstance(self, TransientHashMap)
+    return self.persistent()
+
+@extend(proto._assoc_BANG_, TransientHashMap)
+def _assoc_bang(self, key, val):
+    assert isinstance(self, TransientHashMap)
+    return self.assoc(key, val)
+
+@extend(proto._dissoc_BANG_, TransientHashMap)
+def _dissoc_bang(self, key):
+    assert isinstance(self, TransientHashMap)
+    return self.without(key)
+
+@extend(proto._val_at, TransientHashMap)
+def _val_at(self, key, not_found):
+    assert isinstance(self, TransientHashMap)
+    return self.val_at(key, not_found)
+
+@extend(proto._contains_key, TransientHashMap)
+def _contains_key(self, key):
+    assert isinstance(self, TransientHashMap)
+    return true if self.val_at(key, NOT_FOUND) is not NOT_FOUND else false
+
+@extend(proto._count, TransientHashMap)
+def _count(self):
+    assert isinstance(self, TransientHashMap)
+    return rt.wrap(intmask(self._cnt))
@@ -5,6 +5,7 @@ import pixie.vm.persistent_hash_map as persistent_hash_map
 import pixie.vm.stdlib as proto
 from  pixie.vm.code import extend, as_var, intern_var
 import pixie.vm.rt as rt
+from rpython.rlib.rarithmetic import r_uint, intmask
 
 
 VAR_KEY = intern_var(u"pixie.stdlib", u"key")
@@ -18,6 +19,7 @@ class PersistentHashSet(object.Object):
     def __init__(self, meta, m):
         self._meta = meta
         self._map = m
+        self._hash = r_uint(0)
 
     def conj(self, v):
         return PersistentHashSet(self._meta, self._map.assoc(v, v))
@@ -29,18 +31,49 @@ class PersistentHashSet(object.Object):
         return self._meta
 
     def with_meta(self, meta):
-        return PersistentHashSet(meta, self._map)
+        s = PersistentHashSet(meta, self._map)
+        s._hash = self._hash
+        return s
+
+    def transient(self):
+        return TransientHashSet(self._meta, self._map.transient())
+
+    def coll_hash(self):
+        if self._hash == 0:
+            self._hash = self._map.coll_hash(False)
+        return self._hash
+
+class TransientHashSet(object.Object):
+    _type = object.Type(u"pixie.stdlib.TransientHashSet")
+
+    def type(self):
+        return TransientHashSet._type
+
+    def __init__(self, meta, m):
+        self._meta = meta
+        self._map = m
+
+    def conj(self, v):
+        self._map.assoc(v, v)
+        return self
+
+    def disj(self, k):
+        self._map.without(k)
+        return self
+
+    def persistent(self):
+        return PersistentHashSet(self._meta, self._map.persistent())
 
 EMPTY = PersistentHashSet(nil, persistent_hash_map.EMPTY)
 
 @as_var("set")
 def _create(coll):
-    ret = EMPTY
+    ret = EMPTY.transient()
     coll = rt._seq(coll)
     while coll is not nil:
-        ret = ret.conj(rt._first(coll))
+        ret.conj(rt._first(coll))
         coll = rt._seq(rt._next(coll))
-    return ret
+    return ret.persistent()
 
 @extend(proto._count, PersistentHashSet)
 def _count(self):
@@ -57,14 +90,19 @@ def _contains_key(self, key):
     assert isinstance(self, PersistentHashSet)
     return rt._contains_key(self._map, key)
 
+proto.ISet.add_satisfies(PersistentHashSet._type)
+
 @extend(proto._eq, PersistentHashSet)
 def _eq(self, obj):
     assert isinstance(self, PersistentHashSet)
     if self is obj:
         return true
-    if not isinstance(obj, PersistentHashSet):
-        return false
-    if self._map._cnt != obj._map._cnt:
+    if isinstance(obj, PersistentHashSet):
+        if self._map._cnt != obj._map._cnt:
+            return false
+        if self._hash != 0 and obj._hash != 0 and self._hash != obj._hash:
+            return false
+    elif not rt._satisfies_QMARK_(proto.ISet, obj) or rt.count(obj) != self._map._cnt:
         return false
 
     seq = rt.seq(obj)
@@ -74,6 +112,11 @@ def _eq(self, obj):
         seq = rt.next(seq)
     return true
 
+@extend(proto._hash, PersistentHashSet)
+def _hash(self):
+    assert isinstance(self, PersistentHashSet)
+    return rt.wrap(intmask(self.coll_hash()))
+
 @extend(proto._conj, PersistentHashSet)
 def _conj(self, v):
     assert isinstance(self, PersistentHashSet)
@@ -98,3 +141,38 @@ def _meta(self):
 def _with_meta(self, meta):
     assert isinstance(self, PersistentHashSet)
     return self.with_meta(meta)
+
+@extend(proto._transient, PersistentHashSet)
+def _transient(self):
+    assert isinstance(self, PersistentHashSet)
+    return self.transient()
+
+@extend(proto._persistent_BANG_, TransientHashSet)
+def _persistent(self):
+    assert isinstance(self, TransientHashSet)
+    return self.persistent()
+
+@extend(proto._conj_BANG_, TransientHashSet)
+def _conj_bang(self, v):
+    assert isinstance(self, TransientHashSet)
+    return self.conj(v)
+
+@extend(proto._disj_BANG_, TransientHashSet)
+def _disj_bang(self, v):
+    assert isinstance(self, TransientHashSet)
+    return self.disj(v)
+
+@extend(proto._count, TransientHashSet)
+def _count(self):
+    assert isinstance(self, TransientHashSet)
+    return rt._count(self._map)
+
+@extend(proto._val_at, TransientHashSet)
+def _val_at(self, key, not_found):
+    assert isinstance(self, TransientHashSet)
+    return self._map.val_at(key, not_found)
+
+@extend(proto._contains_key, TransientHashSet)
+def _contains_key(self, key):
+    assert isinstance(self, TransientHashSet)
+    return rt._contains_key(self._map, key)
@@ -4,6 +4,7 @@ import pixie.vm.stdlib as proto
 from  pixie.vm.code import extend, as_var
 from rpython.rlib.rarithmetic import r_uint, intmask
 import pixie.vm.rt as rt
+import pixie.vm.util as util
 
 class PersistentList(object.Object):
     _type = object.Type(u"pixie.stdlib.PersistentList")
@@ -16,6 +17,7 @@ class PersistentList(object.Object):
         self._next = tail
         self._cnt = cnt
         self._meta = meta
+        self._hash = r_uint(0)
 
     def first(self):
         return self._first
@@ -27,8 +29,19 @@ class PersistentList(object.Object):
         return self._meta
 
     def with_meta(self, meta):
-        return PersistentList(self._first, self._next, self._cnt, meta)
-    
+        l = PersistentList(self._first, self._next, self._cnt, meta)
+        l._hash = self._hash
+        return l
+
+    def coll_hash(self):
+        if self._hash == 0:
+            acc = util.HashingState()
+            node = self
+            while isinstance(node, PersistentList):
+                acc.update_hash_ordered(node._first)
+                node = node._next
+            self._hash = acc.finish_hash()
+        return self._hash
 
 
 @extend(proto._first, PersistentList)
@@ -51,6 +64,11 @@ def _count(self):
     assert isinstance(self, PersistentList)
     return rt.wrap(intmask(self._cnt))
 
+@extend(proto._hash, PersistentList)
+def _hash(self):
+    assert isinstance(self, PersistentList)
+    return rt.wrap(intmask(self.coll_hash()))
+
 @extend(proto._conj, PersistentList)
 def _conj(self, itm):
     assert isinstance(self, PersistentList)
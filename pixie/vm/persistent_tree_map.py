@@ -0,0 +1,421 @@
+py_object = object
+import pixie.vm.object as object
+from pixie.vm.object import affirm, runtime_error
+from pixie.vm.primitives import nil, true, false
+import pixie.vm.stdlib as proto
+from pixie.vm.code import extend, as_var
+from pixie.vm.map_entry import MapEntry
+from pixie.vm.persistent_vector import PersistentVector
+from pixie.vm.persistent_hash_map import Box, EntryInFn
+from pixie.vm.sort import ComparatorFn, comparator_for
+from rpython.rlib.rarithmetic import r_uint, intmask
+import pixie.vm.rt as rt
+import pixie.vm.util as util
+
+
+class TreeNode(py_object):
+    """Node of a persistent AVL tree, ordered by key."""
+    _immutable_fields_ = ["_key", "_val", "_left", "_right", "_height"]
+
+    def __init__(self, key, val, left, right):
+        self._key = key
+        self._val = val
+        self._left = left
+        self._right = right
+        self._height = max(height(left), height(right)) + 1
+
+def height(node):
+    return 0 if node is None else node._height
+
+def rotate_right(key, val, left, right):
+    return TreeNode(left._key, left._val, left._left, TreeNode(key, val, left._right, right))
+
+def rotate_left(key, val, left, right):
+    return TreeNode(right._key, right._val, TreeNode(key, val, left, right._left), right._right)
+
+def balance(key, val, left, right):
+    """Builds a node from subtrees whose heights differ by at most two,
+    rotating when they differ by two."""
+    lh = height(left)
+    rh = height(right)
+    if lh > rh + 1:
+        if height(left._left) < height(left._right):
+            left = rotate_left(left._key, left._val, left._left, left._right)
+        return rotate_right(key, val, left, right)
+    if rh > lh + 1:
+        if height(right._right) < height(right._left):
+            right = rotate_right(right._key, right._val, right._left, right._right)
+        return rotate_left(key, val, left, right)
+    return TreeNode(key, val, left, right)
+
+def tree_find(comparator, node, key):
+    while node is not None:
+        c = comparator.compare(key, node._key)
+        if c == 0:
+            return node
+        node = node._left if c < 0 else node._right
+    return None
+
+def tree_assoc(comparator, node, key, val, added_leaf):
+    if node is None:
+        added_leaf._val = added_leaf
+        return TreeNode(key, val, None, None)
+
+    c = comparator.compare(key, node._key)
+    if c < 0:
+        left = tree_assoc(comparator, node._left, key, val, added_leaf)
+        if left is node._left:
+            return node
+        return balance(node._key, node._val, left, node._right)
+    if c > 0:
+        right = tree_assoc(comparator, node._right, key, val, added_leaf)
+        if right is node._right:
+            return node
+        return balance(node._key, node._val, node._left, right)
+
+    if node._val is val:
+        return node
+    return TreeNode(node._key, val, node._left, node._right)
+
+def tree_without(comparator, node, key, removed_leaf):
+    if node is None:
+        return None
+
+    c = comparator.compare(key, node._key)
+    if c < 0:
+        left = tree_without(comparator, node._left, key, removed_leaf)
+        if left is node._left:
+            return node
+        return balance(node._key, node._val, left, node._right)
+    if c > 0:
+        right = tree_without(comparator, node._right, key, removed_leaf)
+        if right is node._right:
+            return node
+        return balance(node._key, node._val, node._left, right)
+
+    removed_leaf._val = removed_leaf
+    if node._left is None:
+        return node._right
+    if node._right is None:
+        return node._left
+
+    successor = node._right
+    while successor._left is not None:
+        successor = successor._left
+    return balance(successor._key, successor._val, node._left, without_min(node._right))
+
+def without_min(node):
+    if node._left is None:
+        return node._right
+    return balance(node._key, node._val, without_min(node._left), node._right)
+
+def tree_reduce(node, f, init, keys_only):
+    while node is not None:
+        init = tree_reduce(node._left, f, init, keys_only)
+        if rt.reduced_QMARK_(init):
+            return init
+        init = f.invoke([init, node._key if keys_only else MapEntry(node._key, node._val)])
+        if rt.reduced_QMARK_(init):
+            return init
+        node = node._right
+    return init
+
+def tree_hash(node, acc, include_vals):
+    while node is not None:
+        tree_hash(node._left, acc, include_vals)
+        acc.update_hash_unordered(node._key)
+        if include_vals:
+            acc.update_hash_unordered(node._val)
+        node = node._right
+
+
+class NodeStack(py_object):
+    """Immutable stack of the nodes a TreeSeq still has to visit."""
+    _immutable_fields_ = ["_node", "_next"]
+
+    def __init__(self, node, next):
+        self._node = node
+        self._next = next
+
+def push_spine(node, stack, ascending):
+    while node is not None:
+        stack = NodeStack(node, stack)
+        node = node._left if ascending else node._right
+    return stack
+
+
+class TreeSeq(object.Object):
+    _type = object.Type(u"pixie.stdlib.TreeSeq")
+    _immutable_fields_ = ["_stack", "_ascending", "_keys_only"]
+
+    def type(self):
+        return TreeSeq._type
+
+    def __init__(self, stack, ascending, keys_only):
+        self._stack = stack
+        self._ascending = ascending
+        self._keys_only = keys_only
+        self._hash = r_uint(0)
+
+    def first(self):
+        node = self._stack._node
+        return node._key if self._keys_only else MapEntry(node._key, node._val)
+
+    def next(self):
+        node = self._stack._node
+        child = node._right if self._ascending else node._left
+        stack = push_spine(child, self._stack._next, self._ascending)
+        return make_seq(stack, self._ascending, self._keys_only)
+
+    def coll_hash(self):
+        if self._hash == 0:
+            acc = util.HashingState()
+            s = self
+            while s is not nil:
+                assert isinstance(s, TreeSeq)
+                acc.update_hash_ordered(s.first())
+                s = s.next()
+            self._hash = acc.finish_hash()
+        return self._hash
+
+def make_seq(stack, ascending, keys_only):
+    if stack is None:
+        return nil
+    return TreeSeq(stack, ascending, keys_only)
+
+
+class PersistentTreeMap(object.Object):
+    _type = object.Type(u"pixie.stdlib.PersistentTreeMap")
+
+    def type(self):
+        return PersistentTreeMap._type
+
+    def __init__(self, comparator, cnt, root, meta=nil):
+        self._comparator = comparator
+        self._cnt = cnt
+        self._root = root
+        self._meta = meta
+        self._hash = r_uint(0)
+
+    def meta(self):
+        return self._meta
+
+    def with_meta(self, meta):
+        m = PersistentTreeMap(self._comparator, self._cnt, self._root, meta)
+        m._hash = self._hash
+        return m
+
+    def empty(self):
+        return PersistentTreeMap(self._comparator, 0, None, self._meta)
+
+    def coll_hash(self, include_vals=True):
+        if not include_vals:
+            acc = util.HashingState()
+            tree_hash(self._root, acc, False)
+            return acc.finish_hash()
+
+        if self._hash == 0:
+            acc = util.HashingState()
+            tree_hash(self._root, acc, True)
+            self._hash = acc.finish_hash()
+        return self._hash
+
+    def assoc(self, key, val):
+        added_leaf = Box()
+        root = tree_assoc(self._comparator, self._root, key, val, added_leaf)
+        if root is self._root:
+            return self
+        return PersistentTreeMap(self._comparator, self._cnt if added_leaf._val is None else self._cnt + 1, root, self._meta)
+
+    def without(self, key):
+        removed_leaf = Box()
+        root = tree_without(self._comparator, self._root, key, removed_leaf)
+        if removed_leaf._val is None:
+            return self
+        return PersistentTreeMap(self._comparator, self._cnt - 1, root, self._meta)
+
+    def val_at(self, key, not_found):
+        node = tree_find(self._comparator, self._root, key)
+        return not_found if node is None else node._val
+
+    def contains(self, key):
+        return tree_find(self._comparator, self._root, key) is not None
+
+    def seq(self, ascending, keys_only):
+        return make_seq(push_spine(self._root, None, ascending), ascending, keys_only)
+
+    def seq_from(self, key, ascending, keys_only):
+        """Seq starting at the first key not before `key` (not after it when
+        descending)."""
+        stack = None
+        node = self._root
+        while node is not None:
+            c = self._comparator.compare(key, node._key)
+            if c == 0:
+                stack = NodeStack(node, stack)
+                break
+            if ascending == (c < 0):
+                stack = NodeStack(node, stack)
+                node = node._left if ascending else node._right
+            else:
+                node = node._right if ascending else node._left
+        return make_seq(stack, ascending, keys_only)
+
+
+@as_var("-sorted-map")
+def _sorted_map(comp, kvs):
+    acc = PersistentTreeMap(comparator_for(comp), 0, None)
+    s = rt.seq(kvs)
+    while s is not nil:
+        k = rt.first(s)
+        s = rt.next(s)
+        affirm(s is not nil, u"sorted-map requires an even number of args")
+        acc = acc.assoc(k, rt.first(s))
+        s = rt.next(s)
+    return acc
+
+
+@extend(proto._count, PersistentTreeMap)
+def _count(self):
+    assert isinstance(self, PersistentTreeMap)
+    return rt.wrap(self._cnt)
+
+@extend(proto._val_at, PersistentTreeMap)
+def _val_at(self, key, not_found):
+    assert isinstance(self, PersistentTreeMap)
+    return self.val_at(key, not_found)
+
+@extend(proto._contains_key, PersistentTreeMap)
+def _contains_key(self, key):
+    assert isinstance(self, PersistentTreeMap)
+    return true if self.contains(key) else false
+
+@extend(proto._assoc, PersistentTreeMap)
+def _assoc(self, key, val):
+    assert isinstance(self, PersistentTreeMap)
+    return self.assoc(key, val)
+
+@extend(proto._dissoc, PersistentTreeMap)
+def _dissoc(self, key):
+    assert isinstance(self, PersistentTreeMap)
+    return self.without(key)
+
+@extend(proto._conj, PersistentTreeMap)
+def _conj(self, x):
+    assert isinstance(self, PersistentTreeMap)
+    if isinstance(x, MapEntry):
+        return self.assoc(x._key, x._val)
+    if isinstance(x, PersistentVector):
+        if x._cnt != 2:
+            runtime_error(u"Vector arg to map conj must be a pair", u"pixie.stdlib/InvalidArgumentException")
+        return self.assoc(x.nth(0), x.nth(1))
+    if rt._satisfies_QMARK_(proto.ISeqable, x):
+        acc = self
+        s = rt.seq(x)
+        while s is not nil:
+            acc = rt._conj(acc, rt.first(s))
+            s = rt.next(s)
+        return acc
+    runtime_error(rt.name(rt.str(rt.type(x))) + u" cannot be conjed to a map",
+                  u"pixie.stdlib/InvalidArgumentException")
+
+@extend(proto._empty, PersistentTreeMap)
+def _empty(self):
+    assert isinstance(self, PersistentTreeMap)
+    return self.empty()
+
+@extend(proto._seq, PersistentTreeMap)
+def _seq(self):
+    assert isinstance(self, PersistentTreeMap)
+    return self.seq(True, False)
+
+@extend(proto._reduce, PersistentTreeMap)
+def _reduce(self, f, init):
+    assert isinstance(self, PersistentTreeMap)
+    val = tree_reduce(self._root, f, init, False)
+    if rt.reduced_QMARK_(val):
+        return rt.deref(val)
+    return val
+
+proto.IMap.add_satisfies(PersistentTreeMap._type)
+
+@extend(proto._meta, PersistentTreeMap)
+def _meta(self):
+    assert isinstance(self, PersistentTreeMap)
+    return self.meta()
+
+@extend(proto._with_meta, PersistentTreeMap)
+def _with_meta(self, meta):
+    assert isinstance(self, PersistentTreeMap)
+    return self.with_meta(meta)
+
+@extend(proto._hash, PersistentTreeMap)
+def _hash(self):
+    assert isinstance(self, PersistentTreeMap)
+    return rt.wrap(intmask(self.coll_hash()))
+
+@extend(proto._eq, PersistentTreeMap)
+def _eq(self, obj):
+    assert isinstance(self, PersistentTreeMap)
+    if self is obj:
+        return true
+    if not rt._satisfies_QMARK_(proto.IMap, obj):
+        return false
+    if rt.count(obj) != r_uint(self._cnt):
+        return false
+    if isinstance(obj, PersistentTreeMap):
+        if self._hash != 0 and obj._hash != 0 and self._hash != obj._hash:
+            return false
+    result = tree_reduce(self._root, EntryInFn(obj), true, False)
+    return rt.deref(result) if rt.reduced_QMARK_(result) else result
+
+@extend(proto._sorted_seq, PersistentTreeMap)
+def _sorted_seq(self, ascending):
+    assert isinstance(self, PersistentTreeMap)
+    return self.seq(rt.is_true(ascending), False)
+
+@extend(proto._sorted_seq_from, PersistentTreeMap)
+def _sorted_seq_from(self, key, ascending):
+    assert isinstance(self, PersistentTreeMap)
+    return self.seq_from(key, rt.is_true(ascending), False)
+
+@extend(proto._entry_key, PersistentTreeMap)
+def _entry_key(self, entry):
+    return rt._key(entry)
+
+@extend(proto._comparator, PersistentTreeMap)
+def _comparator(self):
+    assert isinstance(self, PersistentTreeMap)
+    return ComparatorFn(self._comparator)
+
+
+@extend(proto._first, TreeSeq)
+def _first(self):
+    assert isinstance(self, TreeSeq)
+    return self.first()
+
+@extend(proto._next, TreeSeq)
+def _next(self):
+    assert isinstance(self, TreeSeq)
+    return self.next()
+
+@extend(proto._seq, TreeSeq)
+def _seq(self):
+    assert isinstance(self, TreeSeq)
+    return self
+
+@extend(proto._reduce, TreeSeq)
+def _reduce(self, f, init):
+    s = self
+    while s is not nil:
+        assert isinstance(s, TreeSeq)
+        init = f.invoke([init, s.first()])
+        if rt.reduced_QMARK_(init):
+            return rt.deref(init)
+        s = s.next()
+    return init
+
+@extend(proto._hash, TreeSeq)
+def _hash(self):
+    assert isinstance(self, TreeSeq)
+    return rt.wrap(intmask(self.coll_hash()))
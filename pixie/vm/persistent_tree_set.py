@@ -0,0 +1,149 @@
+import pixie.vm.object as object
+from pixie.vm.primitives import nil, true, false
+import pixie.vm.stdlib as proto
+from pixie.vm.code import extend, as_var
+from pixie.vm.persistent_tree_map import PersistentTreeMap, tree_reduce
+from pixie.vm.sort import ComparatorFn, comparator_for
+from rpython.rlib.rarithmetic import r_uint, intmask
+import pixie.vm.rt as rt
+
+
+class PersistentTreeSet(object.Object):
+    _type = object.Type(u"pixie.stdlib.PersistentTreeSet")
+
+    def type(self):
+        return PersistentTreeSet._type
+
+    def __init__(self, meta, m):
+        self._meta = meta
+        self._map = m
+        self._hash = r_uint(0)
+
+    def conj(self, v):
+        return PersistentTreeSet(self._meta, self._map.assoc(v, v))
+
+    def disj(self, k):
+        return PersistentTreeSet(self._meta, self._map.without(k))
+
+    def meta(self):
+        return self._meta
+
+    def with_meta(self, meta):
+        s = PersistentTreeSet(meta, self._map)
+        s._hash = self._hash
+        return s
+
+    def coll_hash(self):
+        if self._hash == 0:
+            self._hash = self._map.coll_hash(False)
+        return self._hash
+
+
+@as_var("-sorted-set")
+def _sorted_set(comp, ks):
+    acc = PersistentTreeSet(nil, PersistentTreeMap(comparator_for(comp), 0, None))
+    s = rt.seq(ks)
+    while s is not nil:
+        acc = acc.conj(rt.first(s))
+        s = rt.next(s)
+    return acc
+
+
+@extend(proto._count, PersistentTreeSet)
+def _count(self):
+    assert isinstance(self, PersistentTreeSet)
+    return rt.wrap(self._map._cnt)
+
+@extend(proto._val_at, PersistentTreeSet)
+def _val_at(self, key, not_found):
+    assert isinstance(self, PersistentTreeSet)
+    return self._map.val_at(key, not_found)
+
+@extend(proto._contains_key, PersistentTreeSet)
+def _contains_key(self, key):
+    assert isinstance(self, PersistentTreeSet)
+    return true if self._map.contains(key) else false
+
+@extend(proto._conj, PersistentTreeSet)
+def _conj(self, v):
+    assert isinstance(self, PersistentTreeSet)
+    return self.conj(v)
+
+@extend(proto._disj, PersistentTreeSet)
+def _disj(self, v):
+    assert isinstance(self, PersistentTreeSet)
+    return self.disj(v)
+
+@extend(proto._empty, PersistentTreeSet)
+def _empty(self):
+    assert isinstance(self, PersistentTreeSet)
+    return PersistentTreeSet(self._meta, self._map.empty())
+
+@extend(proto._seq, PersistentTreeSet)
+def _seq(self):
+    assert isinstance(self, PersistentTreeSet)
+    return self._map.seq(True, True)
+
+@extend(proto._reduce, PersistentTreeSet)
+def _reduce(self, f, init):
+    assert isinstance(self, PersistentTreeSet)
+    val = tree_reduce(self._map._root, f, init, True)
+    if rt.reduced_QMARK_(val):
+        return rt.deref(val)
+    return val
+
+proto.ISet.add_satisfies(PersistentTreeSet._type)
+
+@extend(proto._eq, PersistentTreeSet)
+def _eq(self, obj):
+    assert isinstance(self, PersistentTreeSet)
+    if self is obj:
+        return true
+    if not rt._satisfies_QMARK_(proto.ISet, obj):
+        return false
+    if rt.count(obj) != r_uint(self._map._cnt):
+        return false
+    if isinstance(obj, PersistentTreeSet):
+        if self._hash != 0 and obj._hash != 0 and self._hash != obj._hash:
+            return false
+
+    seq = rt.seq(obj)
+    while seq is not nil:
+        if not self._map.contains(rt.first(seq)):
+            return false
+        seq = rt.next(seq)
+    return true
+
+@extend(proto._hash, PersistentTreeSet)
+def _hash(self):
+    assert isinstance(self, PersistentTreeSet)
+    return rt.wrap(intmask(self.coll_hash()))
+
+@extend(proto._meta, PersistentTreeSet)
+def _meta(self):
+    assert isinstance(self, PersistentTreeSet)
+    return self.meta()
+
+@extend(proto._with_meta, PersistentTreeSet)
+def _with_meta(self, meta):
+    assert isinstance(self, PersistentTreeSet)
+    return self.with_meta(meta)
+
+@extend(proto._sorted_seq, PersistentTreeSet)
+def _sorted_seq(self, ascending):
+    assert isinstance(self, PersistentTreeSet)
+    return self._map.seq(rt.is_true(ascending), True)
+
+@extend(proto._sorted_seq_from, PersistentTreeSet)
+def _sorted_seq_from(self, key, ascending):
+    assert isinstance(self, PersistentTreeSet)
+    return self._map.seq_from(key, rt.is_true(ascending), True)
+
+@extend(proto._entry_key, PersistentTreeSet)
+def _entry_key(self, entry):
+    return entry
+
+@extend(proto._comparator, PersistentTreeSet)
+def _comparator(self):
+    assert isinstance(self, PersistentTreeSet)
+    return ComparatorFn(self._map._comparator)
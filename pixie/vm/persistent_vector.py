@@ -8,6 +8,7 @@ from pixie.vm.code import extend, as_var
 from rpython.rlib.rarithmetic import r_uint, intmask
 import rpython.rlib.jit as jit
 import pixie.vm.rt as rt
+import pixie.vm.util as util
 
 
 class Node(object.Object):
@@ -36,12 +37,27 @@ class PersistentVector(object.Object):
         self._shift = shift
         self._root = root
         self._tail = tail
+        self._hash = r_uint(0)
 
     def meta(self):
         return self._meta
 
     def with_meta(self, meta):
-        return PersistentVector(meta, self._cnt, self._shift, self._root, self._tail)
+        v = PersistentVector(meta, self._cnt, self._shift, self._root, self._tail)
+        v._hash = self._hash
+        return v
+
+    def coll_hash(self):
+        if self._hash == 0:
+            acc = util.HashingState()
+            i = 0
+            while i < self._cnt:
+                array = self.array_for(i)
+                for j in range(len(array)):
+                    acc.update_hash_ordered(array[j])
+                i += len(array)
+            self._hash = acc.finish_hash()
+        return self._hash
 
     def tailoff(self):
         if self._cnt < 32:
@@ -452,6 +468,8 @@ def _eq(self, obj):
     elif isinstance(obj, PersistentVector):
         if self._cnt != obj._cnt:
             return false
+        if self._hash != 0 and obj._hash != 0 and self._hash != obj._hash:
+            return false
         for i in range(0, intmask(self._cnt)):
             if not rt.eq(self.nth(i), obj.nth(i)):
                 return false
@@ -469,6 +487,12 @@ def _eq(self, obj):
         return true
 
 
+@extend(proto._hash, PersistentVector)
+def _hash(self):
+    assert isinstance(self, PersistentVector)
+    return rt.wrap(intmask(self.coll_hash()))
+
+
 @extend(proto._contains_key, PersistentVector)
 def _contains_key(self, key):
     assert isinstance(self, PersistentVector)
@@ -0,0 +1,329 @@
+import pixie.vm.object as object
+from pixie.vm.object import affirm, runtime_error
+from pixie.vm.primitives import nil
+from pixie.vm.code import extend, as_var
+from pixie.vm.numbers import Integer, Float, Ratio, BigInteger
+from pixie.vm.chunked_seq import ArrayChunk, CHUNK_SIZE
+import pixie.vm.stdlib as proto
+import rpython.rlib.jit as jit
+from rpython.rlib.rarithmetic import r_uint, intmask
+import pixie.vm.rt as rt
+import math
+import sys
+
+
+class Range(object.Object):
+    """The numbers start + i * step for offset <= i < end. The count is known
+    up front, so count and nth don't walk the range, and next, take and drop
+    only move the offset and the end."""
+    _type = object.Type(u"pixie.stdlib.Range")
+    _immutable_fields_ = ["_offset", "_end"]
+
+    def type(self):
+        return Range._type
+
+    def __init__(self, offset, end):
+        self._offset = offset
+        self._end = end
+
+    def count(self):
+        return self._end - self._offset
+
+    def nth(self, idx):
+        """The idx'th number of the range, idx must be in bounds."""
+        raise NotImplementedError()
+
+    def slice(self, offset, end):
+        """The numbers of this range from offset up to end, relative to the
+        first number of this range."""
+        raise NotImplementedError()
+
+    def reduce(self, f, init):
+        raise NotImplementedError()
+
+    def chunk(self):
+        size = min(self.count(), CHUNK_SIZE)
+        items = [None] * size
+        for x in range(size):
+            items[x] = self.nth(x)
+        return ArrayChunk(items, 0, size)
+
+
+_int_reduce_driver = jit.JitDriver(name="pixie.stdlib.IntegerRange_reduce",
+                                   greens=["f"],
+                                   reds="auto")
+
+class IntegerRange(Range):
+    _immutable_fields_ = ["_start", "_step"]
+
+    def __init__(self, start, step, offset, end):
+        Range.__init__(self, offset, end)
+        self._start = start
+        self._step = step
+
+    def nth(self, idx):
+        return rt.wrap(self._start + (self._offset + idx) * self._step)
+
+    def slice(self, offset, end):
+        return IntegerRange(self._start, self._step, self._offset + offset, self._offset + end)
+
+    def reduce(self, f, init):
+        step = self._step
+        x = self._start + self._offset * step
+        i = self._offset
+        while i < self._end:
+            _int_reduce_driver.jit_merge_point(f=f)
+            init = f.invoke([init, rt.wrap(x)])
+            if rt.reduced_QMARK_(init):
+                return rt.deref(init)
+            x += step
+            i += 1
+        return init
+
+
+_float_reduce_driver = jit.JitDriver(name="pixie.stdlib.FloatRange_reduce",
+                                     greens=["f"],
+                                     reds="auto")
+
+class FloatRange(Range):
+    """A range where any of start, stop and step is a float. The first number
+    is start as it was given, so an integer start stays an integer."""
+    _immutable_fields_ = ["_first", "_start", "_step"]
+
+    def __init__(self, first, step, offset, end):
+        Range.__init__(self, offset, end)
+        self._first = first
+        self._start = float_arg(first)
+        self._step = step
+
+    def number_at(self, i):
+        if i == 0:
+            return self._first
+        # Computed from the start each time, so rounding errors don't add up
+        return rt.wrap(self._start + i * self._step)
+
+    def nth(self, idx):
+        return self.number_at(self._offset + idx)
+
+    def slice(self, offset, end):
+        return FloatRange(self._first, self._step, self._offset + offset, self._offset + end)
+
+    def reduce(self, f, init):
+        i = self._offset
+        while i < self._end:
+            _float_reduce_driver.jit_merge_point(f=f)
+            init = f.invoke([init, self.number_at(i)])
+            if rt.reduced_QMARK_(init):
+                return rt.deref(init)
+            i += 1
+        return init
+
+
+class GenericRange(Range):
+    """A range of ratios, big integers or any other numbers, which goes
+    through the generic math fns."""
+    _immutable_fields_ = ["_start", "_step"]
+
+    def __init__(self, start, step, offset, end):
+        Range.__init__(self, offset, end)
+        self._start = start
+        self._step = step
+
+    def nth(self, idx):
+        return generic_nth(self._start, self._step, self._offset + idx)
+
+    def slice(self, offset, end):
+        return GenericRange(self._start, self._step, self._offset + offset, self._offset + end)
+
+    def reduce(self, f, init):
+        for x in range(self.count()):
+            init = f.invoke([init, self.nth(x)])
+            if rt.reduced_QMARK_(init):
+                return rt.deref(init)
+        return init
+
+
+# Counts are machine ints. A longer range is cut off at MAX_COUNT numbers,
+# which can't be walked to the end anyway.
+MAX_COUNT = sys.maxint
+MAX_FLOAT_COUNT = float(MAX_COUNT)
+
+def clamp_count(cnt):
+    if cnt > r_uint(MAX_COUNT):
+        return MAX_COUNT
+    return intmask(cnt)
+
+def int_range_count(start, stop, step):
+    # The span from start to stop can be more than an int holds, so it is
+    # worked out unsigned
+    if step > 0 and start < stop:
+        span = r_uint(stop) - r_uint(start)
+        ustep = r_uint(step)
+    elif step < 0 and start > stop:
+        span = r_uint(start) - r_uint(stop)
+        ustep = r_uint(0) - r_uint(step)
+    else:
+        return 0
+    return clamp_count((span - 1) / ustep + 1)
+
+def float_ceil_count(d):
+    if d >= MAX_FLOAT_COUNT:
+        return MAX_COUNT
+    return int(math.ceil(d))
+
+def float_range_count(start, stop, step):
+    if step == 0.0:
+        return 0
+    d = (stop - start) / step
+    if not d > 0.0:
+        return 0
+    cnt = float_ceil_count(d)
+    # The division can round either way, so check the numbers at the edge
+    while cnt > 0 and not float_in_range(start + (cnt - 1) * step, stop, step):
+        cnt -= 1
+    while cnt < MAX_COUNT and float_in_range(start + cnt * step, stop, step):
+        cnt += 1
+    return cnt
+
+def float_in_range(x, stop, step):
+    if step > 0.0:
+        return x < stop
+    return x > stop
+
+def ceil_count(d):
+    """Rounds the positive number d up to a count. Big integer division
+    rounds down, and other numbers are left at 0, for the caller to step to
+    the right count."""
+    if isinstance(d, Integer):
+        return d.int_val()
+    if isinstance(d, Ratio):
+        return d.numerator() / d.denominator() + 1
+    if isinstance(d, Float):
+        return float_ceil_count(d.float_val())
+    if isinstance(d, BigInteger):
+        try:
+            return d.bigint_val().toint()
+        except OverflowError:
+            return MAX_COUNT
+    return 0
+
+def generic_range_count(start, stop, step):
+    ascending = rt.is_true(rt._gt(step, rt.wrap(0)))
+    if not ascending and not rt.is_true(rt._lt(step, rt.wrap(0))):
+        return 0
+    if not generic_in_range(start, stop, ascending):
+        return 0
+    cnt = ceil_count(rt._div(rt._sub(stop, start), step))
+    while cnt > 0 and not generic_in_range(generic_nth(start, step, cnt - 1), stop, ascending):
+        cnt -= 1
+    while cnt < MAX_COUNT and generic_in_range(generic_nth(start, step, cnt), stop, ascending):
+        cnt += 1
+    return cnt
+
+def generic_in_range(x, stop, ascending):
+    return rt.is_true(rt._lt(x, stop) if ascending else rt._gt(x, stop))
+
+def generic_nth(start, step, idx):
+    return rt._add(start, rt._mul(rt.wrap(idx), step))
+
+def float_arg(n):
+    if isinstance(n, Float):
+        return n.float_val()
+    assert isinstance(n, Integer)
+    return float(n.int_val())
+
+def is_float_or_int(n):
+    return isinstance(n, Float) or isinstance(n, Integer)
+
+def make_range(start, stop, step):
+    if isinstance(start, Integer) and isinstance(stop, Integer) and isinstance(step, Integer):
+        cnt = int_range_count(start.int_val(), stop.int_val(), step.int_val())
+        return IntegerRange(start.int_val(), step.int_val(), 0, cnt)
+    if is_float_or_int(start) and is_float_or_int(stop) and is_float_or_int(step):
+        cnt = float_range_count(float_arg(start), float_arg(stop), float_arg(step))
+        return FloatRange(start, float_arg(step), 0, cnt)
+    return GenericRange(start, step, 0, generic_range_count(start, stop, step))
+
+
+@extend(proto._count, Range)
+def _count(self):
+    assert isinstance(self, Range)
+    return rt.wrap(self.count())
+
+@extend(proto._nth, Range)
+def _nth(self, idx):
+    assert isinstance(self, Range)
+    i = idx.int_val()
+    if not 0 <= i < self.count():
+        runtime_error(u"Index out of Range", u"pixie.stdlib/OutOfRangeException")
+    return self.nth(i)
+
+@extend(proto._nth_not_found, Range)
+def _nth_not_found(self, idx, not_found):
+    assert isinstance(self, Range)
+    i = idx.int_val()
+    if 0 <= i < self.count():
+        return self.nth(i)
+    return not_found
+
+@extend(proto._reduce, Range)
+def _reduce(self, f, init):
+    assert isinstance(self, Range)
+    return self.reduce(f, init)
+
+@extend(proto._seq, Range)
+def _seq(self):
+    assert isinstance(self, Range)
+    return self if self.count() > 0 else nil
+
+@extend(proto._first, Range)
+def _first(self):
+    assert isinstance(self, Range)
+    return self.nth(0) if self.count() > 0 else nil
+
+@extend(proto._next, Range)
+def _next(self):
+    assert isinstance(self, Range)
+    cnt = self.count()
+    return self.slice(1, cnt) if cnt > 1 else nil
+
+@extend(proto._chunked_first, Range)
+def _chunked_first(self):
+    assert isinstance(self, Range)
+    return self.chunk()
+
+@extend(proto._chunked_next, Range)
+def _chunked_next(self):
+    assert isinstance(self, Range)
+    cnt = self.count()
+    return self.slice(CHUNK_SIZE, cnt) if cnt > CHUNK_SIZE else nil
+
+
+def range_arg(r):
+    affirm(isinstance(r, Range), u"Expected a Range")
+    assert isinstance(r, Range)
+    return r
+
+def count_arg(n, r):
+    affirm(isinstance(n, Integer), u"Expected an Integer count")
+    return max(0, min(n.int_val(), r.count()))
+
+@as_var("-range")
+def _range(start, stop, step):
+    """(-range start stop step)
+       Returns the range of numbers from start up to, but not including, stop, step apart."""
+    return make_range(start, stop, step)
+
+@as_var("-range-take")
+def _range_take(r, n):
+    """(-range-take range n)
+       Returns the first n numbers of range, as a range."""
+    r = range_arg(r)
+    return r.slice(0, count_arg(n, r))
+
+@as_var("-range-drop")
+def _range_drop(r, n):
+    """(-range-drop range n)
+       Returns all but the first n numbers of range, as a range."""
+    r = range_arg(r)
+    return r.slice(count_arg(n, r), r.count())
@@ -376,47 +376,69 @@ def read_token(rdr):
             return acc
         acc += ch
 
-def read_unicode_char(rdr, token, offset, length, base):
+class InvalidCharacter(Exception):
+    """Raised by character_from_token, each reader reports it in its own way."""
+    def __init__(self, msg):
+        assert isinstance(msg, unicode)
+        self._msg = msg
+
+def digit_value(ch):
+    if u"0" <= ch <= u"9":
+        return ord(ch) - ord(u"0")
+    if u"a" <= ch <= u"z":
+        return ord(ch) - ord(u"a") + 10
+    if u"A" <= ch <= u"Z":
+        return ord(ch) - ord(u"A") + 10
+    return -1
+
+def read_unicode_char(token, offset, length, base):
     if len(token) != offset + length:
-        throw_syntax_error_with_data(rdr, u"Invalid unicode character: \\" + token)
+        raise InvalidCharacter(u"Invalid unicode character: \\" + token)
     c = 0
     for i in range(offset, offset + length):
-        d = int(str(token[i:i+1]), base)
+        d = digit_value(token[i])
+        if d < 0 or d >= base:
+            raise InvalidCharacter(u"Invalid digit in character: \\" + token)
         c = c * base + d
     return c
 
 class LiteralCharacterReader(ReaderHandler):
     def invoke(self, rdr, ch):
-        token = read_token(rdr)
-        if len(token) == 1:
-            return Character(ord(token[0]))
-        elif token == u"newline":
-            return Character(ord("\n"))
-        elif token == u"space":
-            return Character(ord(" "))
-        elif token == u"tab":
-            return Character(ord("\t"))
-        elif token == u"backspace":
-            return Character(ord("\b"))
-        elif token == u"formfeed":
-            return Character(ord("\f"))
-        elif token == u"return":
-            return Character(ord("\r"))
-        elif token.startswith("u"):
-            c = read_unicode_char(rdr, token, 1, 4, 16)
-            if c >= 0xd800 and c <= 0xdfff:
-                throw_syntax_error_with_data(rdr, u"Invalid character constant: \\" + token)
-            return Character(c)
-        elif token.startswith("o"):
-            l = len(token) - 1
-            if l > 3:
-                throw_syntax_error_with_data(rdr, u"Invalid octal escape sequence: \\" + token)
-            c = read_unicode_char(rdr, token, 1, l, 8)
-            if c > 0377:
-                throw_syntax_error_with_data(rdr, u"Octal escape sequences must be in range [0, 377]")
-            return Character(c)
-        else:
-            throw_syntax_error_with_data(rdr, u"Unsupported character: \\" + token)
+        try:
+            return character_from_token(read_token(rdr))
+        except InvalidCharacter as ex:
+            throw_syntax_error_with_data(rdr, ex._msg)
+
+def character_from_token(token):
+    if len(token) == 1:
+        return Character(ord(token[0]))
+    elif token == u"newline":
+        return Character(ord("\n"))
+    elif token == u"space":
+        return Character(ord(" "))
+    elif token == u"tab":
+        return Character(ord("\t"))
+    elif token == u"backspace":
+        return Character(ord("\b"))
+    elif token == u"formfeed":
+        return Character(ord("\f"))
+    elif token == u"return":
+        return Character(ord("\r"))
+    elif token.startswith("u"):
+        c = read_unicode_char(token, 1, 4, 16)
+        if c >= 0xd800 and c <= 0xdfff:
+            raise InvalidCharacter(u"Invalid character constant: \\" + token)
+        return Character(c)
+    elif token.startswith("o"):
+        l = len(token) - 1
+        if l > 3:
+            raise InvalidCharacter(u"Invalid octal escape sequence: \\" + token)
+        c = read_unicode_char(token, 1, l, 8)
+        if c > 0377:
+            raise InvalidCharacter(u"Octal escape sequences must be in range [0, 377]")
+        return Character(c)
+    else:
+        raise InvalidCharacter(u"Unsupported character: \\" + token)
 
 class DerefReader(ReaderHandler):
     def invoke(self, rdr, ch):
@@ -58,9 +58,15 @@ def init():
     import pixie.vm.util
     import pixie.vm.array
     import pixie.vm.lazy_seq
+    import pixie.vm.chunked_seq
+    import pixie.vm.range
     import pixie.vm.persistent_list
     import pixie.vm.persistent_hash_map
     import pixie.vm.persistent_hash_set
+    import pixie.vm.sort
+    import pixie.vm.persistent_tree_map
+    import pixie.vm.persistent_tree_set
+    import pixie.vm.multimethod
     import pixie.vm.custom_types
     import pixie.vm.map_entry
     import pixie.vm.libs.platform
@@ -68,7 +74,12 @@ def init():
     import pixie.vm.libs.env
     import pixie.vm.symbol
     import pixie.vm.libs.path
+    import pixie.vm.libs.pxic.cache
     import pixie.vm.libs.string
+    import pixie.vm.libs.utf8
+    import pixie.vm.libs.binary
+    import pixie.vm.libs.edn
+    import pixie.vm.libs.json
     import pixie.vm.threads
     import pixie.vm.string_builder
     import pixie.vm.stacklet
@@ -0,0 +1,234 @@
+py_object = object
+from pixie.vm.object import affirm
+import pixie.vm.code as code
+from pixie.vm.code import as_var, intern_var
+from pixie.vm.primitives import nil, true, false
+from pixie.vm.numbers import Number, Integer, Float, zero_int
+from pixie.vm.string import String
+from pixie.vm.array import Array
+from pixie.vm.persistent_vector import PersistentVector, EMPTY as EMPTY_VECTOR
+from rpython.rlib.listsort import make_timsort_class
+from rpython.rlib.objectmodel import specialize
+import pixie.vm.rt as rt
+
+
+COMPARE = intern_var(u"pixie.stdlib", u"compare")
+
+
+@specialize.argtype(0)
+def compare_values(a, b):
+    if a < b:
+        return -1
+    if a > b:
+        return 1
+    return 0
+
+def number_sign(n):
+    if isinstance(n, Integer):
+        return compare_values(n.int_val(), 0)
+    if isinstance(n, Float):
+        return compare_values(n.float_val(), 0.0)
+    if rt._lt(n, zero_int) is true:
+        return -1
+    if rt._gt(n, zero_int) is true:
+        return 1
+    return 0
+
+
+class Comparator(py_object):
+    """Orders pixie objects for sorting and for the sorted collections."""
+    def compare(self, a, b):
+        raise NotImplementedError()
+
+    def lt(self, a, b):
+        return self.compare(a, b) < 0
+
+
+class DefaultComparator(Comparator):
+    """Orders by `compare`, without calling it for the common key types."""
+    def compare(self, a, b):
+        if isinstance(a, Integer) and isinstance(b, Integer):
+            return compare_values(a.int_val(), b.int_val())
+        if isinstance(a, Float) and isinstance(b, Float):
+            return compare_values(a.float_val(), b.float_val())
+        if isinstance(a, String) and isinstance(b, String):
+            return compare_values(a._str, b._str)
+        return number_sign(COMPARE.deref().invoke([a, b]))
+
+
+class IntegerComparator(Comparator):
+    def compare(self, a, b):
+        assert isinstance(a, Integer) and isinstance(b, Integer)
+        return compare_values(a.int_val(), b.int_val())
+
+    def lt(self, a, b):
+        assert isinstance(a, Integer) and isinstance(b, Integer)
+        return a.int_val() < b.int_val()
+
+
+class FloatComparator(Comparator):
+    def compare(self, a, b):
+        assert isinstance(a, Float) and isinstance(b, Float)
+        return compare_values(a.float_val(), b.float_val())
+
+    def lt(self, a, b):
+        assert isinstance(a, Float) and isinstance(b, Float)
+        return a.float_val() < b.float_val()
+
+
+class StringComparator(Comparator):
+    def compare(self, a, b):
+        assert isinstance(a, String) and isinstance(b, String)
+        return compare_values(a._str, b._str)
+
+    def lt(self, a, b):
+        assert isinstance(a, String) and isinstance(b, String)
+        return a._str < b._str
+
+
+class FnComparator(Comparator):
+    """Orders by a pixie fn. Like in Clojure the fn can either return a number
+    (negative, zero or positive) or be a predicate such as <."""
+    def __init__(self, fn):
+        self._fn = fn
+
+    def compare(self, a, b):
+        r = self._fn.invoke([a, b])
+        if isinstance(r, Number):
+            return number_sign(r)
+        if r is not nil and r is not false:
+            return -1
+        r = self._fn.invoke([b, a])
+        if r is not nil and r is not false:
+            return 1
+        return 0
+
+    def lt(self, a, b):
+        r = self._fn.invoke([a, b])
+        if isinstance(r, Number):
+            return number_sign(r) < 0
+        return r is not nil and r is not false
+
+
+DEFAULT_COMPARATOR = DefaultComparator()
+INTEGER_COMPARATOR = IntegerComparator()
+FLOAT_COMPARATOR = FloatComparator()
+STRING_COMPARATOR = StringComparator()
+
+def comparator_for(fn):
+    """The comparator for an optional pixie comparison fn (nil meaning compare)."""
+    if fn is nil:
+        return DEFAULT_COMPARATOR
+    return FnComparator(fn)
+
+def default_comparator_for(items):
+    """Picks a comparator specialized to the items when they all have the
+    same primitive type, which is what most sorts are called on."""
+    if len(items) == 0:
+        return DEFAULT_COMPARATOR
+    first = items[0]
+    if isinstance(first, Integer):
+        for x in items:
+            if not isinstance(x, Integer):
+                return DEFAULT_COMPARATOR
+        return INTEGER_COMPARATOR
+    if isinstance(first, Float):
+        for x in items:
+            if not isinstance(x, Float):
+                return DEFAULT_COMPARATOR
+        return FLOAT_COMPARATOR
+    if isinstance(first, String):
+        for x in items:
+            if not isinstance(x, String):
+                return DEFAULT_COMPARATOR
+        return STRING_COMPARATOR
+    return DEFAULT_COMPARATOR
+
+
+class ComparatorFn(code.NativeFn):
+    """A comparator as a pixie fn that always returns -1, 0 or 1."""
+    def __init__(self, comparator):
+        code.NativeFn.__init__(self)
+        self._comparator = comparator
+
+    def invoke(self, args):
+        affirm(len(args) == 2, u"Comparator takes two arguments")
+        return rt.wrap(self._comparator.compare(args[0], args[1]))
+
+
+ObjectTimSort = make_timsort_class()
+
+class ObjectSort(ObjectTimSort):
+    def __init__(self, lst, comparator):
+        ObjectTimSort.__init__(self, lst)
+        self._comparator = comparator
+
+    def lt(self, a, b):
+        return self._comparator.lt(a, b)
+
+
+class KeyedItem(py_object):
+    def __init__(self, key, val):
+        self._key = key
+        self._val = val
+
+KeyedTimSort = make_timsort_class()
+
+class KeyedSort(KeyedTimSort):
+    def __init__(self, lst, comparator):
+        KeyedTimSort.__init__(self, lst)
+        self._comparator = comparator
+
+    def lt(self, a, b):
+        return self._comparator.lt(a._key, b._key)
+
+
+def to_list(coll):
+    """Copies the items of coll into a new list, without going through seqs
+    for arrays and vectors."""
+    if isinstance(coll, Array):
+        return coll._list[:]
+
+    items = []
+    if isinstance(coll, PersistentVector):
+        i = 0
+        while i < coll._cnt:
+            array = coll.array_for(i)
+            for x in array:
+                items.append(x)
+            i += len(array)
+        return items
+
+    s = rt.seq(coll)
+    while s is not nil:
+        items.append(rt.first(s))
+        s = rt.next(s)
+    return items
+
+def to_vector(items):
+    acc = rt._transient(EMPTY_VECTOR)
+    for x in items:
+        acc = rt._conj_BANG_(acc, x)
+    return rt._persistent_BANG_(acc)
+
+
+@as_var("-sort")
+def _sort(comp, coll):
+    items = to_list(coll)
+    comparator = default_comparator_for(items) if comp is nil else FnComparator(comp)
+    ObjectSort(items, comparator).sort()
+    return to_vector(items)
+
+@as_var("-sort-by")
+def _sort_by(keyfn, comp, coll):
+    vals = to_list(coll)
+    items = [KeyedItem(keyfn.invoke([x]), x) for x in vals]
+
+    if comp is nil:
+        keys = [item._key for item in items]
+        comparator = default_comparator_for(keys)
+    else:
+        comparator = FnComparator(comp)
+
+    KeyedSort(items, comparator).sort()
+    return to_vector([item._val for item in items])
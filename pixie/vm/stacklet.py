@@ -1,6 +1,8 @@
 import rpython.rlib.rstacklet as rstacklet
-from pixie.vm.object import Object, Type, affirm
-from pixie.vm.code import as_var
+from pixie.vm.object import Object, Type, affirm, WrappedException
+from pixie.vm.code import as_var, extend
+from pixie.vm.primitives import nil, true, false
+import pixie.vm.stdlib as proto
 import pixie.vm.rt as rt
 
 
@@ -53,4 +55,104 @@ def new_handler(h, _):
 def new_stacklet(fn):
     global_state._val = fn
     h = global_state._th.new(new_handler)
-    return StackletHandle(h)
\ No newline at end of file
+    return StackletHandle(h)
+
+
+class RunQueue(Object):
+    """A FIFO of zero-arity functions waiting to be run by the event loop. Backed by a growable
+       ring buffer, so pushing and popping doesn't allocate once the queue has warmed up. The
+       signaled flag tracks whether the loop has already been woken up for the current batch."""
+    _type = Type(u"pixie.stdlib.RunQueue")
+
+    def __init__(self, size):
+        assert size > 0
+        self._items = [None] * size
+        self._head = 0
+        self._count = 0
+        self._signaled = False
+
+    def type(self):
+        return RunQueue._type
+
+    def grow(self):
+        old_items = self._items
+        old_size = len(old_items)
+        new_items = [None] * (old_size * 2)
+        for x in range(self._count):
+            new_items[x] = old_items[(self._head + x) % old_size]
+        self._items = new_items
+        self._head = 0
+
+    def push(self, f):
+        """Adds f to the end of the queue, returns True if the loop needs to be signaled"""
+        if self._count == len(self._items):
+            self.grow()
+        self._items[(self._head + self._count) % len(self._items)] = f
+        self._count += 1
+
+        if self._signaled:
+            return False
+        self._signaled = True
+        return True
+
+    def pop(self):
+        if self._count == 0:
+            return nil
+        f = self._items[self._head]
+        self._items[self._head] = None
+        self._head = (self._head + 1) % len(self._items)
+        self._count -= 1
+        return f
+
+    def count(self):
+        return self._count
+
+    def signal(self):
+        self._signaled = True
+
+    def unsignal(self):
+        self._signaled = False
+
+
+@extend(proto._count, RunQueue)
+def _count(self):
+    assert isinstance(self, RunQueue)
+    return rt.wrap(self.count())
+
+@as_var("-run-queue")
+def _run_queue():
+    return RunQueue(32)
+
+@as_var("-run-queue-push!")
+def _run_queue_push(q, f):
+    """(-run-queue-push! q f)
+       Adds f to the run queue. Returns true if the event loop has to be woken up to drain the queue."""
+    affirm(isinstance(q, RunQueue), u"First argument must be a RunQueue")
+    assert isinstance(q, RunQueue)
+    return rt.wrap(q.push(f))
+
+@as_var("-run-queue-drain!")
+def _run_queue_drain(q, limit, on_error):
+    """(-run-queue-drain! q limit on-error)
+       Runs at most limit functions from the queue, in order. Exceptions thrown by a function are
+       handed to on-error and don't stop the drain. Returns true if functions are left in the queue, in
+       which case the caller is responsible for signaling the loop again."""
+    affirm(isinstance(q, RunQueue), u"First argument must be a RunQueue")
+    assert isinstance(q, RunQueue)
+    q.unsignal()
+    max_items = limit.int_val()
+    x = 0
+    while x < max_items:
+        f = q.pop()
+        if f is nil:
+            break
+        try:
+            f.invoke([])
+        except WrappedException as ex:
+            on_error.invoke([ex._ex])
+        x += 1
+
+    if q.count() > 0:
+        q.signal()
+        return true
+    return false
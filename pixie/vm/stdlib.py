@@ -9,11 +9,13 @@ import pixie.vm.numbers as numbers
 import rpython.rlib.jit as jit
 from rpython.rlib.rarithmetic import r_uint
 from rpython.rlib.objectmodel import we_are_translated
+import os
 import os.path as path
 import sys
 
 defprotocol("pixie.stdlib", "ISeq", ["-first", "-next"])
 defprotocol("pixie.stdlib", "ISeqable", ["-seq"])
+defprotocol("pixie.stdlib", "IChunkedSeq", ["-chunked-first", "-chunked-next"])
 
 defprotocol("pixie.stdlib", "ICounted", ["-count"])
 
@@ -50,12 +52,17 @@ IVector = as_var("pixie.stdlib", "IVector")(Protocol(u"IVector"))
 
 IMap = as_var("pixie.stdlib", "IMap")(Protocol(u"IMap"))
 
+ISet = as_var("pixie.stdlib", "ISet")(Protocol(u"ISet"))
+
+defprotocol("pixie.stdlib", "ISorted", ["-sorted-seq", "-sorted-seq-from", "-entry-key", "-comparator"])
+
 defprotocol("pixie.stdlib", "IMeta", ["-with-meta", "-meta"])
 
 defprotocol("pixie.stdlib", "ITransient", ["-persistent!"])
 defprotocol("pixie.stdlib", "IToTransient", ["-transient"])
 
-defprotocol("pixie.stdlib", "ITransientCollection", ["-conj!"])
+defprotocol("pixie.stdlib", "ITransientCollection", ["-conj!", "-disj!"])
+defprotocol("pixie.stdlib", "ITransientAssociative", ["-assoc!", "-dissoc!"])
 defprotocol("pixie.stdlib", "ITransientStack", ["-push!", "-pop!"])
 
 defprotocol("pixie.stdlib", "IDisposable", ["-dispose!"])
@@ -335,6 +342,14 @@ def _instance(c, o):
 
     return true if istypeinstance(o, c) else false
 
+@as_var("-type-parent")
+def _type_parent(t):
+    affirm(isinstance(t, Type), u"t must be a type")
+    assert isinstance(t, Type)
+    if t is Object._type or t.parent() is None:
+        return nil
+    return t.parent()
+
 def type_satisfies(proto, type):
     affirm(isinstance(type, Type), u"type must be a Type")
     if proto.satisfies(type):
@@ -422,6 +437,7 @@ def _load_file(filename, compile=False):
     from pixie.vm.util import unicode_from_utf8
     import pixie.vm.reader as reader
     import pixie.vm.libs.pxic.writer as pxic_writer
+    import pixie.vm.libs.pxic.cache as pxic_cache
 
 
     affirm(isinstance(filename, String), u"filename must be a string")
@@ -431,30 +447,56 @@ def _load_file(filename, compile=False):
         load_pxic_file(filename)
         return nil
 
-    if path.isfile(filename + "c") and not compile:
+    if not path.isfile(filename) and path.isfile(filename + "c") and not compile:
+        # Shipped without sources, trust the compiled file
         load_pxic_file(filename + "c")
         return nil
 
     affirm(path.isfile(filename), unicode(filename) + u" does not exist")
 
-    f = open(filename)
-    data = f.read()
-    f.close()
+    src = pxic_cache.SourceInfo(filename)
 
+    if not compile:
+        cached = pxic_cache.find_fresh(src)
+        if cached is not None:
+            load_pxic_file(cached)
+            return nil
 
+    data = src.data()
 
     if data.startswith("#!"):
         newline_pos = data.find("\n")
         if newline_pos > 0:
             data = data[newline_pos:]
 
-    if compile:
-        pxic_f = open(filename + "c", "wb")
-        wtr = pxic_writer.Writer(pxic_f, True)
-        with code.bindings(PXIC_WRITER, pxic_writer.WriterBox(wtr)):
-            rt.load_reader(reader.MetaDataReader(reader.StringReader(unicode_from_utf8(data)), unicode(filename)))
-        wtr.finish()
-        pxic_f.close()
+    target = filename + "c" if compile else pxic_cache.write_target(filename)
+    pxic_f = None
+    tmp_target = ""
+    if target is not None:
+        tmp_target = target + "." + str(os.getpid()) + ".tmp"
+        try:
+            pxic_f = open(tmp_target, "wb")
+        except (IOError, OSError):
+            affirm(not compile, u"Can't write to " + unicode(target))
+            pxic_f = None
+
+    if pxic_f is not None:
+        wtr = pxic_writer.Writer(pxic_f, True, compile)
+        pxic_writer.write_header(wtr, src._mtime, src._size, src.digest())
+        try:
+            with code.bindings(PXIC_WRITER, pxic_writer.WriterBox(wtr)):
+                rt.load_reader(reader.MetaDataReader(reader.StringReader(unicode_from_utf8(data)), unicode(filename)))
+        except WrappedException:
+            pxic_f.close()
+            os.unlink(tmp_target)
+            raise
+        if wtr.failed():
+            pxic_f.close()
+            os.unlink(tmp_target)
+        else:
+            wtr.finish()
+            pxic_f.close()
+            os.rename(tmp_target, target)
     else:
         with code.bindings(PXIC_WRITER, nil):
             rt.load_reader(reader.MetaDataReader(reader.StringReader(unicode_from_utf8(data)), unicode(filename)))
@@ -464,32 +506,51 @@ def _load_file(filename, compile=False):
 
 def load_pxic_file(filename):
     f = open(filename)
-    from pixie.vm.libs.pxic.reader import Reader, read_obj
-    from pixie.vm.reader import eof
-    import pixie.vm.compiler as compiler
+    from pixie.vm.libs.pxic.reader import Reader, read_header
 
     if not we_are_translated():
         print "Loading precompiled file while interpreted, this may take time"
+    rdr = Reader(f)
+    header = read_header(rdr)
+    if header is None or not header.is_current_vm():
+        f.close()
+        affirm(False, unicode(filename) + u" was compiled by a different version of pixie, recompile it")
+    try:
+        load_pxic_reader(rdr)
+    finally:
+        f.close()
+
+    if not we_are_translated():
+        print "done"
+
+def load_pxic_reader(rdr):
+    """Runs the top level forms of a pxic stream, positioned after its header."""
+    from pixie.vm.libs.pxic.reader import read_toplevel, LazyDef
+    import pixie.vm.libs.pxic.image as image
+    from pixie.vm.reader import eof
+    import pixie.vm.compiler as compiler
+
+    segment = image.begin_segment()
     with compiler.with_ns(u"user"):
         compiler.NS_VAR.deref().include_stdlib()
-        rdr = Reader(f)
         while True:
             if not we_are_translated():
                 sys.stdout.write(".")
                 sys.stdout.flush()
-            o = read_obj(rdr)
+            o = read_toplevel(rdr)
             if o is eof:
                 break
-            o.invoke([])
-
-    if not we_are_translated():
-        print "done"
+            if not isinstance(o, LazyDef):
+                o.invoke([])
+            image.record(segment, o)
+    image.end_segment(segment)
 
 
 @as_var("load-reader")
 def load_reader(rdr):
     import pixie.vm.reader as reader
     import pixie.vm.compiler as compiler
+    import pixie.vm.libs.pxic.image as image
 
     if not we_are_translated():
         print "Loading file while interpreted, this may take time"
@@ -500,6 +561,7 @@ def load_reader(rdr):
     else:
         pxic_writer = val.get_pxic_writer()
 
+    segment = image.begin_segment()
     with compiler.with_ns(u"user"):
         compiler.NS_VAR.deref().include_stdlib()
         while True:
@@ -508,7 +570,7 @@ def load_reader(rdr):
                 sys.stdout.flush()
             form = reader.read(rdr, False)
             if form is reader.eof:
-                return nil
+                break
 
             try:
                 compiled = compiler.compile(form)
@@ -523,7 +585,7 @@ def load_reader(rdr):
 
             try:
                 if pxic_writer is not None:
-                    pxic_writer.write_object(compiled)
+                    pxic_writer.write_toplevel(compiled)
 
                 compiled.invoke([])
 
@@ -535,6 +597,9 @@ def load_reader(rdr):
                 add_info(ex, u"Running: " + rt.name(rt.str(form)))
                 raise ex
 
+            image.record(segment, compiled)
+
+    image.end_segment(segment)
 
     if not we_are_translated():
         print "done"
@@ -818,12 +883,23 @@ def _ici(meta):
 def merge_fn(acc, x):
     return rt._assoc(acc, rt._key(x), rt._val(x))
 
+@wrap_fn
+def merge_bang_fn(acc, x):
+    return rt._assoc_BANG_(acc, rt._key(x), rt._val(x))
+
 
 @as_var("merge")
 @jit.unroll_safe
 def _merge__args(args):
+    from pixie.vm.persistent_hash_map import PersistentHashMap
     affirm(len(args) > 0, u"Merge takes at least one arg")
     acc = args[0]
+    if isinstance(acc, PersistentHashMap) and len(args) > 1:
+        acc = acc.transient()
+        for x in range(1, len(args)):
+            acc = rt._reduce(args[x], merge_bang_fn, acc)
+        return rt._persistent_BANG_(acc)
+
     for x in range(1, len(args)):
         acc = rt._reduce(args[x], merge_fn, acc)
     return acc
@@ -919,14 +995,13 @@ def _partial__args(args):
 @as_var("-get-current-var-frames")
 def _get_current_var_frames(self):
     """(-get-current-var-frames)
-       Returns the current var frames, will be a cons list of hash maps containing mappings of vars to dynamic values"""
+       Returns the current binding frame, an opaque object holding the dynamic values of vars"""
     return code._dynamic_vars.get_current_frames()
 
 @as_var("-set-current-var-frames")
 def _set_current_var_frames(self, frames):
     """(-set-current-var-frames frames)
-       Sets the current var frames. Frames should be a cons list of hashmaps containing mappings of vars to dynamic
-       values. Setting this value to anything but this data format will cause undefined errors."""
+       Sets the current binding frame. Frames should be a value returned by -get-current-var-frames."""
     code._dynamic_vars.set_current_frames(frames)
 
 @as_var("add-exception-info")
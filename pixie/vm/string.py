@@ -6,10 +6,10 @@ from pixie.vm.numbers import Integer, _add
 import pixie.vm.stdlib as proto
 import pixie.vm.util as util
 from rpython.rlib.rarithmetic import intmask, r_uint
-from pixie.vm.libs.pxic.util import add_marshall_handlers
 
 class String(Object):
     _type = Type(u"pixie.stdlib.String")
+    _immutable_fields_ = ["_str"]
 
     def type(self):
         return String._type
@@ -17,6 +17,16 @@ class String(Object):
     def __init__(self, s):
         #assert isinstance(s, unicode)
         self._str = s
+        self._hash = r_uint(0)
+
+    def hash_val(self):
+        """The hash of the string's text, computed on first use. 0 means not yet
+        computed, a string that really hashes to 0 just isn't cached."""
+        h = self._hash
+        if h == 0:
+            h = util.hash_unencoded_chars(self._str)
+            self._hash = h
+        return h
 
 
 @extend(proto._str, String)
@@ -86,16 +96,6 @@ class Character(Object):
     def char_val(self):
         return self._char_val
 
-@wrap_fn
-def write_char(obj):
-    assert isinstance(obj, Character)
-    return rt.wrap(obj._char_val)
-
-@wrap_fn
-def read_char(obj):
-    return Character(obj.int_val())
-
-add_marshall_handlers(Character._type, write_char, read_char)
 
 @extend(proto._str, Character)
 def _str(self):
@@ -151,4 +151,4 @@ def _namespace(self):
 @extend(proto._hash, String)
 def _hash(self):
     assert isinstance(self, String)
-    return rt.wrap(intmask(util.hash_unencoded_chars(self._str)))
+    return rt.wrap(intmask(self.hash_val()))
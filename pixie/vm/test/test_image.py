@@ -0,0 +1,81 @@
+import os
+import struct
+
+import pixie.vm.rt as rt
+import pixie.vm.code as code
+import pixie.vm.libs.pxic.image as image
+from pixie.vm.libs.pxic.tags import IMAGE_MAGIC, FORMAT_VERSION, VM_FINGERPRINT
+from pixie.vm.atom import Atom
+
+
+def setup_module(module):
+    rt.init()
+
+def set_load_path(d):
+    code.intern_var(u"pixie.stdlib", u"load-paths").set_root(Atom(rt.vector(rt.wrap(unicode(d)))))
+
+def var_value(ns, name):
+    var = code.get_var_if_defined(ns, name)
+    assert var is not None and var.is_defined()
+    return var.deref().int_val()
+
+def forget_ns(ns):
+    del code._ns_registry._registry[ns]
+
+def image_header(magic=IMAGE_MAGIC, version=FORMAT_VERSION, fingerprint=VM_FINGERPRINT):
+    # The header of an image without segments, see image.dump_image
+    return magic + struct.pack("<I", version) + chr(len(fingerprint)) + fingerprint + chr(0)
+
+def test_dump_then_load(tmpdir):
+    src = tmpdir.mkdir("src")
+    # The require comes after a form that has run, so image-test-b's segment is
+    # finished first and has to be replayed before image-test-a's
+    src.join("image-test-b.pxi").write("(in-ns :image-test-b)\n"
+                                       "(def value 42)\n")
+    src.join("image-test-a.pxi").write("(in-ns :image-test-a)\n"
+                                       "(def before 1)\n"
+                                       "(pixie.stdlib/load-ns (quote image-test-b))\n"
+                                       "(def after (pixie.stdlib/-add image-test-b/value 1))\n")
+    set_load_path(src)
+    img = str(tmpdir.join("test.pxim"))
+
+    image.start_recording()
+    rt.load_ns(rt.wrap(u"image-test-a.pxi"))
+    image.dump_image(img)
+
+    # Nothing of the loaded namespaces is left, so replaying can't read the sources again
+    forget_ns(u"image-test-a")
+    forget_ns(u"image-test-b")
+    src.remove()
+    assert code.get_var_if_defined(u"image-test-a", u"after") is None
+
+    assert image.load_image(img)
+    assert var_value(u"image-test-b", u"value") == 42
+    assert var_value(u"image-test-a", u"before") == 1
+    assert var_value(u"image-test-a", u"after") == 43
+
+def test_load_rejects_other_images(tmpdir):
+    good = tmpdir.join("good.pxim")
+    good.write(image_header(), "wb")
+    assert image.load_image(str(good))
+
+    for name, data in [("magic", image_header(magic="PXIC")),
+                       ("version", image_header(version=FORMAT_VERSION + 1)),
+                       ("fingerprint", image_header(fingerprint=VM_FINGERPRINT + "x")),
+                       ("truncated", image_header()[:len(IMAGE_MAGIC) + 2]),
+                       ("truncated-fingerprint", image_header()[:len(IMAGE_MAGIC) + 6])]:
+        f = tmpdir.join(name + ".pxim")
+        f.write(data, "wb")
+        assert not image.load_image(str(f))
+
+    assert not image.load_image(str(tmpdir.join("missing.pxim")))
+
+def test_boot_warns_about_other_images(tmpdir, capsys):
+    import target
+
+    f = tmpdir.join("old.pxim")
+    f.write(image_header(version=FORMAT_VERSION - 1), "wb")
+    assert not target.load_image(str(f))
+    assert not target.stdlib_loaded.is_true()
+    out, err = capsys.readouterr()
+    assert "is not an image for this version of pixie" in out
@@ -1,10 +1,14 @@
-from pixie.vm.object import Object, Type, safe_invoke
+from pixie.vm.object import Object, Type, safe_invoke, affirm
 from pixie.vm.primitives import true
 import rpython.rlib.rthread as rthread
 from pixie.vm.primitives import nil
 import rpython.rlib.rgil as rgil
 from pixie.vm.code import as_var
+from pixie.vm.keyword import keyword
+from pixie.vm.numbers import Integer
+import pixie.vm.code as code
 import pixie.vm.rt as rt
+import rpython.rlib.rtime as rtime
 
 from rpython.rlib.objectmodel import invoke_around_extcall
 
@@ -20,39 +24,51 @@ class Bootstrapper(object):
             rgil.gil_allocate()
             invoke_around_extcall(before_external_call, after_external_call)
 
-    def aquire(self, fn):
+    def aquire(self, fn, frame):
         self.init()
         self._lock.acquire(True)
         self._fn = fn
+        self._frame = frame
 
     def fn(self):
         return self._fn
 
+    def frame(self):
+        return self._frame
+
     def release(self):
         self._fn = None
+        self._frame = None
         self._lock.release()
 
 
     def _cleanup_(self):
         self._lock = None
+        self._frame = None
         self._is_inited = False
 
 
 def bootstrap():
     rthread.gc_thread_start()
     fn = bootstrapper.fn()
+    # The new thread starts out with the bindings of the one that made it
+    code._dynamic_vars.set_current_frames(bootstrapper.frame())
     bootstrapper.release()
     safe_invoke(fn, [])
+    code._current_frame.set(None)
     rthread.gc_thread_die()
 
 bootstrapper = Bootstrapper()
 
 @as_var("-thread")
 def new_thread(fn):
-    bootstrapper.aquire(fn)
-    ident = rthread.start_new_thread(bootstrap, ())
+    start_thread(fn)
     return nil
 
+def start_thread(fn):
+    bootstrapper.aquire(fn, code._dynamic_vars.get_current_frames())
+    rthread.start_new_thread(bootstrap, ())
+
 @as_var("-yield-thread")
 def yield_thread():
     do_yield_thread()
@@ -89,6 +105,141 @@ def _release_lock(self):
     return rt.wrap(self._ll_lock.release())
 
 
+# Thread pools
+
+class WorkItem(object):
+    def __init__(self, fn, frames, queued_at):
+        self._fn = fn
+        self._frames = frames
+        self._queued_at = queued_at
+
+
+class Worker(code.NativeFn):
+    """The fn a pool thread runs: takes work off the queue of the pool until it's
+    empty, then sleeps on its wakeup lock until the pool has more work for it."""
+    def __init__(self, pool):
+        code.NativeFn.__init__(self)
+        self._pool = pool
+        self._wakeup = rthread.allocate_lock()
+        self._wakeup.acquire(True)
+
+    def wake(self):
+        self._wakeup.release()
+
+    def invoke(self, args):
+        pool = self._pool
+        while True:
+            item = pool.take()
+            if item is None:
+                pool.add_idle(self)
+                self._wakeup.acquire(True)
+                continue
+            pool.run(item)
+        return nil
+
+
+class ThreadPool(Object):
+    """A fixed number of threads running work fns in the order they are executed.
+    Threads are started as work comes in, up to the size of the pool, and then
+    kept around for later work. The queue and the counters are only touched
+    while holding the GIL, so they don't need a lock of their own."""
+    _type = Type(u"pixie.stdlib.ThreadPool")
+
+    def type(self):
+        return ThreadPool._type
+
+    def __init__(self, size):
+        self._size = size
+        self._workers = 0
+        self._idle = []
+        self._items = [None] * 32
+        self._head = 0
+        self._count = 0
+        self._completed = 0
+        self._total_wait = 0.0
+        self._max_wait = 0.0
+        self._total_run = 0.0
+
+    def execute(self, fn):
+        self.push(WorkItem(fn, code._dynamic_vars.get_current_frames(), rtime.time()))
+        if self._idle:
+            self._idle.pop().wake()
+        elif self._workers < self._size:
+            self._workers += 1
+            start_thread(Worker(self))
+
+    def push(self, item):
+        if self._count == len(self._items):
+            old_items = self._items
+            self._items = [None] * (len(old_items) * 2)
+            for x in range(self._count):
+                self._items[x] = old_items[(self._head + x) % len(old_items)]
+            self._head = 0
+        self._items[(self._head + self._count) % len(self._items)] = item
+        self._count += 1
+
+    def take(self):
+        if self._count == 0:
+            return None
+        item = self._items[self._head]
+        self._items[self._head] = None
+        self._head = (self._head + 1) % len(self._items)
+        self._count -= 1
+        return item
+
+    def add_idle(self, worker):
+        self._idle.append(worker)
+
+    def run(self, item):
+        started_at = rtime.time()
+        wait = started_at - item._queued_at
+        self._total_wait += wait
+        if wait > self._max_wait:
+            self._max_wait = wait
+
+        code._dynamic_vars.set_current_frames(item._frames)
+        safe_invoke(item._fn, [])
+
+        self._total_run += rtime.time() - started_at
+        self._completed += 1
+
+
+def thread_pool(pool):
+    affirm(isinstance(pool, ThreadPool), u"Expected a ThreadPool")
+    assert isinstance(pool, ThreadPool)
+    return pool
+
+def ms(seconds):
+    return rt.wrap(seconds * 1000.0)
+
+@as_var("-thread-pool")
+def _thread_pool(size):
+    affirm(isinstance(size, Integer) and size.int_val() > 0, u"Thread pool size must be a positive integer")
+    return ThreadPool(size.int_val())
+
+@as_var("-thread-pool-execute")
+def _thread_pool_execute(pool, fn):
+    """(-thread-pool-execute pool f)
+       Queues f to be called with no arguments by one of the threads of the pool."""
+    thread_pool(pool).execute(fn)
+    return nil
+
+@as_var("-thread-pool-stats")
+def _thread_pool_stats(pool):
+    """(-thread-pool-stats pool)
+       Returns a map of the size of the pool, the threads it has started, how many of those are idle,
+       the work waiting in its queue, the work it has completed, and the time work has spent waiting in
+       the queue (in total and at most) and running, in milliseconds."""
+    pool = thread_pool(pool)
+    return rt.hashmap(keyword(u"size"), rt.wrap(pool._size),
+                      keyword(u"threads"), rt.wrap(pool._workers),
+                      keyword(u"idle"), rt.wrap(len(pool._idle)),
+                      keyword(u"queued"), rt.wrap(pool._count),
+                      keyword(u"completed"), rt.wrap(pool._completed),
+                      keyword(u"wait-ms"), ms(pool._total_wait),
+                      keyword(u"max-wait-ms"), ms(pool._max_wait),
+                      keyword(u"run-ms"), ms(pool._total_run))
+
 
 ## From PYPY
 
@@ -95,8 +95,11 @@ class HashingState(Object):
         self._hash += rt.hash(itm)
         return self
 
+    def finish_hash(self):
+        return mix_coll_hash(self._hash, self._n)
+
     def finish(self):
-        return rt.wrap(intmask(mix_coll_hash(self._hash, self._n)))
+        return rt.wrap(intmask(self.finish_hash()))
 
 
 @as_var("new-hash-state")
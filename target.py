@@ -11,6 +11,7 @@ from pixie.vm.primitives import nil
 from pixie.vm.atom import Atom
 from pixie.vm.persistent_vector import EMPTY as EMPTY_VECTOR
 from pixie.vm.util import unicode_from_utf8, unicode_to_utf8
+from pixie.vm.libs.pxic.tags import VM_VERSION
 import sys
 import os
 import os.path as path
@@ -151,18 +152,66 @@ def load_stdlib():
 from pixie.vm.code import intern_var
 run_with_stacklets = intern_var(u"pixie.stacklets", u"run-with-stacklets")
 
-def init_vm(progname):
+def init_vm(progname, image_file=None, dump_file=None):
     import pixie.vm.stacklet
     pixie.vm.stacklet.init()
 
     init_load_path(progname)
-    load_stdlib()
+    init_cache_dir()
+    if image_file is None or not load_image(image_file):
+        if dump_file is not None:
+            start_recording()
+        load_stdlib()
+        if dump_file is not None:
+            dump_image(dump_file)
     add_to_load_paths(".")
 
+def load_image(filename):
+    from pixie.vm.libs.pxic.image import load_image as load_image_file
+    if not load_image_file(filename):
+        print "Warning: " + filename + " is not an image for this version of pixie, ignoring it"
+        return False
+    stdlib_loaded.set_true()
+    return True
+
+def start_recording():
+    from pixie.vm.libs.pxic.image import start_recording as start_image_recording
+    start_image_recording()
+
+def dump_image(filename):
+    from pixie.vm.libs.pxic.image import dump_image as dump_image_file
+    try:
+        dump_image_file(filename)
+    except (IOError, OSError):
+        print "Warning: couldn't write the image to " + filename
+
+def image_options(args):
+    """Finds the image options, they decide how the VM boots so they're read
+    before anything else."""
+    image_file = None
+    dump_file = None
+    i = 1
+    while i < len(args) - 1:
+        arg = args[i]
+        if arg == '-i' or arg == '--image':
+            image_file = args[i + 1]
+        elif arg == '--dump-image':
+            dump_file = args[i + 1]
+        elif arg in ['-e', '--eval', '-l', '--load-path', '-c', '--compile']:
+            pass
+        elif not arg.startswith('-') or arg == '-':
+            break
+        else:
+            i += 1
+            continue
+        i += 2
+    return image_file, dump_file
+
 def entry_point(args):
     try:
 
-        init_vm(args[0])
+        image_file, dump_file = image_options(args)
+        init_vm(args[0], image_file, dump_file)
 
         interactive = True
         exit = False
@@ -174,7 +223,7 @@ def entry_point(args):
 
             if arg.startswith('-') and arg != '-':
                 if arg == '-v' or arg == '--version':
-                    print "Pixie 0.1"
+                    print "Pixie " + VM_VERSION
                     return 0
                 elif arg == '-h' or arg == '--help':
                     print args[0] + " [<options>] [<file>]"
@@ -183,6 +232,8 @@ def entry_point(args):
                     print "  -e, --eval=<expr>      evaluate the given expression"
                     print "  -l, --load-path=<path> add <path> to pixie.stdlib/load-paths"
                     print "  -c, --compile=<file>   compile <path> to a .pxic file"
+                    print "  -i, --image=<file>     start from the VM image in <file>"
+                    print "  --dump-image=<file>    save a VM image of the loaded stdlib to <file>"
                     return 0
                 elif arg == '-e' or arg == '--eval':
                     i += 1
@@ -202,6 +253,13 @@ def entry_point(args):
                         print "Expected argument for " + arg
                         return 1
 
+                elif arg == '-i' or arg == '--image' or arg == '--dump-image':
+                    # Already handled by image_options
+                    i += 1
+                    if i >= len(args):
+                        print "Expected argument for " + arg
+                        return 1
+
                 elif arg == "-c" or arg == "--compile":
                     i += 1
                     if i < len(args):
@@ -249,6 +307,12 @@ def init_load_path(self_path):
     # just for run_load_stdlib (global variables can't be assigned to)
     load_path.set_root(rt.wrap(self_path))
 
+def init_cache_dir():
+    from pixie.vm.libs.pxic.cache import PXIC_CACHE_DIR
+    cache_dir = os.environ.get('PIXIE_CACHE_DIR')
+    if cache_dir:
+        PXIC_CACHE_DIR.set_root(rt.wrap(cache_dir))
+
 def dirname(path):
     return rpath.sep.join(path.split(rpath.sep)[0:-1])
 
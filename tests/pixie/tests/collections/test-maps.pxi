@@ -54,3 +54,37 @@
 
     ;; Should conj sequences of MapEntries
     (t/assert= (conj {} (seq {:a 1 :b 2 :c 3})) {:a 1 :b 2 :c 3})))
+
+(t/deftest map-hash
+  (let [m {:a 1 :b [2 3]}]
+    (t/assert= (hash m) (hash {:b [2 3] :a 1}))
+    (t/assert= (hash m) (hash (with-meta m {:doc "x"})))
+    (t/assert= (hash (assoc m :c 4)) (hash {:a 1 :b [2 3] :c 4}))
+    (t/assert= (hash (dissoc m :b)) (hash {:a 1}))
+    (t/assert= (= m {:a 1 :b [2 4]}) false)
+    (t/assert= (get {m :found} {:b [2 3] :a 1}) :found)))
+
+(t/deftest transient-map
+  (let [m {:a 1 :b 2}
+        t (transient m)]
+    (assoc! t :c 3)
+    (dissoc! t :a)
+    (t/assert= (count t) 2)
+    (t/assert= (get t :c) 3)
+    (t/assert= (contains? t :a) false)
+    (t/assert= (persistent! t) {:b 2 :c 3})
+    (t/assert= m {:a 1 :b 2})
+    (t/assert= (persistent! (assoc! (transient {}) :a 1 :b 2)) {:a 1 :b 2})
+    (t/assert= (persistent! (dissoc! (transient m) :a :b)) {})
+    (t/assert= (persistent! (conj! (transient {}) [:a 1] (map-entry :b 2))) {:a 1 :b 2})))
+
+(t/deftest transient-map-bulk
+  (let [ks (range 1000)
+        m (into {} (map (fn [k] [k (* k 2)]) ks))]
+    (t/assert= (count m) 1000)
+    (t/assert= (get m 999) 1998)
+    (t/assert= (reduce dissoc m ks) {})
+    (t/assert= (zipmap [:a :b] [1 2]) {:a 1 :b 2})
+    (t/assert= (merge {:a 1} {:b 2} {:a 3}) {:a 3 :b 2})
+    (t/assert= (frequencies [:a :b :a]) {:a 2 :b 1})
+    (t/assert= (group-by odd? [1 2 3]) {true [1 3] false [2]})))
@@ -51,6 +51,12 @@
     (t/assert= (= s #{1 2}) false)
     (t/assert= (= s #{1 2 3 4}) false)))
 
+(t/deftest test-hash
+  (t/assert= (hash #{1 2 3}) (hash (set [3 2 1])))
+  (t/assert= (hash (set worst-hashers)) (hash (set (reverse worst-hashers))))
+  (t/assert= (hash (conj #{1 2} 3)) (hash #{1 2 3}))
+  (t/assert= (hash (disj #{1 2 3} 3)) (hash #{1 2})))
+
 (t/deftest test-invoke
   (let [s #{1 2 3}]
     (t/assert= (s 1) 1)
@@ -71,3 +77,16 @@
 (t/deftest test-conj
   (t/assert= #{1 2} (conj #{1} 2))
   (t/assert= #{1 2 3 4} (conj #{1} 2 3 4)))
+
+(t/deftest test-transient
+  (let [s #{1 2 3}
+        t (transient s)]
+    (conj! t 4)
+    (disj! t 1)
+    (t/assert= (count t) 3)
+    (t/assert= (contains? t 4) true)
+    (t/assert= (persistent! t) #{2 3 4})
+    (t/assert= s #{1 2 3})
+    (t/assert= (into #{} worst-hashers) (set worst-hashers))
+    (t/assert= (persistent! (disj! (transient (set worst-hashers)) (first worst-hashers)))
+               (set (rest worst-hashers)))))
@@ -0,0 +1,86 @@
+(ns collections.test-sorted
+  (require pixie.test :as t))
+
+(t/deftest test-sorted-map
+  (let [m (sorted-map :c 3 :a 1 :b 2)]
+    (t/assert= (count m) 3)
+    (t/assert= (keys m) [:a :b :c])
+    (t/assert= (vals m) [1 2 3])
+    (t/assert= (get m :b) 2)
+    (t/assert= (m :c) 3)
+    (t/assert= (get m :d :none) :none)
+    (t/assert= (contains? m :a) true)
+    (t/assert= (contains? m :d) false)
+    (t/assert= (keys (assoc m :aa 0)) [:a :aa :b :c])
+    (t/assert= (keys (dissoc m :b)) [:a :c])
+    (t/assert= (dissoc m :d) m)
+    (t/assert= (conj m [:d 4]) (sorted-map :a 1 :b 2 :c 3 :d 4))
+    (t/assert= (empty m) (sorted-map))
+    (t/assert= (sorted? m) true)
+    (t/assert= (sorted? {}) false)))
+
+(t/deftest test-sorted-map-equality
+  (let [m (sorted-map :a 1 :b 2)]
+    (t/assert= m {:a 1 :b 2})
+    (t/assert= {:a 1 :b 2} m)
+    (t/assert= (hash m) (hash {:a 1 :b 2}))
+    (t/assert (not= m {:a 1 :b 3}))
+    (t/assert= (map? m) true)))
+
+(t/deftest test-sorted-map-by
+  (let [m (sorted-map-by > 1 :a 3 :c 2 :b)]
+    (t/assert= (keys m) [3 2 1])
+    (t/assert= (vals (assoc m 4 :d)) [:d :c :b :a])))
+
+(t/deftest test-sorted-map-many
+  (let [ks (range 1000)
+        m (reduce (fn [m k] (assoc m (- 1000 k) k)) (sorted-map) ks)]
+    (t/assert= (count m) 1000)
+    (t/assert= (keys m) (vec (range 1 1001)))
+    (t/assert= (count (reduce dissoc m (range 0 1001 2))) 500)))
+
+(t/deftest test-sorted-set
+  (let [s (sorted-set 3 1 2 1)]
+    (t/assert= (count s) 3)
+    (t/assert= (seq s) '(1 2 3))
+    (t/assert= (vec s) [1 2 3])
+    (t/assert= (contains? s 2) true)
+    (t/assert= (s 2) 2)
+    (t/assert= (seq (disj s 2)) '(1 3))
+    (t/assert= (seq (conj s 0)) '(0 1 2 3))
+    (t/assert= (set? s) true)
+    (t/assert= s #{1 2 3})
+    (t/assert= #{1 2 3} s)
+    (t/assert= (hash s) (hash #{1 2 3}))
+    (t/assert= (seq (sorted-set-by > 1 3 2)) '(3 2 1))
+    (t/assert= (str (sorted-set 2 1)) "#{1 2}")))
+
+(t/deftest test-rseq
+  (t/assert= (rseq (sorted-set 1 2 3)) '(3 2 1))
+  (t/assert= (rseq (sorted-map :a 1 :b 2)) [[:b 2] [:a 1]])
+  (t/assert= (rseq (sorted-set)) nil))
+
+(t/deftest test-subseq
+  (let [s (apply sorted-set (range 10))]
+    (t/assert= (subseq s > 6) '(7 8 9))
+    (t/assert= (subseq s >= 6) '(6 7 8 9))
+    (t/assert= (subseq s < 3) '(0 1 2))
+    (t/assert= (subseq s <= 3) '(0 1 2 3))
+    (t/assert= (subseq s > 2 < 5) '(3 4))
+    (t/assert= (subseq s >= 2 <= 5) '(2 3 4 5))
+    (t/assert= (seq (subseq s > 9)) nil)
+    (t/assert= (subseq (sorted-set 1 3 5) >= 2) '(3 5))))
+
+(t/deftest test-rsubseq
+  (let [s (apply sorted-set (range 10))]
+    (t/assert= (rsubseq s < 3) '(2 1 0))
+    (t/assert= (rsubseq s <= 3) '(3 2 1 0))
+    (t/assert= (rsubseq s > 6) '(9 8 7))
+    (t/assert= (rsubseq s > 2 < 5) '(4 3))
+    (t/assert= (rsubseq s >= 2 <= 5) '(5 4 3 2))
+    (t/assert= (rsubseq (sorted-set 1 3 5) <= 4) '(3 1))))
+
+(t/deftest test-subseq-sorted-map
+  (let [m (sorted-map 1 :a 2 :b 3 :c)]
+    (t/assert= (subseq m > 1) [[2 :b] [3 :c]])
+    (t/assert= (rsubseq m < 3) [[2 :b] [1 :a]])))
@@ -36,6 +36,16 @@
     (t/assert= (= v '(1 2)) false)
     (t/assert= (= v '(1 2 3 4)) false)))
 
+(t/deftest vector-hash
+  (let [v [1 [2 3] :x]]
+    (t/assert= (hash v) (hash [1 [2 3] :x]))
+    (t/assert= (hash v) (hash '(1 [2 3] :x)))
+    (t/assert= (hash v) (hash (cons 1 '([2 3] :x))))
+    (t/assert= (hash v) (hash (with-meta v {:doc "x"})))
+    (t/assert= (hash (conj v 4)) (hash [1 [2 3] :x 4]))
+    (t/assert= (hash (map-entry 1 2)) (hash [1 2]))
+    (t/assert= (= v [1 [2 4] :x]) false)))
+
 (t/deftest vector-conj
   (t/assert= [1 2] (conj [1] 2))
   (t/assert= [1 2 3 4] (conj [1] 2 3 4)))
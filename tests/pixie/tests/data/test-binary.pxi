@@ -0,0 +1,108 @@
+(ns pixie.tests.data.test-binary
+  (:require [pixie.test :refer :all]
+            [pixie.streams :refer :all]
+            [pixie.data.binary :as binary]))
+
+(defn- round-trip [x]
+  (let [data (binary/encode x)]
+    (try
+      (binary/decode data)
+      (finally
+        (dispose! data)))))
+
+(deftest test-round-trip
+  (assert-table [x] (assert= (round-trip x) x)
+                nil true false
+                0 1 -1 127 128 -100000 4294967296 12345678901234567890N
+                0.1 -2.5 (/ 1.0 3)
+                1/3 -2/7 \a \é
+                "" "hello" "héllo wörld"
+                :kw :ns/kw 'sym 'ns/sym
+                [] [1 [2 [3]]]
+                {} {:a 1 "b" [2 3]}
+                #{} #{1 :two "three"}
+                '(1 2 3)))
+
+(defrecord Point [x y])
+
+(add-marshall-handlers Point #(into {} %) map->Point)
+
+(deftest test-records
+  (let [p (round-trip (->Point 1 2))]
+    (assert (instance? Point p))
+    (assert= (:x p) 1)
+    (assert= (:y p) 2)))
+
+(deftest test-unsupported-values
+  (assert-throws? (binary/encode (atom 1))))
+
+(deftest test-encoder-caches
+  (let [enc (binary/encoder)
+        dec (binary/decoder)
+        msg {:name "a long enough string" :tags [:x :y]}
+        first-data (binary/encode msg enc)
+        second-data (binary/encode msg enc)]
+    (assert (< (count second-data) (count first-data)))
+    (assert= (binary/decode first-data dec) msg)
+    (assert= (binary/decode second-data dec) msg)
+    (dispose! first-data)
+    (dispose! second-data)))
+
+(deftest test-decoder-forgets-failed-messages
+  (let [bad (binary/encode [:a :b] (binary/encoder))
+        enc (binary/encoder)
+        dec (binary/decoder)
+        first-data (binary/encode [:c] enc)
+        second-data (binary/encode [:c] enc)]
+    ;; Cut off in :b, after :a was read and cached
+    (set-buffer-count! bad (- (count bad) 2))
+    (assert-throws? (binary/decode bad dec))
+    (assert= (binary/decode first-data dec) [:c])
+    (assert= (binary/decode second-data dec) [:c])
+    (dispose! bad)
+    (dispose! first-data)
+    (dispose! second-data)))
+
+(def not-dynamic 1)
+
+(deftest test-decoder-only-reads-data
+  (let [var-data (binary/encode (var not-dynamic))
+        code-data (binary/encode (fn [] 1))
+        ns-data (binary/encode (the-ns 'pixie.stdlib))]
+    ;; The last byte says if the var is dynamic, make it say true
+    (pixie.ffi/pack! var-data (dec (count var-data)) CUInt8 7)
+    (assert-throws? (binary/decode var-data))
+    (assert-throws? (binary/decode code-data))
+    (assert-throws? (binary/decode ns-data))
+    ;; The var is still not dynamic
+    (assert-throws? (set! (var not-dynamic) 2))
+    (dispose! var-data)
+    (dispose! code-data)
+    (dispose! ns-data)))
+
+(deftype MemoryOutputStream [bytes]
+  IOutputStream
+  (write [this buffer]
+    (dotimes [i (count buffer)]
+      (swap! bytes conj (nth buffer i)))))
+
+(deftype MemoryInputStream [bytes pos chunk-size]
+  IInputStream
+  (read [this buffer len]
+    (let [start @pos
+          n (min len chunk-size (- (count bytes) start))]
+      (dotimes [i n]
+        (pixie.ffi/pack! buffer i CUInt8 (nth bytes (+ start i))))
+      (reset! pos (+ start n))
+      n)))
+
+(deftest test-streams
+  (let [bytes (atom [])
+        w (binary/writer (->MemoryOutputStream bytes))
+        values [{:a 1} "x" nil [:a "x"] (vec (range 1000)) :pixie.data.binary/incomplete 2.5]]
+    (doseq [v values]
+      (binary/write-value! w v))
+    ;; Small reads, so values come in over several reads
+    (let [r (binary/reader (->MemoryInputStream @bytes (atom 0) 3))]
+      (assert= (vec (repeatedly (count values) #(binary/read-value r ::eof))) values)
+      (assert= (binary/read-value r ::eof) ::eof))))
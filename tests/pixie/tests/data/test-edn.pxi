@@ -0,0 +1,56 @@
+(ns pixie.tests.data.test-edn
+  (:require [pixie.test :refer :all]
+            [pixie.edn :as edn]))
+
+(deftest test-read-string
+  (assert-table [s v] (assert= (edn/read-string s) v)
+                "42" 42
+                "-17" -17
+                "+5" 5
+                "0x1F" 31
+                "1.5" 1.5
+                "1/3" 1/3
+                "\"a\\nb\\\"c\"" "a\nb\"c"
+                "\\a" \a
+                "\\newline" \newline
+                ":foo" :foo
+                ":a/b" :a/b
+                "foo" 'foo
+                "nil" nil
+                "true" true
+                "false" false
+                "(1 (2) ())" '(1 (2) ())
+                "[1 #_2 3]" [1 3]
+                "{:a 1 \"b\" [2]}" {:a 1 "b" [2]}
+                "#{1 2}" #{1 2}
+                "; comment\n #_ :skipped [:x]" [:x]))
+
+(deftest test-read-string-agrees-with-read-string
+  (let [s "{:users [{:name \"ann\" :id 1 :tags #{:a :b}} {:name \"bob\" :id -2 :score 2.5}]}"]
+    (assert= (edn/read-string s) (read-string s))))
+
+(deftest test-read-string-has-no-metadata
+  (assert= (meta (edn/read-string "(1 2)")) nil)
+  (assert= (meta (edn/read-string "[1 2]")) nil))
+
+(deftest test-read-all-string
+  (assert= (edn/read-all-string "1 :a [b] #_c") [1 :a '[b]])
+  (assert= (edn/read-all-string "  ") []))
+
+(deftest test-read-string-errors
+  (assert-throws? (edn/read-string ""))
+  (assert-throws? (edn/read-string "[1 2"))
+  (assert-throws? (edn/read-string "{:a}"))
+  (assert-throws? (edn/read-string ")"))
+  (assert-throws? (edn/read-string "'x"))
+  (assert-throws? (edn/read-string "#(inc %)"))
+  (assert-throws? (edn/read-string "::x"))
+  (assert-throws? (edn/read-string "1x")))
+
+(deftest test-read-string-bad-characters
+  (assert= (edn/read-string "\\u00e9") \u00e9)
+  (assert-throws? (edn/read-string "\\u00zz"))
+  (assert-throws? (edn/read-string "\\u12"))
+  (assert-throws? (edn/read-string "\\ud800"))
+  (assert-throws? (edn/read-string "\\o9"))
+  (assert-throws? (edn/read-string "\\nope")))
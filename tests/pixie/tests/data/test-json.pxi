@@ -74,3 +74,65 @@
   (let [string "{\"foo\": [1, 2, 3]}"]
     (assert= (-> string json/read-string json/write-string)
              string)))
+
+(deftest test-read-values
+  (assert-table [s v] (assert= (json/read-string s) v)
+                "42" 42
+                "-17" -17
+                "1.5" 1.5
+                "-2.5e3" -2500.0
+                "12345678901234567890123" 12345678901234567890123N
+                "true" true
+                "false" false
+                "null" nil
+                "\"a\\nb\\\"c\\u00e9\\/\"" "a\nb\"cé/"
+                " [1, 2 , [3], {}] " [1 2 [3] {}]
+                "{\"a\": {\"b\": [true, null]}}" {"a" {"b" [true nil]}}))
+
+(deftest test-read-keywordize-keys
+  (assert= (json/read-string "{\"a\": {\"b\": 1}}" {:keywordize-keys true})
+           {:a {:b 1}}))
+
+(deftest test-read-errors
+  (assert-throws? (json/read-string ""))
+  (assert-throws? (json/read-string "[1,"))
+  (assert-throws? (json/read-string "[1 2]"))
+  (assert-throws? (json/read-string "{a: 1}"))
+  (assert-throws? (json/read-string "01"))
+  (assert-throws? (json/read-string "[1] x"))
+  (assert-throws? (json/read-string "\"\\x\"")))
+
+(deftest test-write-escapes
+  (assert-table [x y] (assert= (json/write-string x) y)
+                "a\"b" "\"a\\\"b\""
+                "a\\b" "\"a\\\\b\""
+                "a\nb\tc" "\"a\\nb\\tc\""
+                true "true"
+                #{1} "[1]"
+                (range 3) "[0, 1, 2]"))
+
+(deftype Point [x y])
+
+(extend json/write-string Point (fn [p] "\"point\""))
+
+(deftest test-write-extended-types
+  (assert= (json/write-string [(->Point 1 2)]) "[\"point\"]")
+  (assert-throws? (json/write-string [(atom 1)])))
+
+(deftype Pair [a b]
+  ISeqable
+  (-seq [self] (list a b)))
+
+(extend json/write-string Pair (fn [p] "\"pair\""))
+
+(deftype Twins [x]
+  ISeqable
+  (-seq [self] (list x x)))
+
+(deftest test-write-extended-seqables
+  (assert= (json/write-string (->Pair 1 2)) "\"pair\"")
+  (assert= (json/write-string [(->Pair 1 2)]) "[\"pair\"]")
+  (assert= (json/write-string {"p" (list (->Pair 1 2))}) "{\"p\": [\"pair\"]}")
+  ;; Without an extension they are written as arrays, nested or not
+  (assert= (json/write-string (->Twins 1)) "[1, 1]")
+  (assert= (json/write-string [(->Twins 1)]) "[[1, 1]]"))
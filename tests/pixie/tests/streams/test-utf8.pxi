@@ -1,5 +1,6 @@
 (ns pixie.streams.test-utf8
  (require pixie.streams.utf8 :refer :all)
+ (require pixie.streams.utf8.internal :refer :all)
  (require pixie.io :as io)
  (require pixie.test :refer :all))
 
@@ -15,3 +16,24 @@
                utf8-input-stream)]
        (dotimes [x 32000]
          (assert= x (int (read-char is))))))
+
+(deftest test-bulk-transcoding
+  (let [s "I love 🍺 . This is a thumbs up 👍"
+        encoded (encode-utf8 s)
+        byte-count (count encoded)
+        decoder (utf8-decoder)]
+    (assert= (vec (encode-utf8 "aé")) [97 195 169])
+    ;; Feed the bytes one at a time, so every multi-byte character is split
+    (dotimes [i byte-count]
+      (let [b (buffer 1)]
+        (pixie.ffi/pack! b 0 CUInt8 (nth encoded i))
+        (decode-utf8! decoder b 1)))
+    (assert= (finish-utf8 decoder) s)
+    (let [truncated (utf8-decoder)]
+      (decode-utf8! truncated encoded (dec byte-count))
+      (assert-throws? (finish-utf8 truncated)))))
+
+(deftest test-slurp-spit-unicode
+  (let [s (apply str (map char (range 0 3000)))]
+    (io/spit "/tmp/pixie-utf-slurp.txt" s)
+    (assert= (io/slurp "/tmp/pixie-utf-slurp.txt") s)))
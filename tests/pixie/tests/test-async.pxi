@@ -27,3 +27,31 @@
 
     (assert= fr [0 42])
     (assert= *some-var* 0)))
+
+(deftest test-run-later-preserves-order
+  (let [p (promise)
+        acc (atom [])]
+    (dotimes [x 2000]
+      (st/-run-later (fn [] (swap! acc conj x))))
+    (st/-run-later (fn [] (p @acc)))
+    (assert= @p (vec (range 2000)))))
+
+(deftest test-yield-control-interleaves
+  (let [acc (atom [])
+        f1 (future (dotimes [x 3]
+                     (swap! acc conj [:a x])
+                     (st/yield-control)))
+        f2 (future (dotimes [x 3]
+                     (swap! acc conj [:b x])
+                     (st/yield-control)))]
+    @f1
+    @f2
+    (assert= (count @acc) 6)
+    (assert= (set @acc) #{[:a 0] [:a 1] [:a 2] [:b 0] [:b 1] [:b 2]})))
+
+(deftest test-apply-blocking-reuses-threads
+  (assert= (vec (map (fn [x] (st/apply-blocking + x 1)) (range 100)))
+           (vec (range 1 101)))
+  (let [stats (st/thread-pool-stats)]
+    (assert (<= (:threads stats) (:size stats)))
+    (assert= (:queued stats) 0)))
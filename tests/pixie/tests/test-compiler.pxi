@@ -35,3 +35,38 @@
 
 (t/deftest test-deftype-mutables
   (mutate! (->Foo 0)))
+
+(defn constant-literals []
+  [[1 2 [3 :a]] #{\a \b} {:a 1 :b ["c" nil]} ^:marked [1.5]])
+
+(t/deftest test-constant-literals
+  (let [[v s m marked] (constant-literals)]
+    (t/assert= v [1 2 [3 :a]])
+    (t/assert= s #{\a \b})
+    (t/assert= m {:a 1 :b ["c" nil]})
+    (t/assert= (:marked (meta marked)) true)
+    ;; Literals are shared between runs, updates mustn't leak into them
+    (t/assert= (conj v 4) [1 2 [3 :a] 4])
+    (t/assert= (persistent! (conj! (transient v) 5)) [1 2 [3 :a] 5])
+    (t/assert= (first (constant-literals)) [1 2 [3 :a]])))
+
+(t/deftest test-non-constant-literals
+  (let [x 42]
+    (t/assert= [1 x] [1 42])
+    (t/assert= #{x} #{42})
+    (t/assert= {:a [x]} {:a [42]})))
+
+;; The constants are arguments to calls, so they can't be folded into one literal
+(defn repeated-constants [x]
+  [(str x "a") (str x "a") (+ x 123456789) (+ x 123456789)
+   (identity "shared") (identity "shared") (identity 2.5) (identity 2.5)
+   (identity 0.0) (identity -0.0)])
+
+(t/deftest test-shared-constants
+  (let [[sa sb ia ib s1 s2 f1 f2 zero neg-zero] (repeated-constants 1)]
+    (t/assert= [sa sb ia ib] ["1a" "1a" 123456790 123456790])
+    ;; Equal constants of a fn share one slot in its constant pool
+    (t/assert (identical? s1 s2))
+    (t/assert (identical? f1 f2))
+    (t/assert (not (identical? zero neg-zero))))
+  (t/assert= (str 0.0 " " -0.0 " " 0.0) "0.0 -0.0 0.0"))
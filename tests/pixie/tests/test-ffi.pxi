@@ -65,3 +65,48 @@
   (let [big (reduce * 1 (range 1 100))]
     (t/assert= (m/sin big) (m/sin (float big))))
   (t/assert= (m/sin (/ 1 2)) (m/sin (float (/ 1 2)))))
+
+(t/deftest test-repeated-calls
+  (let [strlen (ffi-fn libc "strlen" [CCharP] CInt)]
+    (dotimes [x 1000]
+      (t/assert= (strlen (apply str (repeat (rem x 10) "a"))) (rem x 10)))
+    ;; A failed encoding doesn't leave the call's buffer unusable
+    (t/assert-throws? RuntimeException (strlen 42))
+    (t/assert= (strlen "abc") 3)))
+
+(t/deftest test-nested-calls-of-one-type
+  (let [MAX 16
+        qsort-cb (pixie.ffi/ffi-callback [CVoidP CVoidP] CInt)
+        qsort (ffi-fn libc "qsort" [CVoidP CInt CInt qsort-cb] CInt)
+        innermost-calls (atom 0)
+        ;; Compares the bytes at x and y by sorting a copy of them with another qsort call
+        compare-by-sorting (fn [cb x y]
+                             (let [a (pixie.ffi/unpack x 0 CUInt8)
+                                   b (pixie.ffi/unpack y 0 CUInt8)
+                                   tmp (buffer 2)]
+                               (pixie.ffi/pack! tmp 0 CUInt8 a)
+                               (pixie.ffi/pack! tmp 1 CUInt8 b)
+                               (qsort tmp 2 1 cb)
+                               (let [lo (pixie.ffi/unpack tmp 0 CUInt8)]
+                                 (dispose! tmp)
+                                 (cond
+                                   (= a b) 0
+                                   (= lo a) -1
+                                   :else 1))))
+        buf (buffer MAX)]
+    ;; Runs inside two qsort calls made while the outer qsort call is in flight
+    (using [inner-cb (pixie.ffi/ffi-prep-callback qsort-cb (fn [x y]
+                                                             (swap! innermost-calls inc)
+                                                             (- (pixie.ffi/unpack x 0 CUInt8)
+                                                                (pixie.ffi/unpack y 0 CUInt8))))
+            middle-cb (pixie.ffi/ffi-prep-callback qsort-cb (fn [x y]
+                                                              (compare-by-sorting inner-cb x y)))
+            outer-cb (pixie.ffi/ffi-prep-callback qsort-cb (fn [x y]
+                                                             (compare-by-sorting middle-cb x y)))]
+           (dotimes [x MAX]
+             (pixie.ffi/pack! buf x CUInt8 (- MAX x)))
+           (qsort buf MAX 1 outer-cb)
+           (t/assert (pos? @innermost-calls))
+           (dotimes [x (dec MAX)]
+             (t/assert (< (pixie.ffi/unpack buf x CUInt8)
+                          (pixie.ffi/unpack buf (inc x) CUInt8)))))))
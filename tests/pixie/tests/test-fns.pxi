@@ -58,3 +58,52 @@
       (arity-0-or-1-or-3-or-more :foo :bar))))
 
 (t/deftest test-code-arities)
+
+(defn- tail-even? [n]
+  (if (= n 0) true (tail-odd? (dec n))))
+
+(defn- tail-odd? [n]
+  (if (= n 0) false (tail-even? (dec n))))
+
+(t/deftest test-tail-calls
+  (t/assert= (tail-even? 100000) true)
+  (t/assert= (tail-odd? 100001) true)
+  (let [count-down (fn count-down
+                     ([n] (count-down n :done))
+                     ([n result] (if (pos? n) (count-down (dec n) result) result)))
+        collect (fn collect [n & xs] (if (pos? n) (collect (dec n) n) xs))]
+    (t/assert= (count-down 100000) :done)
+    (t/assert= (collect 100000) [1])))
+
+(defn- nested-closures [a]
+  (fn middle [b]
+    (fn inner [c]
+      (if (pos? c)
+        (inner (dec c))
+        [a b a b]))))
+
+(t/deftest test-closures
+  (let [x 1
+        y 2
+        f (fn [z]
+            (let [x (+ x 10)]
+              (fn [] [x y z (+ x y z)])))]
+    (t/assert= ((f 3)) [11 2 3 16])
+    (t/assert= x 1))
+  (let [adders (map (fn [n] (fn [m] (+ n m))) (range 3))]
+    (t/assert= (map #(% 10) adders) [10 11 12]))
+  (t/assert= (((nested-closures :a) :b) 3) [:a :b :a :b]))
+
+(defmacro ^:private again [& args]
+  `(recur ~@args))
+
+(t/deftest test-recur-to-fn
+  (let [count-down (fn [n acc] (if (pos? n) (recur (dec n) (conj acc n)) acc))
+        hidden-recur (fn [n] (if (pos? n) (again (dec n)) :done))
+        rest-recur (fn [n & xs] (if (pos? n) (recur (dec n) (cons n xs)) xs))
+        no-recur (fn [a b & more] [a b (count more)])]
+    (t/assert= (count-down 3 []) [3 2 1])
+    (t/assert= (hidden-recur 100000) :done)
+    (t/assert= (rest-recur 3) '(1 2 3))
+    (t/assert= (no-recur 1 2 3 4) [1 2 2])
+    (t/assert= ((fn [x] (loop [i x] (if (pos? i) (recur (dec i)) x))) 5) 5)))
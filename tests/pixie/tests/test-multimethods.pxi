@@ -0,0 +1,92 @@
+(ns pixie.tests.test-multimethods
+  (require pixie.test :as t))
+
+(defmulti area :shape)
+
+(defmethod area :square [{:keys [side]}]
+  (* side side))
+
+(defmethod area :rect [{:keys [w h]}]
+  (* w h))
+
+(defmethod area :default [_]
+  :unknown)
+
+(t/deftest test-dispatch
+  (t/assert= (area {:shape :square :side 3}) 9)
+  (t/assert= (area {:shape :rect :w 2 :h 5}) 10)
+  (t/assert= (area {:shape :square :side 4}) 16)
+  (t/assert= (area {:shape :blob}) :unknown))
+
+;; The dispatch fn calls itself in tail position, which restarts its frame
+(defn- nested-kind [x]
+  (if (vector? x) (nested-kind (first x)) (type x)))
+
+(defmulti describe-nested nested-kind)
+(defmethod describe-nested Integer [x] [:int x])
+(defmethod describe-nested Keyword [x] [:keyword x])
+
+(t/deftest test-tail-recursive-dispatch-fn
+  (t/assert= (describe-nested 1) [:int 1])
+  (t/assert= (describe-nested [[1] 2]) [:int [[1] 2]])
+  (t/assert= (describe-nested [[:a]]) [:keyword [[:a]]]))
+
+(defmulti arity-test (fn [& args] (count args)))
+(defmethod arity-test 0 [] :none)
+(defmethod arity-test 1 [a] [a])
+(defmethod arity-test 3 [a b c] [a b c])
+
+(t/deftest test-arities
+  (t/assert= (arity-test) :none)
+  (t/assert= (arity-test 1) [1])
+  (t/assert= (arity-test 1 2 3) [1 2 3])
+  (t/assert-throws? (arity-test 1 2)))
+
+(defmulti redefined identity)
+(defmethod redefined :a [_] 1)
+
+(t/deftest test-redefine-and-remove
+  (t/assert= (redefined :a) 1)
+  (defmethod redefined :a [_] 2)
+  (t/assert= (redefined :a) 2)
+  (remove-method redefined :a)
+  (t/assert= (get-method redefined :a) nil)
+  (t/assert-throws? (redefined :a)))
+
+(t/deftest test-hierarchies
+  (let [h (-> (make-hierarchy)
+              (derive ::square ::rect)
+              (derive ::rect ::shape))]
+    (t/assert (isa? h ::square ::shape))
+    (t/assert (not (isa? h ::shape ::square)))
+    (t/assert= (parents h ::square) #{::rect})
+    (t/assert= (ancestors h ::square) #{::rect ::shape})
+    (t/assert= (descendants h ::shape) #{::rect ::square})
+    (t/assert (isa? h [::square ::rect] [::shape ::shape]))
+    (t/assert (not (isa? (underive h ::rect ::shape) ::square ::shape))))
+  (t/assert (isa? Integer Number))
+  (t/assert (not (isa? Number Integer))))
+
+(def shapes (atom (make-hierarchy)))
+
+(defmulti describe identity :hierarchy shapes)
+(defmethod describe ::shape [_] :shape)
+(defmethod describe ::round [_] :round)
+
+(t/deftest test-hierarchy-dispatch
+  (swap! shapes derive ::circle ::shape)
+  (t/assert= (describe ::circle) :shape)
+  ;; Changes to the hierarchy are picked up by dispatch values already seen
+  (swap! shapes derive ::circle ::round)
+  (t/assert-throws? (describe ::circle))
+  (prefer-method describe ::round ::shape)
+  (t/assert= (describe ::circle) :round))
+
+(defmulti type-name type)
+(defmethod type-name Number [_] :number)
+(defmethod type-name :default [_] :other)
+
+(t/deftest test-type-dispatch
+  (t/assert= (type-name 1) :number)
+  (t/assert= (type-name 1.5) :number)
+  (t/assert= (type-name "x") :other))
@@ -44,3 +44,72 @@
     (assert (failure? ((:ENTRY as-and-bs) c)) )
     (assert (not (at-end? c)))
     (assert= (snapshot c) 0)))
+
+(deftest test-as-and-bs-memo-cursor
+  (let [c (memo-string-cursor "aabbaa")]
+    (assert= ((:S as-and-bs) c) [:S [:AB
+                                     [:A \a \a]
+                                     [:B \b \b]]])
+    (assert= (snapshot c) 4))
+
+  (let [c (memo-string-cursor "aabbaa")]
+    (assert (failure? ((:ENTRY as-and-bs) c)))
+    (assert= (snapshot c) 0)))
+
+(defparser left-recursive-sums []
+  ENTRY (and EXPR -> e
+             end
+             <- e)
+  EXPR (or (and EXPR -> l
+                \+
+                NUM -> r
+                <- [:+ l r])
+           NUM)
+  NUM (parse-if (set "0123456789")))
+
+(deftest test-left-recursion
+  (assert= ((:ENTRY left-recursive-sums) (memo-string-cursor "1+2+3"))
+           [:+ [:+ \1 \2] \3])
+  (assert= ((:ENTRY left-recursive-sums) (memo-string-cursor "7"))
+           \7)
+  (assert (failure? ((:ENTRY left-recursive-sums) (memo-string-cursor "1+")))))
+
+;; EXPR is left recursive through SUM, and TERM is left recursive itself
+(defparser indirect-left-recursive-sums []
+  ENTRY (and EXPR -> e
+             end
+             <- e)
+  EXPR (or SUM TERM)
+  SUM (and EXPR -> l
+           \+
+           TERM -> r
+           <- [:+ l r])
+  TERM (or (and TERM -> l
+                \*
+                NUM -> r
+                <- [:* l r])
+           NUM)
+  NUM (parse-if (set "0123456789")))
+
+(deftest test-indirect-left-recursion
+  (assert= ((:ENTRY indirect-left-recursive-sums) (memo-string-cursor "1+2+3"))
+           [:+ [:+ \1 \2] \3])
+  (assert= ((:ENTRY indirect-left-recursive-sums) (memo-string-cursor "1+2*3*4+5"))
+           [:+ [:+ \1 [:* [:* \2 \3] \4]] \5])
+  (assert= ((:ENTRY indirect-left-recursive-sums) (memo-string-cursor "7"))
+           \7)
+  (assert (failure? ((:ENTRY indirect-left-recursive-sums) (memo-string-cursor "1+2+")))))
+
+(deftest test-memo-cursor-parses-rules-once
+  (let [tries (atom 0)
+        p (parser []
+                  ENTRY (or (and A \x <- :x)
+                            (and A \y <- :y))
+                  A (parse-if (fn [c]
+                                (swap! tries inc)
+                                (= c \a))))]
+    (assert= ((:ENTRY p) (string-cursor "ay")) :y)
+    (assert= @tries 2)
+    (reset! tries 0)
+    (assert= ((:ENTRY p) (memo-string-cursor "ay")) :y)
+    (assert= @tries 1)))
@@ -0,0 +1,74 @@
+(ns pixie.tests.test-pxic
+  (require pixie.test :as t)
+  (require pixie.string :as s)
+  (require pixie.io :as io))
+
+(defn cached-value []
+  @(resolve-in (the-ns 'pixie.tests.pxic-cached) 'value))
+
+(t/deftest test-pxic-cache-dir
+  (let [dir (s/trim (io/run-command "mktemp -d"))
+        src (str dir "/cached.pxi")]
+    (binding [*pxic-cache-dir* (str dir "/cache")]
+      (io/spit src "(ns pixie.tests.pxic-cached) (def value 1)")
+      (load-file src)
+      (t/assert= (cached-value) 1)
+      (t/assert (not (s/blank? (io/run-command (str "ls " dir "/cache")))))
+
+      ;; Served from the cache
+      (load-file src)
+      (t/assert= (cached-value) 1)
+
+      ;; Same size, most likely the same mtime second: caught by the digest
+      (io/spit src "(ns pixie.tests.pxic-cached) (def value 2)")
+      (load-file src)
+      (t/assert= (cached-value) 2))
+    (io/run-command (str "rm -rf " dir))))
+
+(t/deftest test-pxic-lazy-defs
+  (let [dir (s/trim (io/run-command "mktemp -d"))
+        src (str dir "/lazy.pxi")
+        lookup (fn [sym] @(resolve-in (the-ns 'pixie.tests.pxic-lazy) sym))]
+    (binding [*pxic-cache-dir* (str dir "/cache")]
+      (io/spit src (str "(ns pixie.tests.pxic-lazy)"
+                        "(defn inc-it [x] (+ x 1))"
+                        "(def ^:dynamic *base* 10)"
+                        "(def derived (inc-it *base*))"
+                        "(defn add-base [x] (+ x *base*))"))
+      (load-file src)
+      ;; Load again from the cache, where the defns are deferred
+      (load-file src)
+      (t/assert= (lookup 'derived) 11)
+      (t/assert= ((lookup 'inc-it) 1) 2)
+      (t/assert= ((lookup 'add-base) 1) 11))
+    (io/run-command (str "rm -rf " dir))))
+
+(t/deftest test-pxic-constant-literals
+  (let [dir (s/trim (io/run-command "mktemp -d"))
+        src (str dir "/literals.pxi")
+        lookup (fn [sym] @(resolve-in (the-ns 'pixie.tests.pxic-literals) sym))]
+    (binding [*pxic-cache-dir* (str dir "/cache")]
+      (io/spit src (str "(ns pixie.tests.pxic-literals)"
+                        "(defn literals [] [#{1 \\a \\b} {:b [2.5 \"s\"]} ^:marked []])"))
+      (load-file src)
+      (t/assert (not (s/blank? (io/run-command (str "ls " dir "/cache")))))
+      ;; Load again, reading the literals back from the cache
+      (load-file src)
+      (let [[st mp marked] ((lookup 'literals))]
+        (t/assert= st #{1 \a \b})
+        (t/assert= mp {:b [2.5 "s"]})
+        (t/assert= (:marked (meta marked)) true)))
+    (io/run-command (str "rm -rf " dir))))
+
+(t/deftest test-pxic-old-format
+  (let [dir (s/trim (io/run-command "mktemp -d"))
+        src (str dir "/old.pxi")
+        value (fn [] @(resolve-in (the-ns 'pixie.tests.pxic-old) 'value))]
+    (io/spit src "(ns pixie.tests.pxic-old) (def value 3)")
+    ;; A header with format version 1, which is recompiled rather than misread
+    (io/spit (str src "c") (str "PXIC" (char 1) (char 0) (char 0) (char 0) "junk"))
+    (load-file src)
+    (t/assert= (value) 3)
+    (load-file src)
+    (t/assert= (value) 3)
+    (io/run-command (str "rm -rf " dir))))
@@ -0,0 +1,33 @@
+(ns pixie.tests.test-sort
+  (require pixie.test :as t))
+
+(t/deftest test-sort
+  (t/assert= (sort []) [])
+  (t/assert= (sort nil) [])
+  (t/assert= (sort [3 1 2]) [1 2 3])
+  (t/assert= (sort [3.5 1.5 2.5]) [1.5 2.5 3.5])
+  (t/assert= (sort ["b" "c" "a" "aa"]) ["a" "aa" "b" "c"])
+  (t/assert= (sort [3 1.5 2 1/2]) [1/2 1.5 2 3])
+  (t/assert= (sort [:b :a :c]) [:a :b :c])
+  (t/assert= (sort '(5 4 3 2 1)) [1 2 3 4 5])
+  (t/assert= (sort (range 100 0 -1)) (vec (range 1 101))))
+
+(t/deftest test-sort-arrays
+  (let [a (make-array 3)]
+    (aset a 0 3)
+    (aset a 1 1)
+    (aset a 2 2)
+    (t/assert= (sort a) [1 2 3])
+    (t/assert= (aget a 0) 3)))
+
+(t/deftest test-sort-with-comparator
+  (t/assert= (sort > [1 3 2]) [3 2 1])
+  (t/assert= (sort (fn [x y] (compare y x)) [1 3 2]) [3 2 1])
+  (t/assert= (sort compare ["b" "a"]) ["a" "b"]))
+
+(t/deftest test-sort-by
+  (t/assert= (sort-by count ["aaa" "b" "cc"]) ["b" "cc" "aaa"])
+  (t/assert= (sort-by :n > [{:n 1} {:n 3} {:n 2}]) [{:n 3} {:n 2} {:n 1}])
+  ;; Stable, items with equal keys keep their order
+  (t/assert= (sort-by first [[1 :a] [0 :b] [1 :c] [0 :d]])
+             [[0 :b] [0 :d] [1 :a] [1 :c]]))
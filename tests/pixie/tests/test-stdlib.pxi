@@ -352,6 +352,22 @@
     (t/assert= *earmuffiness* :quite-high))
   (t/assert= *earmuffiness* :low))
 
+(def ^:dynamic *never-bound* :root)
+
+(t/deftest test-nested-binding
+  (t/assert= *never-bound* :root)
+  (binding [*earmuffiness* :medium]
+    (let [frames (-get-current-var-frames nil)]
+      (binding [*earmuffiness* :high]
+        (set! (var *earmuffiness*) :higher)
+        (t/assert= *earmuffiness* :higher)
+        ;; Frames captured earlier don't see later bindings
+        (-set-current-var-frames nil frames)
+        (t/assert= *earmuffiness* :medium)
+        (push-binding-frame!))
+      (t/assert= *earmuffiness* :medium)))
+  (t/assert= *earmuffiness* :low))
+
 (t/deftest test-every?
   (t/assert= (every? even? [2 4 6 8]) true)
   (t/assert= (every? odd?  [2 4 6 8]) false)
@@ -485,6 +501,46 @@
                 '(0 1 2 3 4 5 6 7 8 9))
              true))
 
+(t/deftest test-range-count-and-nth
+  (t/assert= (count (range 0 10 3)) 4)
+  (t/assert= (count (range 10 0 -3)) 4)
+  (t/assert= (count (range 0 1 0.25)) 4)
+  (t/assert= (count (range 5 5)) 0)
+  (t/assert= (nth (range 0 10 3) 3) 9)
+  (t/assert= (nth (range 10 0 -3) 3) 1)
+  (t/assert= (nth (range 0 10 3) 4 :none) :none)
+  (t/assert= (seq (range 5 5)) nil)
+  (t/assert= (seq (range 0 1 0.25)) '(0 0.25 0.5 0.75))
+  (t/assert= (type (first (range 0 1 0.25))) Integer)
+  (t/assert= (reduce conj [] (range 0 1 0.25)) [0 0.25 0.5 0.75])
+  (t/assert= (seq (range 0.5 2 0.5)) '(0.5 1.0 1.5))
+  (t/assert= (seq (range 0 1 1/3)) '(0 1/3 2/3)))
+
+(t/deftest test-range-count-of-long-ranges
+  (t/assert= (count (range 1N 10000000000000N)) 9999999999999)
+  (t/assert= (count (range 0 1e9 1/2)) 2000000000)
+  (t/assert= (count (range 0 10N 3)) 4)
+  (t/assert= (count (range 1 0 -1/3)) 3)
+  (t/assert= (count (range 0 1e300 1e-300)) 9223372036854775807))
+
+(t/deftest test-range-reduce
+  (t/assert= (reduce + (range 100000)) 4999950000)
+  (t/assert= (reduce + (range 10 0 -1)) 55)
+  (t/assert= (reduce + (range 0 2 0.5)) 3.0)
+  (t/assert= (reduce (fn [acc x] (if (= x 5) (reduced acc) (+ acc x))) 0 (range)) 10)
+  (t/assert= (transduce (comp (map inc) (filter even?)) + (range 10)) 30))
+
+(t/deftest test-range-take-and-drop
+  (t/assert= (take 3 (range 10)) '(0 1 2))
+  (t/assert= (drop 7 (range 10)) '(7 8 9))
+  (t/assert= (drop 20 (range 10)) nil)
+  (t/assert= (take 0 (range 10)) '())
+  (t/assert= (count (take 5 (drop 3 (range 0 100 2)))) 5)
+  (t/assert= (nth (drop 3 (range 0 100 2)) 0) 6)
+  (t/assert= (reduce + (take 4 (drop 2 (range 0 1 0.125)))) 1.75)
+  (t/assert= (next (range 3)) '(1 2))
+  (t/assert= (next (range 1)) nil))
+
 (t/deftest test-ns
   ;; Create a namespace called foo
   (in-ns :foo)
@@ -692,6 +748,32 @@
     (t/assert= 3 (reset! a 3))
     (t/assert= :bar (-> a (with-meta {:foo :bar}) meta :foo))))
 
+(t/deftest test-atom-compare-and-set
+  (let [v [1]
+        a (atom v)]
+    (t/assert= false (compare-and-set! a [2] [3]))
+    (t/assert= true (compare-and-set! a v [3]))
+    (t/assert= [3] @a)
+    (t/assert= [[3] [3 4]] (swap-vals! a conj 4))
+    (t/assert= [[3 4] :x] (reset-vals! a :x))))
+
+(t/deftest test-atom-watches-and-validators
+  (let [a (atom 0)
+        seen (atom [])]
+    (add-watch a :w (fn [k r old new] (swap! seen conj [k old new])))
+    (swap! a + 2)
+    (reset! a 5)
+    (remove-watch a :w)
+    (swap! a inc)
+    (t/assert= [[:w 0 2] [:w 2 5]] @seen)
+    (set-validator! a pos?)
+    (t/assert= pos? (get-validator a))
+    (t/assert-throws? RuntimeException "Invalid reference state" (reset! a -1))
+    (t/assert-throws? RuntimeException "Invalid reference state" (swap! a -))
+    (t/assert= 6 @a)
+    (set-validator! a nil)
+    (t/assert= -1 (reset! a -1))))
+
 (t/deftest pre-post-conds
   (let [f (fn ([a] {:pre [(even? a)] :post [(= % 6)]} (/ a 2))
             ([a b] {:pre [(= (+ 1 a) b)] :post [(odd? %)]} (+ a b)))]
@@ -732,3 +814,30 @@
 (t/deftest test-memoize
   (let [f (memoize rand)]
     (t/assert= (f) (f))))
+
+(t/deftest test-chunked-seqs
+  (let [v (vec (range 100))]
+    (t/assert (chunked-seq? (seq v)))
+    (t/assert (chunked-seq? (seq "abc")))
+    (t/assert (chunked-seq? (seq (make-array 3))))
+    (t/assert= (count (chunk-first (seq v))) 32)
+    (t/assert= (seq v) (range 100))
+    (t/assert= (map inc v) (range 1 101))
+    (t/assert= (filter even? v) (range 0 100 2))
+    (t/assert= (remove even? v) (range 1 100 2))
+    (t/assert= (keep #(when (odd? %) (* 2 %)) v) (range 2 200 4))
+    (t/assert= (map inc (range 10 -10 -3)) '(11 8 5 2 -1 -4 -7))
+    (t/assert= (take 3 (map inc (range))) '(1 2 3))
+    (t/assert= (seq (map identity "héllo")) '(\h \é \l \l \o))
+    (t/assert= (reduce + (map inc v)) 5050)
+    (t/assert= (conj (map inc [1 2]) 1) '(1 2 3))
+    (t/assert= (str (map inc [1 2])) "(2 3)")
+    (t/assert= (filter even? [1 3 5]) '())))
+
+(t/deftest test-chunk-buffers
+  (let [b (chunk-buffer 2)]
+    (chunk-append b :a)
+    (chunk-append b :b)
+    (let [s (chunk-cons (chunk b) [:c])]
+      (t/assert= s '(:a :b :c))
+      (t/assert= (next (chunk-rest s)) nil))))